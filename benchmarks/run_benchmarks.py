@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+合成問題の規模を変えながら構築時間・求解時間・ギャップ・メモリ使用量を計測するベンチマーク
+
+使用例:
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --output new.json --compare results.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+# プロジェクトルートをパスに追加
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ortools import __version__ as ortools_version
+from src.scheduling_optimizer import SchedulingOptimizer
+from src.problem_generator import ProblemGeneratorConfig, generate_problem
+from src.instrumentation import Instrumentation, SolveStats
+from src.solver_config import SolverConfig
+from src.constants import GeneratorDefaults, SchedulingConfig
+
+# 構築時間に含めるフェーズ（それ以外はソルバー側の時間）
+BUILD_PHASES = ("create_variables", "add_basic_constraints", "add_instructor_constraints",
+                "add_player_constraints", "add_equality_constraints", "add_redundant_constraints",
+                "objective")
+
+
+class _StatsRecorder(Instrumentation):
+    """求解終了時の SolveStats を保持する"""
+    capture_solver_log = True
+    
+    def __init__(self):
+        self.stats: Optional[SolveStats] = None
+    
+    def finish(self, stats: SolveStats):
+        self.stats = stats
+
+
+def case_name(config: ProblemGeneratorConfig) -> str:
+    """比較時に結果を突き合わせるための名前"""
+    return (f"p{config.num_parts}_r{config.num_rooms}_i{config.num_instructors}"
+            f"_n{config.num_players}_s{config.seed}")
+
+
+def run_case(config: ProblemGeneratorConfig, time_limit_seconds: float, model_mode: str,
+             solver_config: SolverConfig) -> Dict[str, Any]:
+    """1つの規模を計測（メモリ使用量を独立に測るため別プロセスで実行される）"""
+    problem = generate_problem(config)
+    recorder = _StatsRecorder()
+    optimizer = SchedulingOptimizer(problem, instrumentation=recorder)
+    
+    start_time = time.perf_counter()
+    first_feasible = None
+    last_solution = None
+    for solution in optimizer.solve_iter(time_limit_seconds, model_mode=model_mode, solver_config=solver_config):
+        if first_feasible is None:
+            first_feasible = solution.solve_time_seconds
+        last_solution = solution
+    total_seconds = time.perf_counter() - start_time
+    
+    stats = recorder.stats
+    build_seconds = sum(stats.phase_seconds.get(name, 0.0) for name in BUILD_PHASES)
+    return {
+        "name": case_name(config),
+        "num_parts": config.num_parts,
+        "num_rooms": config.num_rooms,
+        "num_time_slots": config.get_num_time_slots(),
+        "num_instructors": config.num_instructors,
+        "num_players": config.num_players,
+        "seed": config.seed,
+        "model_mode": model_mode,
+        "num_variables": stats.num_variables,
+        "num_bool_variables": stats.num_bool_variables,
+        "num_constraints": stats.num_constraints,
+        "status": stats.status,
+        "build_seconds": build_seconds,
+        "solve_seconds": stats.phase_seconds.get("solve"),
+        "presolve_seconds": stats.phase_seconds.get("presolve"),
+        "search_seconds": stats.phase_seconds.get("search"),
+        "total_seconds": total_seconds,
+        "time_to_first_feasible": first_feasible,
+        "objective_value": stats.objective_value,
+        "best_bound": stats.best_bound,
+        "final_gap": last_solution.gap if last_solution is not None else None,
+        "num_branches": stats.num_branches,
+        "num_conflicts": stats.num_conflicts,
+        "peak_memory_bytes": stats.peak_memory_bytes,
+        "phase_seconds": stats.phase_seconds,
+    }
+
+
+def run_benchmarks(configs: List[ProblemGeneratorConfig], time_limit_seconds: float, model_mode: str,
+                   solver_config: SolverConfig) -> List[Dict[str, Any]]:
+    """各規模を順に計測（同時に1問題だけ実行し、計測が互いに干渉しないようにする）"""
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for config in configs:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            result = executor.submit(run_case, config, time_limit_seconds, model_mode, solver_config).result()
+        print(f"{result['name']}: 構築 {result['build_seconds']:.3f}秒, 求解 {result['solve_seconds']:.3f}秒, "
+              f"初回解 {_format_seconds(result['time_to_first_feasible'])}, ギャップ {result['final_gap']}, "
+              f"{result['status']}")
+        results.append(result)
+    return results
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any]):
+    """基準の結果と比較して時間の比率を表示（1より大きいほど遅くなっている）"""
+    baseline_by_name = {result["name"]: result for result in baseline["results"]}
+    print("\n=== 基準との比較（今回 / 基準） ===")
+    for result in results:
+        base = baseline_by_name.get(result["name"])
+        if base is None:
+            print(f"{result['name']}: 基準なし")
+            continue
+        ratios = []
+        for key in ("build_seconds", "solve_seconds", "time_to_first_feasible"):
+            if result.get(key) and base.get(key):
+                ratios.append(f"{key}={result[key] / base[key]:.2f}")
+        print(f"{result['name']}: {', '.join(ratios)}")
+
+
+def _format_seconds(seconds: Optional[float]) -> str:
+    return "-" if seconds is None else f"{seconds:.3f}秒"
+
+
+def main():
+    """メイン実行関数"""
+    parser = argparse.ArgumentParser(description="スケジューリング最適化のベンチマーク")
+    parser.add_argument("--output", default="benchmark_results.json", help="結果を書き込むJSONファイル")
+    parser.add_argument("--compare", help="比較対象の結果JSONファイル")
+    parser.add_argument("--time-limit", type=float, default=GeneratorDefaults.BENCHMARK_TIME_LIMIT,
+                        help="1問題あたりの時間制限（秒）")
+    parser.add_argument("--model-mode", default=SchedulingConfig.DEFAULT_MODEL_MODE, help="モデル形式")
+    parser.add_argument("--workers", type=int, default=SchedulingConfig.DEFAULT_NUM_SEARCH_WORKERS,
+                        help="探索ワーカー数（0=自動）")
+    parser.add_argument("--deterministic", action="store_true",
+                        help="決定的モードで探索する（時間制限は決定的時間として扱われる）")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[GeneratorDefaults.SEED], help="問題生成のシード")
+    args = parser.parse_args()
+    
+    configs = [
+        ProblemGeneratorConfig(num_parts=num_parts, num_rooms=num_rooms, num_instructors=num_instructors,
+                               num_players=num_players, seed=seed)
+        for num_parts, num_rooms, num_instructors, num_players in GeneratorDefaults.BENCHMARK_SIZES
+        for seed in args.seeds
+    ]
+    solver_config = SolverConfig(num_search_workers=args.workers, deterministic=args.deterministic)
+    results = run_benchmarks(configs, args.time_limit, args.model_mode, solver_config)
+    
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "ortools": ortools_version,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "time_limit_seconds": args.time_limit,
+        "model_mode": args.model_mode,
+        "num_search_workers": args.workers,
+        "deterministic": args.deterministic,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n結果を {args.output} に書き込みました")
+    
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
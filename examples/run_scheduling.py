@@ -2,6 +2,7 @@
 """
 練習表作成システムの実行例
 """
+import logging
 import sys
 import os
 
@@ -9,13 +10,14 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.scheduling_optimizer import SchedulingOptimizer, create_sample_problem
-from src.constants import ProblemConfig
+from src.data_models import part_label
 
 
 def main():
     """メイン実行関数"""
+    # 求解の進捗は logging で出力される
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
     print("=== 練習表作成システム ===")
-    print(f"部屋数: {ProblemConfig.NUM_ROOMS}, コマ数: {ProblemConfig.get_num_time_slots()}, パート数: {ProblemConfig.NUM_PARTS}")
     print()
     
     # サンプル問題を作成
@@ -38,7 +40,7 @@ def main():
             priority_text = f" (優先度: {priority})"
         else:
             priority_text = ""
-        print(f"{player.name} ({role}): {[p.value for p in player.parts]}{priority_text}")
+        print(f"{player.name} ({role}): {[part_label(p) for p in player.parts]}{priority_text}")
     print()
     
     # 最適化を実行（個人別優先度設定済み、指導者均等割り振り重み: 100）
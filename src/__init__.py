@@ -1,18 +1,76 @@
 """
 OR-Tools スケジューリング最適化ライブラリ
+
+データモデル以外の公開クラス・関数は、最初に参照したときにモジュールを読み込む。
+OR-Tools はモデルを扱うモジュール（最適化・制約・目的関数・テンプレートなど）を参照したときだけ読み込まれ、
+データモデル・フィンガープリント・解のキャッシュ・評価・書き出しだけを使う場合は読み込まない。
 """
+import importlib
+from typing import Any, List
 
-from .scheduling_optimizer import SchedulingOptimizer, create_sample_problem
 from .data_models import (
-    PartType, Player, Room, TimeSlot, PracticeSession, 
-    SchedulingProblem, SchedulingSolution
+    PartType, Player, Room, TimeSlot, PracticeSession,
+    SchedulingProblem, SchedulingSolution, ProblemChange, SessionTable, PartRoster
 )
-from .constraints import SchedulingConstraints
-from .objectives import SchedulingObjectives
+
+# 公開名 -> 定義しているモジュール（参照時に読み込む）
+_LAZY_ATTRIBUTES = {
+    "SchedulingOptimizer": "scheduling_optimizer",
+    "create_sample_problem": "scheduling_optimizer",
+    "SchedulingConstraints": "constraints",
+    "SchedulingObjectives": "objectives",
+    "SolverConfig": "solver_config",
+    "problem_fingerprint": "fingerprint",
+    "SolutionCache": "solution_cache",
+    "SolutionEvaluator": "evaluator",
+    "HeuristicSolver": "heuristic",
+    "DecompositionSolver": "decomposition",
+    "DecompositionConfig": "decomposition",
+    "ModelTemplate": "model_template",
+    "TimetableExporter": "export",
+    "HorizonProblem": "horizon",
+    "HorizonSolution": "horizon",
+    "RollingHorizonSolver": "horizon",
+    "InfeasibilityReport": "diagnostics",
+    "check_capacity": "diagnostics",
+    "WeightScenario": "sensitivity",
+    "ScenarioResult": "sensitivity",
+    "SensitivityAnalyzer": "sensitivity",
+    "scenario_grid": "sensitivity",
+    "ProblemGeneratorConfig": "problem_generator",
+    "generate_problem": "problem_generator",
+    "Instrumentation": "instrumentation",
+    "LoggingInstrumentation": "instrumentation",
+    "MetricsInstrumentation": "instrumentation",
+    "SolveStats": "instrumentation",
+}
+
+
+def __getattr__(name: str) -> Any:
+    """公開名を参照したときに、定義しているモジュールを読み込む"""
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # 2回目以降は通常の属性として参照する
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
+
 
 __version__ = "0.1.0"
 __all__ = [
     "SchedulingOptimizer", "create_sample_problem",
     "PartType", "Player", "Room", "TimeSlot", "PracticeSession",
-    "SchedulingProblem", "SchedulingSolution", "SchedulingConstraints", "SchedulingObjectives"
+    "SchedulingProblem", "SchedulingSolution", "ProblemChange", "SessionTable", "PartRoster", "SchedulingConstraints", "SchedulingObjectives",
+    "SolverConfig", "problem_fingerprint", "SolutionCache",
+    "Instrumentation", "LoggingInstrumentation", "MetricsInstrumentation", "SolveStats",
+    "ProblemGeneratorConfig", "generate_problem", "SolutionEvaluator", "HeuristicSolver",
+    "DecompositionSolver", "DecompositionConfig", "ModelTemplate",
+    "TimetableExporter", "HorizonProblem", "HorizonSolution", "RollingHorizonSolver",
+    "InfeasibilityReport", "check_capacity",
+    "WeightScenario", "ScenarioResult", "SensitivityAnalyzer", "scenario_grid"
 ]
@@ -0,0 +1,108 @@
+"""
+asyncio から利用するためのスケジューリング最適化ファサード
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+from .data_models import SchedulingProblem, SchedulingSolution
+from .scheduling_optimizer import SchedulingOptimizer
+from .solution_cache import SolutionCache
+from .solver_config import SolverConfig
+from .constants import SchedulingConfig
+
+
+class SchedulerBusyError(RuntimeError):
+    """待ち行列が上限に達していて新しい求解要求を受け付けられない"""
+
+
+class AsyncSchedulingOptimizer:
+    """求解をスレッドプールで実行し、同時実行数を制限する非同期ファサード
+    
+    max_concurrency 件までを同時に解き、それ以上は待ち行列に入る。max_pending を指定すると
+    待ち行列がその件数に達した時点で SchedulerBusyError を送出する（バックプレッシャー）。
+    await 中のタスクがキャンセルされると StopSearch で探索を打ち切り、ソルバーが停止するまで
+    実行枠を保持してからキャンセルを伝播する。
+    """
+    
+    def __init__(self, max_concurrency: int = SchedulingConfig.DEFAULT_ASYNC_MAX_CONCURRENCY,
+                 max_pending: Optional[int] = None, cache: Optional[SolutionCache] = None):
+        assert max_concurrency > 0, "同時実行数は1以上を指定してください"
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self.cache = cache
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="scheduling-solve")
+        self._semaphore: Optional[asyncio.Semaphore] = None  # 実行中のイベントループで作成する
+        
+        self.queue_depth = 0  # 実行枠を待っている要求数
+        self.in_flight = 0  # 実行中の求解数
+        self.completed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.failed = 0
+    
+    async def solve(self, problem: SchedulingProblem,
+                    time_limit_seconds: int = SchedulingConfig.DEFAULT_TIME_LIMIT,
+                    equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+                    model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+                    solver_config: Optional[SolverConfig] = None) -> Optional[SchedulingSolution]:
+        """イベントループを止めずに問題を解く"""
+        if self.max_pending is not None and self.queue_depth >= self.max_pending:
+            self.rejected += 1
+            raise SchedulerBusyError(f"待ち行列が上限（{self.max_pending}件）に達しています")
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        self.queue_depth += 1
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.queue_depth -= 1
+        
+        self.in_flight += 1
+        optimizer = SchedulingOptimizer(problem, self.cache)
+        solve = functools.partial(optimizer.solve, time_limit_seconds, equality_weight, model_mode, solver_config)
+        future = asyncio.get_running_loop().run_in_executor(self._executor, solve)
+        try:
+            solution = await asyncio.shield(future)
+            self.completed += 1
+            return solution
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            optimizer.stop_search()
+            # ソルバーが止まるまで実行枠を保持し、放棄されたスレッドが積み上がらないようにする
+            try:
+                await future
+            except Exception:
+                pass
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self._semaphore.release()
+    
+    def metrics(self) -> Dict[str, int]:
+        """待ち行列・実行中件数などの指標"""
+        return {
+            "queue_depth": self.queue_depth,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "rejected": self.rejected,
+            "failed": self.failed,
+        }
+    
+    def shutdown(self, wait: bool = True):
+        """スレッドプールを終了"""
+        self._executor.shutdown(wait=wait)
+    
+    async def __aenter__(self) -> "AsyncSchedulingOptimizer":
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self.shutdown(wait=True)
@@ -0,0 +1,112 @@
+"""
+複数のスケジューリング問題をプロセスプールで一括求解する
+"""
+import dataclasses
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Tuple
+from .data_models import SchedulingProblem, SchedulingSolution
+from .solver_config import SolverConfig
+from .constants import SchedulingConfig
+
+
+@dataclass
+class BatchResult:
+    """一括求解の1問題分の結果"""
+    index: int  # 入力リスト内の位置
+    solution: Optional[SchedulingSolution]  # 解が見つからなかった場合・失敗した場合は None
+    error: Optional[str] = None  # 例外・タイムアウトの内容
+    elapsed_seconds: float = 0.0  # モデル構築を含む処理時間
+    
+    @property
+    def succeeded(self) -> bool:
+        """解が得られたかどうか"""
+        return self.solution is not None
+
+
+def _solve_one(index: int, problem: SchedulingProblem, time_limit_seconds: int, equality_weight: int,
+               model_mode: str, solver_config: SolverConfig) -> BatchResult:
+    """ワーカープロセスで1問題を解く（例外は結果に含めて返す）"""
+    # OR-Tools はワーカーで初めて解くときに読み込む（結果を受け取る側のプロセスでは読み込まない）
+    from .scheduling_optimizer import SchedulingOptimizer
+    
+    start_time = time.time()
+    try:
+        optimizer = SchedulingOptimizer(problem)
+        solution = optimizer.solve(time_limit_seconds, equality_weight, model_mode, solver_config)
+        error = None if solution is not None else "解が見つかりませんでした"
+        return BatchResult(index, solution, error, time.time() - start_time)
+    except Exception as e:
+        return BatchResult(index, None, f"{type(e).__name__}: {e}", time.time() - start_time)
+
+
+def split_workers(num_problems: int, max_workers: Optional[int] = None,
+                  cpu_count: Optional[int] = None) -> Tuple[int, int]:
+    """CPUコアを同時に解く問題数と問題ごとのCP-SAT探索ワーカー数に分配する"""
+    cpu_count = cpu_count or os.cpu_count() or 1
+    if max_workers is None:
+        max_workers = cpu_count
+    max_workers = max(1, min(max_workers, num_problems, cpu_count))
+    return max_workers, max(1, cpu_count // max_workers)
+
+
+def solve_many(problems: List[SchedulingProblem], max_workers: Optional[int] = None,
+               per_problem_time_limit: int = SchedulingConfig.DEFAULT_TIME_LIMIT,
+               equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+               model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+               solver_config: Optional[SolverConfig] = None) -> Iterator[BatchResult]:
+    """複数の問題をプロセスプールで解き、終わった順に結果を返す
+    
+    solver_config の num_search_workers が0（自動）の場合は、CPUコア数を同時実行数で割った
+    ワーカー数を各問題に割り当てる。1問題の失敗は他の問題に影響せず、BatchResult.error に記録される。
+    時間制限 + BATCH_TIMEOUT_GRACE 秒を過ぎても終わらない問題はタイムアウトとして結果を返し、
+    それ以上待たない（実行中のプロセス自体は停止できないため、プールの終了時に回収される）。
+    """
+    if not problems:
+        return
+    
+    if solver_config is None:
+        solver_config = SolverConfig()
+    max_workers, workers_per_problem = split_workers(len(problems), max_workers)
+    if solver_config.num_search_workers == 0:
+        solver_config = dataclasses.replace(solver_config, num_search_workers=workers_per_problem)
+    
+    timeout = per_problem_time_limit + SchedulingConfig.BATCH_TIMEOUT_GRACE
+    # CP-SATはスレッドを使うため fork ではなく spawn でワーカーを起動する
+    executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    abandoned = False
+    pending: Dict[Future, int] = {}
+    try:
+        pending = {
+            executor.submit(_solve_one, index, problem, per_problem_time_limit, equality_weight, model_mode, solver_config): index
+            for index, problem in enumerate(problems)
+        }
+        started: Dict[Future, float] = {}
+        
+        while pending:
+            done, _ = wait(pending, timeout=1.0, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                elapsed = time.time() - started.get(future, time.time())
+                try:
+                    yield future.result()
+                except Exception as e:
+                    # ワーカープロセスの異常終了など
+                    yield BatchResult(index, None, f"{type(e).__name__}: {e}", elapsed)
+            
+            now = time.time()
+            for future, index in list(pending.items()):
+                if future.running():
+                    started.setdefault(future, now)
+                    if now - started[future] > timeout:
+                        pending.pop(future)
+                        abandoned = True
+                        yield BatchResult(index, None, f"タイムアウト（{timeout}秒）", now - started[future])
+    finally:
+        # 途中で打ち切られた場合は未着手の問題を取り消す
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=not abandoned)
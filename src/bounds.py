@@ -0,0 +1,61 @@
+"""
+問題の規模から導出する変数の上下限（固定の上限値の代わりにモデルの範囲を絞る）
+"""
+from dataclasses import dataclass
+from typing import Dict
+from .data_models import SchedulingProblem
+from .constants import LoadBalanceScope
+
+
+@dataclass
+class ModelBounds:
+    """問題から導出した上下限"""
+    num_parts: int
+    num_instructors: int
+    # 指導者1人のセッション数の範囲（均等割り振り制約: パート数÷指導者数の切り捨て〜切り上げ。
+    # LoadBalanceScope.CUMULATIVE の場合は 0〜min(時間コマ数, パート数)）
+    load_lower: int
+    load_upper: int
+    # 指導者ID -> 担当できるセッション数の上限 min(時間コマ数, 指導可能パート数)
+    instructor_capacity: Dict[int, int]
+    # 1つの時間コマのセッション数の上限 min(部屋数, 指導者数, パート数)
+    slot_capacity: int
+
+
+def derive_bounds(problem: SchedulingProblem) -> ModelBounds:
+    """問題のパート数・部屋数・時間コマ数・指導可能パートから上下限を導出
+    
+    均等割り振り制約（どの2人の指導者のセッション数の差も1以下）は、各パートが1回ずつ練習して
+    セッション数の合計がパート数になるため、全員のセッション数が パート数÷指導者数 の
+    切り捨て以上・切り上げ以下であることと同値になる。
+    """
+    num_parts = len(problem.parts)
+    instructors = problem.get_instructors()
+    num_instructors = len(instructors)
+    
+    eligible_counts = {instructor.id: 0 for instructor in instructors}
+    for part in problem.parts:
+        for instructor in problem.get_eligible_instructors(part):
+            eligible_counts[instructor.id] += 1
+    num_time_slots = len(problem.time_slots)
+    instructor_capacity = {
+        instructor_id: min(num_time_slots, count) for instructor_id, count in eligible_counts.items()
+    }
+    
+    if num_instructors > 0 and problem.load_balance_scope == LoadBalanceScope.CUMULATIVE:
+        # 累積で均等にする場合、その日のセッション数は時間コマ数・パート数以外に制限しない
+        load_lower, load_upper = 0, min(num_time_slots, num_parts)
+    elif num_instructors > 0:
+        load_lower = num_parts // num_instructors
+        load_upper = -(-num_parts // num_instructors)
+    else:
+        load_lower = load_upper = 0
+    
+    return ModelBounds(
+        num_parts=num_parts,
+        num_instructors=num_instructors,
+        load_lower=load_lower,
+        load_upper=load_upper,
+        instructor_capacity=instructor_capacity,
+        slot_capacity=min(len(problem.rooms), num_instructors, num_parts),
+    )
@@ -2,24 +2,133 @@
 スケジューリングシステムの定数定義
 """
 
-# 制約関連
-class ConstraintLimits:
-    """制約の上限値"""
-    MAX_VIOLATIONS = 10        # 最大違反数
-    MAX_WEIGHTED_VIOLATIONS = 1000  # 最大重み付き違反数
-    MAX_SESSIONS = 100         # 最大セッション数
-    MAX_WEIGHTED_EQUALITY = 10000  # 最大重み付き均等性
-
 # スケジューリング設定
 class SchedulingConfig:
     """スケジューリング設定"""
     DEFAULT_TIME_LIMIT = 30    # デフォルト時間制限（秒）
     DEFAULT_EQUALITY_WEIGHT = 100  # デフォルト均等性重み
     DEFAULT_PRIORITY = 50  # デフォルト優先度
+    DEFAULT_MODEL_MODE = "full"  # デフォルトのモデル形式（ModelMode参照）
+    DEFAULT_NUM_SEARCH_WORKERS = 0  # 探索ワーカー数（0=CPUコア数から自動決定）
+    DEFAULT_SOLVER_PRESET = "default"  # デフォルトのソルバープリセット（SolverPreset参照）
+    DEFAULT_RANDOM_SEED = 0  # 乱数シード
+    DEFAULT_RELATIVE_GAP_LIMIT = 0.0  # 相対ギャップの許容値（0=最適性を証明するまで探索）
+    BATCH_TIMEOUT_GRACE = 10  # 一括求解で時間制限を超えて結果を待つ猶予（秒）
+    DEFAULT_CACHE_MAX_ENTRIES = 1024  # 解キャッシュの最大件数
+    DEFAULT_CACHE_TTL = None  # 解キャッシュの有効期限（秒、None=無期限）
+    DEFAULT_ASYNC_MAX_CONCURRENCY = 4  # 非同期ファサードの同時求解数
+    DEFAULT_HEURISTIC_TIME_LIMIT = 0.1  # ヒューリスティック解法の時間制限（秒）
+    DEFAULT_DAY_TIME_LIMIT = 10  # 複数日の計画での1日あたりの時間制限（秒）
+    DEFAULT_OBJECTIVE_MODE = "blended"  # デフォルトの目的関数の扱い（ObjectiveMode参照）
+    DEFAULT_BALANCE_STAGE_FRACTION = 0.3  # 段階的な求解で第1段階（均等割り振り）に使う時間の割合
+    DEFAULT_DIAGNOSIS_TIME_LIMIT = 10  # 実行不可能な問題の診断の時間制限（秒）
+    DEFAULT_SCENARIO_TIME_LIMIT = 5  # 感度分析での1シナリオあたりの時間制限（秒）
+
+
+# モデル形式
+class ModelMode:
+    """最適化モデルの形式"""
+    FULL = "full"        # パート×部屋×時間コマ×指導者の変数を作成し部屋まで決定
+    COMPACT = "compact"  # パート×時間コマ×指導者の変数のみ作成し部屋数を容量制約で表現
+
+# ソルバーのプリセット
+class SolverPreset:
+    """CP-SATの並列探索ポートフォリオのプリセット"""
+    DEFAULT = "default"              # CP-SAT標準のポートフォリオ
+    FAST_FEASIBLE = "fast_feasible"  # 実行可能解を早く見つけることを優先
+    PROVE_OPTIMAL = "prove_optimal"  # 下界の改善（最適性の証明）を優先
+    
+    # プリセットごとのサブソルバー（ワーカー数がリストより少ない場合は先頭から使われる）
+    SUBSOLVERS = {
+        DEFAULT: [],
+        FAST_FEASIBLE: ["default", "quick_restart", "quick_restart_no_lp", "no_lp", "fixed"],
+        PROVE_OPTIMAL: ["default", "max_lp", "core", "lb_tree_search", "objective_lb_search",
+                        "pseudo_costs", "reduced_costs", "probing"],
+    }
+    # プリセットごとの線形化レベル（SolverConfigで明示した場合はそちらを優先）
+    LINEARIZATION_LEVELS = {
+        DEFAULT: None,
+        FAST_FEASIBLE: 0,
+        PROVE_OPTIMAL: 2,
+    }
+
+
+# 目的関数の扱い
+class ObjectiveMode:
+    """均等割り振り項と重複ペナルティの組み合わせ方"""
+    BLENDED = "blended"              # 均等性重みを掛けた和を1つの目的関数として最小化
+    LEXICOGRAPHIC = "lexicographic"  # 均等割り振り項を最小化して固定した後、重複ペナルティを最小化
+
+
+# 制約グループ（実行不可能な問題の診断で、同時に満たせない組を特定する単位）
+class ConstraintGroup:
+    """SchedulingConstraints の制約の種類（名前は SolutionEvaluator の違反の種類と同じ）"""
+    PART_COUNT = "part_count"                    # 各パートは1日に1回だけ練習する
+    ROOM_CONFLICT = "room_conflict"              # 各部屋・時間コマに最大1セッション（部屋数の容量）
+    INSTRUCTOR_CONFLICT = "instructor_conflict"  # 指導者は同じ時間コマに1セッションまで
+    EQUALITY = "equality"                        # 指導者のセッション数の均等割り振り
+    
+    ALL = (PART_COUNT, ROOM_CONFLICT, INSTRUCTOR_CONFLICT, EQUALITY)
+    DESCRIPTIONS = {
+        PART_COUNT: "各パートは1日に1回だけ練習する",
+        ROOM_CONFLICT: "各部屋・時間コマに最大1セッション",
+        INSTRUCTOR_CONFLICT: "指導者は同じ時間コマに1セッションまで",
+        EQUALITY: "指導者のセッション数の差は最大1まで",
+    }
+
+
+# 指導可能パートの方針
+class CrossPartPolicy:
+    """指導者が所属外のパートを指導できるかどうか"""
+    OWN_PARTS = "own_parts"   # 所属パートのみ指導可能（デフォルト）
+    UNCOVERED = "uncovered"   # 所属指導者のいないパートに限り全指導者が指導可能
+    ANY = "any"               # 全指導者が全パートを指導可能
+
+
+# 均等割り振り制約の範囲
+class LoadBalanceScope:
+    """指導者のセッション数の均等割り振りをどの範囲で保証するか"""
+    DAY = "day"                # その日のセッション数の差を1以下にする（制約）
+    CUMULATIVE = "cumulative"  # 制約は課さず、持ち越し分を含む累積の差を目的関数で最小化する（複数日の計画用）
+
+
+# 分割求解の設定
+class DecompositionDefaults:
+    """大規模問題の分割求解（DecompositionSolver）のデフォルト値"""
+    MAX_CLUSTER_SIZE = 20         # 1つの部分問題のパート数の上限
+    ASSIGNMENT_TIME_LIMIT = 5     # 指導者割り当てモデルの時間制限（秒）
+    CLUSTER_TIME_LIMIT = 10       # 部分問題ごとの時間制限（秒）
+    REPAIR_TIME_LIMIT = 1.0       # 局所探索による調整の時間制限（秒）
+    POLISH_TIME_LIMIT = 0         # 全体モデルでの仕上げの時間制限（秒、0=行わない）
+
+
+# 合成問題の生成・ベンチマーク設定
+class GeneratorDefaults:
+    """合成問題生成器のデフォルト値"""
+    # 一般プレイヤーの所属パート数の分布（所属パート数 -> 重み）
+    PARTS_PER_PLAYER = {1: 0.3, 2: 0.5, 3: 0.2}
+    # 一般プレイヤーの重複優先度の分布（優先度 -> 重み）
+    PRIORITY_DISTRIBUTION = {0: 0.2, 25: 0.2, 50: 0.2, 75: 0.2, 100: 0.2}
+    # 指導者の所属パート数の分布（担当パートとは別に追加で所属するパート数 -> 重み）
+    EXTRA_INSTRUCTOR_PARTS = {0: 0.5, 1: 0.5}
+    SEED = 0
+    
+    # ベンチマークの規模（パート数, 部屋数, 指導者数, 一般プレイヤー数）
+    BENCHMARK_SIZES = [
+        (5, 3, 3, 10),
+        (9, 5, 5, 18),
+        (9, 3, 4, 60),
+        (9, 5, 9, 200),
+        (9, 2, 3, 500),
+        (30, 10, 15, 300),
+        (60, 20, 30, 1000),
+    ]
+    BENCHMARK_TIME_LIMIT = 30  # 1問題あたりの時間制限（秒）
+
 
 # パート・部屋・時間コマ設定
 class ProblemConfig:
-    """問題設定"""
+    """サンプル問題・合成問題の既定の規模（求解時の規模は SchedulingProblem から決まる）"""
     NUM_ROOMS = 5              # 部屋数
     NUM_PARTS = 9              # パート数
     NUM_INSTRUCTORS = 5        # 指導者数
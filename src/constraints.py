@@ -2,92 +2,138 @@
 制約定義クラス
 """
 from ortools.sat.python import cp_model
-from typing import List, Dict, Tuple
-from .data_models import SchedulingProblem, Player, PartType, Room, TimeSlot
-from .constants import ProblemConfig
+from typing import List, Dict, Tuple, Optional
+from .data_models import SchedulingProblem, Player, PartId, Room, TimeSlot, part_label
+from .bounds import ModelBounds, derive_bounds
+from .constants import ModelMode, LoadBalanceScope, ConstraintGroup
+from .instrumentation import Instrumentation, SolveStats
+
+# セッション変数のキー: (part, room_id, time_slot_id, instructor_id)
+SessionKey = Tuple[PartId, Optional[int], int, int]
+
+
+class SessionVarIndex:
+    """セッション変数のグループ索引（変数作成時に一度だけ構築する）"""
+    
+    def __init__(self, session_vars: Dict[SessionKey, cp_model.IntVar]):
+        self.by_part: Dict[PartId, List[cp_model.IntVar]] = {}
+        self.by_slot: Dict[int, List[cp_model.IntVar]] = {}
+        self.by_room_slot: Dict[Tuple[int, int], List[cp_model.IntVar]] = {}
+        self.by_part_slot: Dict[Tuple[PartId, int], List[cp_model.IntVar]] = {}
+        self.by_instructor: Dict[int, List[cp_model.IntVar]] = {}
+        self.by_instructor_slot: Dict[Tuple[int, int], List[cp_model.IntVar]] = {}
+        
+        for (part, room_id, time_slot_id, instructor_id), var in session_vars.items():
+            self.by_part.setdefault(part, []).append(var)
+            self.by_slot.setdefault(time_slot_id, []).append(var)
+            if room_id is not None:
+                self.by_room_slot.setdefault((room_id, time_slot_id), []).append(var)
+            self.by_part_slot.setdefault((part, time_slot_id), []).append(var)
+            self.by_instructor.setdefault(instructor_id, []).append(var)
+            self.by_instructor_slot.setdefault((instructor_id, time_slot_id), []).append(var)
 
 
 class SchedulingConstraints:
     """スケジューリングの制約条件を管理するクラス"""
     
-    def __init__(self, problem: SchedulingProblem):
+    def __init__(self, problem: SchedulingProblem, model_mode: str = ModelMode.FULL, use_assumptions: bool = False):
+        if model_mode not in (ModelMode.FULL, ModelMode.COMPACT):
+            raise ValueError(f"未対応のモデル形式です: {model_mode}")
         self.problem = problem
+        self.model_mode = model_mode
         self.model = cp_model.CpModel()
+        # use_assumptions=True の場合、制約グループ（ConstraintGroup）ごとの有効化リテラルを作成し、
+        # 各制約をそのリテラルが真のときだけ課す（仮定として与え、実行不可能な原因の特定に使う）。
+        # 冗長制約は他の制約グループから導かれるため、この場合は追加しない。
+        self.use_assumptions = use_assumptions
+        self.enforcement_literals: Dict[str, cp_model.IntVar] = {}
+        if use_assumptions:
+            for group in ConstraintGroup.ALL:
+                self.enforcement_literals[group] = self.model.NewBoolVar(f"enforce_{group}")
+        # 問題の規模から導出した上下限（均等割り振り・冗長制約・目的関数の補助変数の範囲に使う）
+        self.bounds: ModelBounds = derive_bounds(problem)
         
         # 変数定義: (part, room, time_slot, instructor) -> BoolVar
+        # COMPACTモードでは部屋を決定しないため room は None になる
         self.session_vars = {}
-        
+        self.var_index: Optional[SessionVarIndex] = None
+        # 再求解時に上限を書き換えるための容量制約: (room_id, time_slot_id) / time_slot_id -> Constraint
+        self.room_constraints: Dict[Tuple[int, int], cp_model.Constraint] = {}
+        self.slot_capacity_constraints: Dict[int, cp_model.Constraint] = {}
+    
+    @property
+    def room_keys(self) -> List[Optional[int]]:
+        """変数キーに使う部屋IDのリスト（COMPACTモードでは [None]）"""
+        if self.model_mode == ModelMode.COMPACT:
+            return [None]
+        return [room.id for room in self.problem.rooms]
+    
+    def _add(self, group: str, constraint: cp_model.Constraint) -> cp_model.Constraint:
+        """制約をグループの有効化リテラルに結び付ける（use_assumptions=False の場合はそのまま）"""
+        literal = self.enforcement_literals.get(group)
+        if literal is not None:
+            constraint.OnlyEnforceIf(literal)
+        return constraint
+    
     def create_variables(self):
         """最適化変数を作成"""
-        # 各パート、部屋、時間コマ、指導者の組み合わせに対する変数
+        # 各パート、部屋、時間コマ、指導可能な指導者の組み合わせに対する変数
         for part in self.problem.parts:
-            for room in self.problem.rooms:
+            for room_id in self.room_keys:
+                room_label = "any" if room_id is None else room_id
                 for time_slot in self.problem.time_slots:
-                    for instructor in self.problem.players:
-                        if instructor.is_instructor:
-                            var_name = f"session_{part.value}_{room.id}_{time_slot.id}_{instructor.id}"
-                            self.session_vars[(part, room.id, time_slot.id, instructor.id)] = \
-                                self.model.NewBoolVar(var_name)
+                    for instructor in self.problem.get_eligible_instructors(part):
+                        var_name = f"session_{part_label(part)}_{room_label}_{time_slot.id}_{instructor.id}"
+                        self.session_vars[(part, room_id, time_slot.id, instructor.id)] = \
+                            self.model.NewBoolVar(var_name)
+        
+        self.var_index = SessionVarIndex(self.session_vars)
     
     def add_basic_constraints(self):
         """基本的な制約条件を追加"""
         # 1. 各パートは1日に1回だけ練習する（指導者は誰でもいい）
         for part in self.problem.parts:
             # そのパートの全セッション（全時間コマ、全部屋、全指導者）
-            all_sessions_for_part = []
-            for room in self.problem.rooms:
-                for time_slot in self.problem.time_slots:
-                    for instructor in self.problem.players:
-                        if instructor.is_instructor:
-                            all_sessions_for_part.append(
-                                self.session_vars[(part, room.id, time_slot.id, instructor.id)]
-                            )
-            
-            # 各パートは1日に1回だけ練習する
+            all_sessions_for_part = self.var_index.by_part.get(part)
             if all_sessions_for_part:
-                self.model.Add(sum(all_sessions_for_part) == 1)
+                self._add(ConstraintGroup.PART_COUNT, self.model.Add(sum(all_sessions_for_part) == 1))
         
-        # 2. 各部屋は各時間コマに最大1つのセッション（1つのパートのみ練習可能）
+        # 2. 部屋の容量制約
+        if self.model_mode == ModelMode.COMPACT:
+            self._add_slot_capacity_constraints()
+        else:
+            self._add_room_constraints()
+    
+    def _add_room_constraints(self):
+        """各部屋は各時間コマに最大1つのセッション（1つのパートのみ練習可能）"""
         for room in self.problem.rooms:
             for time_slot in self.problem.time_slots:
-                sessions_in_room = []
-                for part in self.problem.parts:
-                    for instructor in self.problem.players:
-                        if instructor.is_instructor:
-                            sessions_in_room.append(
-                                self.session_vars[(part, room.id, time_slot.id, instructor.id)]
-                            )
+                sessions_in_room = self.var_index.by_room_slot.get((room.id, time_slot.id))
                 if sessions_in_room:
-                    self.model.Add(sum(sessions_in_room) <= 1)
+                    self.room_constraints[(room.id, time_slot.id)] = self._add(
+                        ConstraintGroup.ROOM_CONFLICT, self.model.Add(sum(sessions_in_room) <= 1)
+                    )
+    
+    def _add_slot_capacity_constraints(self):
+        """各時間コマのセッション数は部屋数以下（部屋は交換可能なので個別には区別しない）"""
+        num_rooms = len(self.problem.rooms)
+        for time_slot in self.problem.time_slots:
+            sessions_in_slot = self.var_index.by_slot.get(time_slot.id)
+            if sessions_in_slot:
+                self.slot_capacity_constraints[time_slot.id] = self._add(
+                    ConstraintGroup.ROOM_CONFLICT, self.model.Add(sum(sessions_in_slot) <= num_rooms)
+                )
     
     def add_instructor_constraints(self):
         """指導者に関する制約条件を追加"""
-        for instructor in self.problem.players:
-            if not instructor.is_instructor:
-                continue
-                
+        for instructor in self.problem.get_instructors():
             for time_slot in self.problem.time_slots:
-                # その指導者がその時間コマに指導するセッション数
-                instructor_sessions = []
-                for part in self.problem.parts:
-                    for room in self.problem.rooms:
-                        if (part, room.id, time_slot.id, instructor.id) in self.session_vars:
-                            instructor_sessions.append(
-                                self.session_vars[(part, room.id, time_slot.id, instructor.id)]
-                            )
-                
-                # その指導者の所属パートの練習数
-                own_part_sessions = []
-                for instructor_part in instructor.parts:
-                    for room in self.problem.rooms:
-                        if (instructor_part, room.id, time_slot.id, instructor.id) in self.session_vars:
-                            own_part_sessions.append(
-                                self.session_vars[(instructor_part, room.id, time_slot.id, instructor.id)]
-                            )
+                # その指導者がその時間コマに指導するセッション数（指導可能なパートのみ変数が存在）
+                instructor_sessions = self.var_index.by_instructor_slot.get((instructor.id, time_slot.id))
                 
                 # 同じ時間に指導数≤1（指導者は複数のパートを同時に指導できない）
                 if instructor_sessions:
-                    self.model.Add(sum(instructor_sessions) <= 1)
+                    self._add(ConstraintGroup.INSTRUCTOR_CONFLICT, self.model.Add(sum(instructor_sessions) <= 1))
     
     def add_player_constraints(self):
         """プレイヤーに関する制約条件を追加"""
@@ -96,39 +142,80 @@ class SchedulingConstraints:
     
     def add_equality_constraints(self):
         """均等割り振りのための制約条件を追加"""
-        # 各指導者の指導セッション数を均等にする
-        instructor_session_counts = []
-        for instructor in self.problem.players:
-            if not instructor.is_instructor:
-                continue
-                
-            sessions = []
-            for part in self.problem.parts:
-                for room in self.problem.rooms:
-                    for time_slot in self.problem.time_slots:
-                        if (part, room.id, time_slot.id, instructor.id) in self.session_vars:
-                            sessions.append(
-                                self.session_vars[(part, room.id, time_slot.id, instructor.id)]
-                            )
-            instructor_session_counts.append(sum(sessions))
+        # 各指導者のセッション数の差は最大1まで
+        # （合計はパート数なので、全員が パート数÷指導者数 の切り捨て〜切り上げに収まることと同値）
+        if self.problem.load_balance_scope == LoadBalanceScope.CUMULATIVE:
+            # 累積で均等にする場合は制約を課さない（目的関数で累積の差を最小化する）
+            return
+        bounds = self.bounds
+        for instructor in self.problem.get_instructors():
+            session_count = sum(self.var_index.by_instructor.get(instructor.id, []))
+            self._add(ConstraintGroup.EQUALITY, self.model.Add(session_count >= bounds.load_lower))
+            self._add(ConstraintGroup.EQUALITY, self.model.Add(session_count <= bounds.load_upper))
+    
+    def add_redundant_constraints(self):
+        """他の制約から導かれる冗長な制約を追加（LP緩和を強め、最適性の証明を速くする）"""
+        if self.use_assumptions:
+            # 制約グループを外しても冗長制約が残ると、原因の特定を誤るため追加しない
+            return
+        bounds = self.bounds
+        # セッション数の合計はパート数に等しい
+        all_sessions = list(self.session_vars.values())
+        if all_sessions:
+            self.model.Add(sum(all_sessions) == bounds.num_parts)
         
-        # 各指導者のセッション数の差を最小化（最大1差まで）
-        if len(instructor_session_counts) > 1:
-            for i in range(len(instructor_session_counts) - 1):
-                self.model.Add(
-                    instructor_session_counts[i] - instructor_session_counts[i + 1] <= 1
-                )
-                self.model.Add(
-                    instructor_session_counts[i + 1] - instructor_session_counts[i] <= 1
-                )
+        # 指導者のセッション数は 時間コマ数・指導可能パート数 以下
+        for instructor in self.problem.get_instructors():
+            sessions = self.var_index.by_instructor.get(instructor.id)
+            if sessions and bounds.instructor_capacity[instructor.id] < len(sessions):
+                self.model.Add(sum(sessions) <= bounds.instructor_capacity[instructor.id])
+        
+        # 時間コマのセッション数は 部屋数・指導者数 以下（COMPACTモードの部屋数の制約は設定済み）
+        slot_capacity = bounds.slot_capacity
+        if self.model_mode == ModelMode.COMPACT and slot_capacity >= len(self.problem.rooms):
+            return
+        for time_slot in self.problem.time_slots:
+            sessions_in_slot = self.var_index.by_slot.get(time_slot.id)
+            if sessions_in_slot and slot_capacity < len(sessions_in_slot):
+                self.model.Add(sum(sessions_in_slot) <= slot_capacity)
+    
+    def _set_upper_bound(self, constraint: cp_model.Constraint, upper_bound: int):
+        """線形制約（sum <= k）の上限を書き換える"""
+        # Proto() の戻り値を保持したまま参照する（一時オブジェクト経由の書き換えは不可）
+        model_proto = self.model.Proto()
+        domain = model_proto.constraints[constraint.Index()].linear.domain
+        domain[len(domain) - 1] = upper_bound
+    
+    def disable_room(self, room_id: int):
+        """部屋を使用不可にする（FULLモードのみ。部屋×時間コマの上限を0にする）"""
+        for time_slot in self.problem.time_slots:
+            constraint = self.room_constraints.get((room_id, time_slot.id))
+            if constraint is not None:
+                self._set_upper_bound(constraint, 0)
     
-    def setup_all_constraints(self):
-        """すべての制約条件を設定"""
-        self.create_variables()
-        self.add_basic_constraints()
-        self.add_instructor_constraints()
-        self.add_player_constraints()
-        self.add_equality_constraints()
+    def set_slot_capacity(self, capacity: int):
+        """各時間コマのセッション数の上限を変更する（COMPACTモードのみ）"""
+        for constraint in self.slot_capacity_constraints.values():
+            self._set_upper_bound(constraint, capacity)
+    
+    def disable_assignment(self, part: PartId, instructor_id: int):
+        """指導者がそのパートを指導できないようにする"""
+        sessions = [
+            var for (var_part, _, _, var_instructor_id), var in self.session_vars.items()
+            if var_part == part and var_instructor_id == instructor_id
+        ]
+        if sessions:
+            self.model.Add(sum(sessions) == 0)
+    
+    def setup_all_constraints(self, instrumentation: Optional[Instrumentation] = None,
+                              stats: Optional[SolveStats] = None):
+        """すべての制約条件を設定（instrumentation を指定すると各ステップの時間を計測）"""
+        if instrumentation is None:
+            instrumentation = Instrumentation()
+        for step in (self.create_variables, self.add_basic_constraints, self.add_instructor_constraints,
+                     self.add_player_constraints, self.add_equality_constraints,
+                     self.add_redundant_constraints):
+            with instrumentation.phase(step.__name__, stats):
+                step()
         
         return self.model
-
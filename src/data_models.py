@@ -1,10 +1,13 @@
 """
 データモデルの定義
 """
-from dataclasses import dataclass
-from typing import List, Dict, Optional
+from array import array
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple, Union
 from enum import Enum
-from .constants import ProblemConfig
+from .constants import CrossPartPolicy, LoadBalanceScope
+from .instrumentation import SolveStats
 
 
 class PartType(Enum):
@@ -20,12 +23,21 @@ class PartType(Enum):
     I = "I"
 
 
+# パートの識別子: PartType のほか、任意の文字列・整数など（ハッシュ可能な値）を使える
+PartId = Hashable
+
+
+def part_label(part: PartId) -> str:
+    """パートを表示・変数名用の文字列ラベルに変換"""
+    return part.value if isinstance(part, Enum) else str(part)
+
+
 @dataclass
 class Player:
     """プレイヤー（参加者）"""
     id: int
     name: str
-    parts: List[PartType]  # 所属パート（複数可）
+    parts: List[PartId]  # 所属パート（複数可）
     is_instructor: bool = False  # 指導者かどうか
     overlap_priority: int = 50  # 個人の重複優先度（0-100、0=制限なし）
 
@@ -48,20 +60,150 @@ class TimeSlot:
 class PracticeSession:
     """練習セッション"""
     id: int
-    part: PartType
+    part: PartId
     room_id: int
     time_slot_id: int
     instructor_id: int
     player_ids: List[int]  # 参加プレイヤーのIDリスト
 
 
+# 列の型コード（64bit整数。as_numpy() では np.int64 の配列として参照される）
+_INT_TYPECODE = "q"
+
+
+class PartRoster:
+    """パート→参加プレイヤーIDの対応表（CSR形式）
+    
+    パート i のプレイヤーIDは player_ids[offsets[i]:offsets[i + 1]]。
+    同じ問題から得られたすべての解で1つの表を共有する。
+    """
+    
+    def __init__(self, parts: Tuple[PartId, ...], offsets: array, player_ids: array):
+        assert len(offsets) == len(parts) + 1, "offsets の長さはパート数+1にしてください"
+        self.parts = parts
+        self.offsets = offsets
+        self.player_ids = player_ids
+    
+    @classmethod
+    def from_mapping(cls, parts: Iterable[PartId], players_by_part: Dict[PartId, Iterable[int]]) -> "PartRoster":
+        """パート→プレイヤーIDの辞書から作成"""
+        parts = tuple(parts)
+        offsets = array(_INT_TYPECODE, [0])
+        player_ids = array(_INT_TYPECODE)
+        for part in parts:
+            player_ids.extend(players_by_part.get(part, ()))
+            offsets.append(len(player_ids))
+        return cls(parts, offsets, player_ids)
+    
+    def get_player_ids(self, part_index: int) -> List[int]:
+        """パートの位置から参加プレイヤーIDのリストを取得（呼び出しごとに新しいリスト）"""
+        return self.player_ids[self.offsets[part_index]:self.offsets[part_index + 1]].tolist()
+    
+    def as_numpy(self) -> Tuple[Any, Any]:
+        """(offsets, player_ids) をコピーせずに NumPy 配列として参照する"""
+        import numpy as np
+        return np.frombuffer(self.offsets, dtype=np.int64), np.frombuffer(self.player_ids, dtype=np.int64)
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, PartRoster):
+            return NotImplemented
+        return self.parts == other.parts and self.offsets == other.offsets and self.player_ids == other.player_ids
+
+
+class SessionTable(Sequence):
+    """練習セッションの列指向の表現
+    
+    パートの位置・部屋ID・時間コマID・指導者IDを並列の整数配列で保持し、参加プレイヤーは
+    共有の PartRoster から引く。要素を参照すると PracticeSession をその場で作って返す
+    （セッションIDは表の中の位置。返されたオブジェクトを変更しても表には反映されない）。
+    """
+    
+    COLUMNS = ("part_index", "room_id", "time_slot_id", "instructor_id")
+    
+    def __init__(self, roster: PartRoster):
+        self.roster = roster
+        self.part_index = array(_INT_TYPECODE)
+        self.room_id = array(_INT_TYPECODE)
+        self.time_slot_id = array(_INT_TYPECODE)
+        self.instructor_id = array(_INT_TYPECODE)
+    
+    @classmethod
+    def from_sessions(cls, sessions: Iterable[PracticeSession],
+                      roster: Optional[PartRoster] = None) -> "SessionTable":
+        """PracticeSession のリストから作成（roster 未指定の場合はセッションの参加者から作成）"""
+        sessions = list(sessions)
+        if roster is None:
+            players_by_part = {}
+            for session in sessions:
+                players_by_part.setdefault(session.part, session.player_ids)
+            roster = PartRoster.from_mapping(players_by_part, players_by_part)
+        part_positions = {part: i for i, part in enumerate(roster.parts)}
+        table = cls(roster)
+        for session in sessions:
+            table.append(part_positions[session.part], session.room_id, session.time_slot_id, session.instructor_id)
+        return table
+    
+    def append(self, part_index: int, room_id: int, time_slot_id: int, instructor_id: int):
+        """セッションを1件追加"""
+        self.part_index.append(part_index)
+        self.room_id.append(room_id)
+        self.time_slot_id.append(time_slot_id)
+        self.instructor_id.append(instructor_id)
+    
+    def __len__(self) -> int:
+        return len(self.part_index)
+    
+    def __getitem__(self, index: Union[int, slice]):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("セッションの位置が範囲外です")
+        part_index = self.part_index[index]
+        return PracticeSession(
+            id=index,
+            part=self.roster.parts[part_index],
+            room_id=self.room_id[index],
+            time_slot_id=self.time_slot_id[index],
+            instructor_id=self.instructor_id[index],
+            player_ids=self.roster.get_player_ids(part_index)
+        )
+    
+    def as_numpy(self) -> Dict[str, Any]:
+        """各列をコピーせずに NumPy 配列（np.int64）として参照する（表に追加すると無効になる）"""
+        import numpy as np
+        return {name: np.frombuffer(getattr(self, name), dtype=np.int64) for name in self.COLUMNS}
+    
+    @property
+    def nbytes(self) -> int:
+        """列データのバイト数（共有の PartRoster は含まない）"""
+        return sum(len(getattr(self, name)) * getattr(self, name).itemsize for name in self.COLUMNS)
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, SessionTable):
+            return self.roster == other.roster and all(
+                getattr(self, name) == getattr(other, name) for name in self.COLUMNS
+            )
+        if isinstance(other, list):
+            return list(self) == other
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"SessionTable({len(self)} sessions)"
+
+
 @dataclass
 class SchedulingProblem:
     """スケジューリング問題の全体設定"""
     players: List[Player]  # プレイヤーリスト（指導者含む）
     rooms: List[Room]
     time_slots: List[TimeSlot]
-    parts: List[PartType]
+    parts: List[PartId]  # パートの識別子（PartType・文字列など）
+    cross_part_policy: str = CrossPartPolicy.OWN_PARTS  # 所属外パートの指導方針
+    # 指導者ID -> これまでに担当したセッション数（複数日の計画で前日までの負荷を持ち越す。均等性の目的関数にのみ加算）
+    instructor_load_offsets: Dict[int, int] = field(default_factory=dict)
+    load_balance_scope: str = LoadBalanceScope.DAY  # 均等割り振りの範囲（LoadBalanceScope参照）
     
     def __post_init__(self):
         """初期化後の検証"""
@@ -69,39 +211,190 @@ class SchedulingProblem:
         assert len(self.time_slots) > 0, "時間コマが設定されていません"
         assert len(self.parts) > 0, "パートが設定されていません"
         assert len(self.players) > 0, "プレイヤーが設定されていません"
+        assert len(set(self.parts)) == len(self.parts), "パートが重複しています"
+        assert len({room.id for room in self.rooms}) == len(self.rooms), "部屋IDが重複しています"
+        assert len({time_slot.id for time_slot in self.time_slots}) == len(self.time_slots), "時間コマIDが重複しています"
+        assert all(offset >= 0 for offset in self.instructor_load_offsets.values()), "持ち越しのセッション数が負です"
+        assert self.load_balance_scope in (LoadBalanceScope.DAY, LoadBalanceScope.CUMULATIVE), \
+            f"未対応の均等割り振りの範囲です: {self.load_balance_scope}"
+        
+        self._build_indexes()
+        for part in self.parts:
+            assert self._eligible_instructors[part], f"パート{part_label(part)}を指導できる指導者がいません"
+    
+    def _build_indexes(self):
+        """参照用の索引を一度だけ作成（構築後に players 等を変更した場合は再作成が必要）"""
+        # パート・部屋・時間コマを 0 から始まる連番に対応付ける（配列での表現に使う）
+        self._part_positions = {part: i for i, part in enumerate(self.parts)}
+        self._room_positions = {room.id: i for i, room in enumerate(self.rooms)}
+        self._time_slot_positions = {time_slot.id: i for i, time_slot in enumerate(self.time_slots)}
+        
+        self._instructors = tuple(player for player in self.players if player.is_instructor)
+        self._regular_players = tuple(player for player in self.players if not player.is_instructor)
+        self._player_by_id = {player.id: player for player in self.players}
+        
+        players_by_part = {part: [] for part in self.parts}
+        for player in self.players:
+            for part in dict.fromkeys(player.parts):
+                players_by_part.setdefault(part, []).append(player)
+        self._players_by_part = {part: tuple(players) for part, players in players_by_part.items()}
+        self._instructors_by_part = {
+            part: tuple(player for player in players if player.is_instructor)
+            for part, players in self._players_by_part.items()
+        }
+        self._regular_players_by_part = {
+            part: tuple(player for player in players if not player.is_instructor)
+            for part, players in self._players_by_part.items()
+        }
+        self._eligible_instructors = self._build_eligible_instructors()
+        self._part_groups: Optional[Dict[Tuple[PartId, ...], int]] = None  # get_part_groups() で作成
+        self._part_roster = PartRoster.from_mapping(
+            self.parts, {part: [player.id for player in players] for part, players in self._players_by_part.items()}
+        )
+    
+    def _build_eligible_instructors(self) -> Dict[PartId, Tuple[Player, ...]]:
+        """パート→指導可能な指導者の索引を作成"""
+        eligible = {}
+        for part in self.parts:
+            instructors = self._instructors_by_part.get(part, ())
+            if self.cross_part_policy == CrossPartPolicy.ANY or \
+                    (self.cross_part_policy == CrossPartPolicy.UNCOVERED and not instructors):
+                instructors = self._instructors
+            eligible[part] = instructors
+        return eligible
+    
+    def part_index(self, part: PartId) -> int:
+        """パートの位置（parts 内の 0 始まりの連番）"""
+        return self._part_positions[part]
+    
+    def room_index(self, room_id: int) -> int:
+        """部屋の位置（rooms 内の 0 始まりの連番）"""
+        return self._room_positions[room_id]
+    
+    def time_slot_index(self, time_slot_id: int) -> int:
+        """時間コマの位置（time_slots 内の 0 始まりの連番）"""
+        return self._time_slot_positions[time_slot_id]
+    
+    def get_part_groups(self) -> Dict[Tuple[PartId, ...], int]:
+        """所属パートの組み合わせ（parts の並び順）→ その組み合わせの一般プレイヤーの優先度の合計"""
+        if self._part_groups is None:
+            groups: Dict[Tuple[PartId, ...], int] = {}
+            for player in self._regular_players:
+                # 個人の優先度を取得（デフォルト50）
+                player_priority = getattr(player, 'overlap_priority', 50)
+                parts = tuple(sorted(
+                    (part for part in set(player.parts) if part in self._part_positions),
+                    key=self._part_positions.get
+                ))
+                groups[parts] = groups.get(parts, 0) + player_priority
+            self._part_groups = groups
+        return self._part_groups
+    
+    def get_part_roster(self) -> PartRoster:
+        """パート→参加プレイヤーIDの共有表（解の SessionTable が参照する）"""
+        return self._part_roster
+    
+    def get_instructors(self) -> Tuple[Player, ...]:
+        """指導者リストを取得"""
+        return self._instructors
     
-    def get_players_by_part(self, part: PartType) -> List[Player]:
+    def get_regular_players(self) -> Tuple[Player, ...]:
+        """一般プレイヤーリストを取得"""
+        return self._regular_players
+    
+    def get_player(self, player_id: int) -> Player:
+        """IDからプレイヤーを取得"""
+        return self._player_by_id[player_id]
+    
+    def get_load_offset(self, instructor_id: int) -> int:
+        """指導者の持ち越しのセッション数（未指定は0）"""
+        return self.instructor_load_offsets.get(instructor_id, 0)
+    
+    def get_eligible_instructors(self, part: PartId) -> Tuple[Player, ...]:
+        """指定されたパートを指導できる指導者リストを取得（cross_part_policy を反映）"""
+        return self._eligible_instructors.get(part, ())
+    
+    def get_players_by_part(self, part: PartId) -> Tuple[Player, ...]:
         """指定されたパートのプレイヤーリストを取得"""
-        return [player for player in self.players if part in player.parts]
+        return self._players_by_part.get(part, ())
     
-    def get_instructors_by_part(self, part: PartType) -> List[Player]:
+    def get_instructors_by_part(self, part: PartId) -> Tuple[Player, ...]:
         """指定されたパートの指導者リストを取得"""
-        return [player for player in self.players if part in player.parts and player.is_instructor]
+        return self._instructors_by_part.get(part, ())
     
-    def get_regular_players_by_part(self, part: PartType) -> List[Player]:
+    def get_regular_players_by_part(self, part: PartId) -> Tuple[Player, ...]:
         """指定されたパートの一般プレイヤーリストを取得"""
-        return [player for player in self.players if part in player.parts and not player.is_instructor]
+        return self._regular_players_by_part.get(part, ())
+
+
+@dataclass
+class ProblemChange:
+    """既存の問題に対する変更（再求解用）"""
+    updated_players: List[Player] = field(default_factory=list)  # 追加・更新するプレイヤー（IDで置き換え）
+    removed_player_ids: List[int] = field(default_factory=list)  # 削除するプレイヤーのID
+    added_rooms: List[Room] = field(default_factory=list)  # 追加する部屋
+    removed_room_ids: List[int] = field(default_factory=list)  # 使用できなくなった部屋のID
+    
+    def apply_to(self, problem: SchedulingProblem) -> SchedulingProblem:
+        """変更を適用した新しい問題を作成"""
+        updated = {player.id: player for player in self.updated_players}
+        removed_players = set(self.removed_player_ids)
+        players = [updated.pop(player.id, player) for player in problem.players if player.id not in removed_players]
+        players.extend(player for player in updated.values() if player.id not in removed_players)
+        
+        removed_rooms = set(self.removed_room_ids)
+        rooms = [room for room in problem.rooms if room.id not in removed_rooms] + list(self.added_rooms)
+        
+        return SchedulingProblem(
+            players=players,
+            rooms=rooms,
+            time_slots=list(problem.time_slots),
+            parts=list(problem.parts),
+            cross_part_policy=problem.cross_part_policy,
+            instructor_load_offsets=dict(problem.instructor_load_offsets),
+            load_balance_scope=problem.load_balance_scope
+        )
 
 
 @dataclass
 class SchedulingSolution:
     """スケジューリングの解"""
-    sessions: List[PracticeSession]
+    sessions: Sequence  # PracticeSession のリスト、または列指向の SessionTable
     objective_value: float
     is_optimal: bool
     solve_time_seconds: float
+    best_bound: Optional[float] = None  # ソルバーが示した目的関数の下界
+    gap: Optional[float] = None  # ソルバーの目的関数値と下界の相対ギャップ
+    stats: Optional[SolveStats] = None  # 求解時の計測結果（フェーズ別時間・モデル規模など）
+    # 問題の時間コマID・部屋IDの並び（スケジュールマトリックスの行・列に対応）
+    time_slot_ids: Optional[List[int]] = None
+    room_ids: Optional[List[int]] = None
     
-    def get_schedule_matrix(self) -> Dict[int, Dict[int, List[PracticeSession]]]:
-        """時間コマ×部屋のスケジュールマトリックスを返す（複数セッション対応）"""
-        matrix = {}
-        num_time_slots = ProblemConfig.get_num_time_slots()
-        for time_slot in range(1, num_time_slots + 1):  # 時間コマID: 計算で決定
-            matrix[time_slot] = {}
-            for room in range(1, ProblemConfig.NUM_ROOMS + 1):  # 部屋ID: 1, 2, 3, 4, 5
-                matrix[time_slot][room] = []
-
+    @property
+    def table(self) -> SessionTable:
+        """列指向のセッション表（sessions がリストの場合は変換する）"""
+        if isinstance(self.sessions, SessionTable):
+            return self.sessions
+        return SessionTable.from_sessions(self.sessions)
+    
+    def get_schedule_matrix(self) -> List[List[List[PracticeSession]]]:
+        """時間コマ×部屋のスケジュールマトリックスを返す（複数セッション対応）
+        
+        matrix[時間コマの位置][部屋の位置] がその枠のセッションのリストになる。
+        位置は time_slot_ids / room_ids の並び順（未設定の場合はセッションに現れるIDの昇順）。
+        """
+        time_slot_ids = self.time_slot_ids
+        if time_slot_ids is None:
+            time_slot_ids = sorted({session.time_slot_id for session in self.sessions})
+        room_ids = self.room_ids
+        if room_ids is None:
+            room_ids = sorted({session.room_id for session in self.sessions})
+        time_slot_positions = {time_slot_id: i for i, time_slot_id in enumerate(time_slot_ids)}
+        room_positions = {room_id: i for i, room_id in enumerate(room_ids)}
+        
+        matrix = [[[] for _ in room_ids] for _ in time_slot_ids]
         for session in self.sessions:
-            matrix[session.time_slot_id][session.room_id].append(session)
-
+            matrix[time_slot_positions[session.time_slot_id]][room_positions[session.room_id]].append(session)
+        
         return matrix
 
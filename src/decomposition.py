@@ -0,0 +1,358 @@
+"""
+大規模問題の分割求解（共通のプレイヤーでパートをクラスタに分け、部分問題を並列に解く）
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+from ortools.sat.python import cp_model
+from .data_models import SchedulingProblem, SchedulingSolution
+from .heuristic import HeuristicSolver
+from .scheduling_optimizer import SchedulingOptimizer
+from .solver_config import SolverConfig
+from .batch import split_workers
+from .instrumentation import Instrumentation, LoggingInstrumentation, SolveStats
+from .constants import SchedulingConfig, DecompositionDefaults, ModelMode
+
+
+@dataclass
+class DecompositionConfig:
+    """分割求解の設定"""
+    max_cluster_size: int = DecompositionDefaults.MAX_CLUSTER_SIZE  # 1つの部分問題のパート数の上限
+    assignment_time_limit: float = DecompositionDefaults.ASSIGNMENT_TIME_LIMIT  # 指導者割り当ての時間制限（秒）
+    cluster_time_limit: float = DecompositionDefaults.CLUSTER_TIME_LIMIT  # 部分問題ごとの時間制限（秒）
+    repair_time_limit: float = DecompositionDefaults.REPAIR_TIME_LIMIT  # 局所探索による調整の時間制限（秒）
+    polish_time_limit: float = DecompositionDefaults.POLISH_TIME_LIMIT  # 全体モデルでの仕上げの時間制限（秒）
+    max_workers: Optional[int] = None  # 同時に解く部分問題の数（None=CPUコア数）
+    random_seed: int = SchedulingConfig.DEFAULT_RANDOM_SEED  # 乱数シード
+    
+    def __post_init__(self):
+        """初期化後の検証"""
+        assert self.max_cluster_size >= 1, "部分問題のパート数の上限は1以上を指定してください"
+        assert self.assignment_time_limit > 0 and self.cluster_time_limit > 0 and self.repair_time_limit > 0, \
+            "時間制限は正の値を指定してください"
+        assert self.polish_time_limit >= 0, "仕上げの時間制限は0以上を指定してください"
+
+
+def build_part_graph(problem: SchedulingProblem) -> Dict[Tuple[int, int], int]:
+    """パートの共通所属グラフ: (パートの位置, パートの位置) -> 両方に所属する一般プレイヤーの優先度の合計
+    
+    辺の重みは、2つのパートを同じ時間コマに置いたときに増える重複ペナルティに等しい。
+    """
+    edges: Dict[Tuple[int, int], int] = {}
+    for parts, priority in problem.get_part_groups().items():
+        # 目的関数と同じく、所属パートが1つ以下または優先度0のグループはペナルティが生じない
+        if len(parts) < 2 or priority == 0:
+            continue
+        positions = [problem.part_index(part) for part in parts]
+        for a in range(len(positions)):
+            for b in range(a + 1, len(positions)):
+                edges[(positions[a], positions[b])] = edges.get((positions[a], positions[b]), 0) + priority
+    return edges
+
+
+def cluster_parts(problem: SchedulingProblem,
+                  max_cluster_size: int = DecompositionDefaults.MAX_CLUSTER_SIZE) -> List[List[int]]:
+    """共通所属グラフを、クラスタ間の辺の重みの合計が小さくなるようにパートの位置のクラスタに分割
+    
+    重い辺から順にクラスタを併合し（大きさの上限まで）、残ったクラスタは結び付きの強いものから詰め合わせる。
+    """
+    num_parts = len(problem.parts)
+    edges = build_part_graph(problem)
+    
+    parent = list(range(num_parts))
+    size = [1] * num_parts
+    
+    def find(p: int) -> int:
+        while parent[p] != p:
+            parent[p] = parent[parent[p]]
+            p = parent[p]
+        return p
+    
+    for (p, q), _ in sorted(edges.items(), key=lambda item: -item[1]):
+        root_p, root_q = find(p), find(q)
+        if root_p != root_q and size[root_p] + size[root_q] <= max_cluster_size:
+            parent[root_q] = root_p
+            size[root_p] += size[root_q]
+    
+    components: Dict[int, List[int]] = {}
+    for p in range(num_parts):
+        components.setdefault(find(p), []).append(p)
+    
+    # 大きいクラスタから、結び付きの最も強い（同じなら最も大きい）入りきるクラスタにまとめる
+    neighbors: Dict[int, Dict[int, int]] = {}
+    for (p, q), weight in edges.items():
+        neighbors.setdefault(p, {})[q] = weight
+        neighbors.setdefault(q, {})[p] = weight
+    clusters: List[List[int]] = []
+    cluster_of: Dict[int, int] = {}
+    for component in sorted(components.values(), key=lambda parts: (-len(parts), parts[0])):
+        links: Dict[int, int] = {}
+        for p in component:
+            for q, weight in neighbors.get(p, {}).items():
+                if q in cluster_of:
+                    links[cluster_of[q]] = links.get(cluster_of[q], 0) + weight
+        candidates = [c for c in range(len(clusters)) if len(clusters[c]) + len(component) <= max_cluster_size]
+        if candidates:
+            target = max(candidates, key=lambda c: (links.get(c, 0), len(clusters[c])))
+        else:
+            target = len(clusters)
+            clusters.append([])
+        clusters[target].extend(component)
+        for p in component:
+            cluster_of[p] = target
+    
+    return [sorted(cluster) for cluster in clusters]
+
+
+def allocate_room_budgets(cluster_sizes: List[int], num_time_slots: int, num_rooms: int) -> List[List[int]]:
+    """部屋×時間コマの枠をクラスタに配分（budgets[c][s] = クラスタ c が時間コマ s に使える部屋数）
+    
+    枠を部屋ごとに時間コマ順に並べて連続して配るため、各クラスタの枠はなるべく多くの時間コマに分散する。
+    余った枠はパート数に比例して配る。
+    """
+    total_cells = num_time_slots * num_rooms
+    total_parts = sum(cluster_sizes)
+    spare = max(0, total_cells - total_parts)
+    budgets = [[0] * num_time_slots for _ in cluster_sizes]
+    cell = 0
+    for c, cluster_size in enumerate(cluster_sizes):
+        if c == len(cluster_sizes) - 1:
+            share = max(cluster_size, total_cells - cell)
+        else:
+            share = cluster_size + spare * cluster_size // max(1, total_parts)
+        for _ in range(share):
+            budgets[c][cell % num_time_slots] += 1
+            cell += 1
+    return budgets
+
+
+class DecompositionSolver:
+    """大規模問題をクラスタごとの部分問題に分割して解く
+    
+    1. 指導者割り当て: パート→指導者だけを決める小さなモデルを解く（均等割り振り項はここで決まる）
+    2. クラスタ分割: 共通所属グラフをクラスタに分け、部屋×時間コマの枠と、複数のクラスタを担当する
+       指導者の時間コマをクラスタに配分する
+    3. 部分問題: クラスタごとにパート→時間コマを決めるモデルを並列に解く（配分を守れば全体で制約を満たす）
+    4. 調整: クラスタ間の重複ペナルティを含めて局所探索で改善し、必要なら全体モデルをヒント付きで解く
+    """
+    
+    def __init__(self, problem: SchedulingProblem,
+                 equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+                 config: Optional[DecompositionConfig] = None,
+                 instrumentation: Optional[Instrumentation] = None):
+        self.problem = problem
+        self.equality_weight = equality_weight
+        self.config = config if config is not None else DecompositionConfig()
+        self.instrumentation = instrumentation if instrumentation is not None else LoggingInstrumentation()
+        self.heuristic = HeuristicSolver(problem, equality_weight, self.config.random_seed)
+        self.num_time_slots = len(problem.time_slots)
+        self.num_rooms = len(problem.rooms)
+    
+    def solve(self) -> Optional[SchedulingSolution]:
+        """分割して解く（時間割が見つからなければ None）"""
+        start_time = time.time()
+        stats = SolveStats()
+        
+        self.instrumentation.event("パートをクラスタに分割中...")
+        with self.instrumentation.phase("cluster_parts", stats):
+            clusters = cluster_parts(self.problem, self.config.max_cluster_size)
+        self.instrumentation.event(f"クラスタ数: {len(clusters)}（最大{max(len(cluster) for cluster in clusters)}パート）")
+        
+        self.instrumentation.event("指導者を割り当て中...")
+        with self.instrumentation.phase("assign_instructors", stats):
+            instructor_of = self._assign_instructors(clusters)
+        
+        slot_of = [-1] * len(self.problem.parts)
+        if instructor_of is None:
+            self.instrumentation.event("指導者の割り当てが見つからないため、局所探索のみで解きます")
+            instructor_of = [-1] * len(self.problem.parts)
+        else:
+            self.instrumentation.event("部分問題を求解中...")
+            with self.instrumentation.phase("solve_clusters", stats):
+                self._solve_clusters(clusters, instructor_of, slot_of)
+        
+        self.instrumentation.event("局所探索で調整中...")
+        with self.instrumentation.phase("repair", stats):
+            solution = self.heuristic.solve(self.config.repair_time_limit, slot_of, instructor_of)
+        
+        if solution is not None and self.config.polish_time_limit > 0:
+            self.instrumentation.event("全体モデルで仕上げ中...")
+            with self.instrumentation.phase("polish", stats):
+                polished = self._polish(solution)
+            if polished is not None and polished.objective_value <= solution.objective_value:
+                solution = polished
+        
+        if solution is None:
+            self.instrumentation.event("解が見つかりませんでした")
+        else:
+            solution.solve_time_seconds = time.time() - start_time
+            solution.stats = stats
+            self.instrumentation.event(f"目的関数値: {solution.objective_value}")
+        self.instrumentation.finish(stats)
+        return solution
+    
+    def _assign_instructors(self, clusters: List[List[int]]) -> Optional[List[int]]:
+        """パート→指導者の位置を決める（均等割り振りを最適化し、指導者の担当クラスタ数を少なくする）"""
+        heuristic = self.heuristic
+        model = cp_model.CpModel()
+        assign = {
+            (p, i): model.NewBoolVar(f"assign_{p}_{i}")
+            for p in range(heuristic.num_parts) for i in heuristic.eligible[p]
+        }
+        for p in range(heuristic.num_parts):
+            model.Add(sum(assign[(p, i)] for i in heuristic.eligible[p]) == 1)
+        
+        loads = [
+            sum(var for (_, var_instructor), var in assign.items() if var_instructor == i)
+            for i in range(heuristic.num_instructors)
+        ]
+        bounds = heuristic.evaluator.bounds
+        for load in loads:
+            # 指導者は同じ時間コマに1つしか指導できず、均等割り振り制約の範囲に収める
+            model.Add(load <= self.num_time_slots)
+            model.Add(load >= bounds.load_lower)
+            model.Add(load <= bounds.load_upper)
+        
+        # 指導者が担当するクラスタ（複数のクラスタを担当すると時間コマを分け合う必要がある）
+        cluster_of = {p: c for c, cluster in enumerate(clusters) for p in cluster}
+        spans = {}
+        for (p, i), var in assign.items():
+            key = (i, cluster_of[p])
+            if key not in spans:
+                spans[key] = model.NewBoolVar(f"span_{i}_{cluster_of[p]}")
+            model.AddImplication(var, spans[key])
+        
+        # 均等割り振り項を優先し、同じ値の中で担当クラスタ数を最小化
+        objective = sum(spans.values())
+        if len(loads) > 1:
+            # 持ち越しのセッション数を加えた累積で比べる（SchedulingObjectives と同じ）
+            offsets = heuristic.load_offsets
+            lower, upper = bounds.load_lower + min(offsets), bounds.load_upper + max(offsets)
+            max_var = model.NewIntVar(lower, upper, "max_sessions")
+            min_var = model.NewIntVar(lower, upper, "min_sessions")
+            for load, offset in zip(loads, offsets):
+                model.Add(load + offset <= max_var)
+                model.Add(load + offset >= min_var)
+            objective = (len(spans) + 1) * self.equality_weight * (max_var - min_var) + objective
+        model.Minimize(objective)
+        
+        solver = cp_model.CpSolver()
+        SolverConfig(random_seed=self.config.random_seed).apply_to(solver.parameters, self.config.assignment_time_limit)
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        instructor_of = [-1] * heuristic.num_parts
+        for (p, i), var in assign.items():
+            if solver.Value(var):
+                instructor_of[p] = i
+        return instructor_of
+    
+    def _allocate_instructor_slots(self, clusters: List[List[int]], instructor_of: List[int],
+                                   room_budgets: List[List[int]]) -> Dict[Tuple[int, int], List[int]]:
+        """指導者の時間コマを担当クラスタに配分: (指導者の位置, クラスタ) -> 使える時間コマの位置"""
+        counts: Dict[int, Dict[int, int]] = {}
+        for c, cluster in enumerate(clusters):
+            for p in cluster:
+                per_cluster = counts.setdefault(instructor_of[p], {})
+                per_cluster[c] = per_cluster.get(c, 0) + 1
+        
+        allowed: Dict[Tuple[int, int], List[int]] = {}
+        for i, per_cluster in counts.items():
+            if len(per_cluster) == 1:
+                allowed[(i, next(iter(per_cluster)))] = list(range(self.num_time_slots))
+                continue
+            # 担当パートの多いクラスタから、そのクラスタの部屋の枠が多い時間コマを必要数だけ取る
+            free = set(range(self.num_time_slots))
+            for c, count in sorted(per_cluster.items(), key=lambda item: (-item[1], item[0])):
+                chosen = sorted(free, key=lambda s: (-room_budgets[c][s], s))[:count]
+                allowed[(i, c)] = chosen
+                free.difference_update(chosen)
+            # 残りの時間コマは部屋の枠が最も多いクラスタに渡す
+            for s in sorted(free):
+                c = max(per_cluster, key=lambda c: (room_budgets[c][s], -c))
+                allowed[(i, c)].append(s)
+        return allowed
+    
+    def _solve_clusters(self, clusters: List[List[int]], instructor_of: List[int], slot_of: List[int]):
+        """クラスタごとの部分問題を並列に解き、slot_of に時間コマの位置を書き込む"""
+        room_budgets = allocate_room_budgets([len(cluster) for cluster in clusters],
+                                             self.num_time_slots, self.num_rooms)
+        instructor_slots = self._allocate_instructor_slots(clusters, instructor_of, room_budgets)
+        max_workers, workers_per_cluster = split_workers(len(clusters), self.config.max_workers)
+        
+        def solve_one(c: int) -> Tuple[int, Optional[Dict[int, int]]]:
+            cluster = clusters[c]
+            allowed = {p: instructor_slots[(instructor_of[p], c)] for p in cluster}
+            slots = self._solve_cluster(cluster, instructor_of, room_budgets[c], allowed, workers_per_cluster)
+            if slots is None:
+                # 配分の下で解けない場合は配分を外して解く（クラスタ間の重複は調整で解消する）
+                all_slots = list(range(self.num_time_slots))
+                slots = self._solve_cluster(cluster, instructor_of, [self.num_rooms] * self.num_time_slots,
+                                            {p: all_slots for p in cluster}, workers_per_cluster)
+            return c, slots
+        
+        # CP-SATは求解中にGILを解放するため、部分問題はスレッドで並列に解ける
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for c, slots in executor.map(solve_one, range(len(clusters))):
+                if slots is None:
+                    self.instrumentation.event(f"クラスタ{c}の部分問題が解けませんでした")
+                    continue
+                for p, s in slots.items():
+                    slot_of[p] = s
+    
+    def _solve_cluster(self, cluster: List[int], instructor_of: List[int], room_budget: List[int],
+                       allowed_slots: Dict[int, List[int]], num_workers: int) -> Optional[Dict[int, int]]:
+        """1つのクラスタのパート→時間コマを決める（クラスタ内の重複ペナルティを最小化）"""
+        model = cp_model.CpModel()
+        place = {
+            (p, s): model.NewBoolVar(f"place_{p}_{s}")
+            for p in cluster for s in allowed_slots[p]
+        }
+        for p in cluster:
+            model.Add(sum(place[(p, s)] for s in allowed_slots[p]) == 1)
+        
+        by_slot: Dict[int, List[cp_model.IntVar]] = {}
+        by_instructor_slot: Dict[Tuple[int, int], List[cp_model.IntVar]] = {}
+        for (p, s), var in place.items():
+            by_slot.setdefault(s, []).append(var)
+            by_instructor_slot.setdefault((instructor_of[p], s), []).append(var)
+        for s, sessions in by_slot.items():
+            model.Add(sum(sessions) <= room_budget[s])
+        for sessions in by_instructor_slot.values():
+            if len(sessions) > 1:
+                model.Add(sum(sessions) <= 1)
+        
+        # クラスタ内の所属パートが2つ以上のグループの重複ペナルティ（評価器と同じグループ・重み）
+        members = set(cluster)
+        groups: Dict[Tuple[int, ...], int] = {}
+        for row, weight in zip(self.heuristic.evaluator.group_matrix, self.heuristic.evaluator.group_weights):
+            parts = tuple(int(p) for p in row.nonzero()[0] if p in members)
+            if len(parts) >= 2:
+                groups[parts] = groups.get(parts, 0) + int(weight)
+        violations, weights = [], []
+        for g, (parts, weight) in enumerate(groups.items()):
+            for s in range(self.num_time_slots):
+                indicators = [place[(p, s)] for p in parts if (p, s) in place]
+                if len(indicators) > 1:
+                    violation = model.NewIntVar(0, len(indicators) - 1, f"group_violation_{g}_{s}")
+                    model.Add(violation >= sum(indicators) - 1)
+                    violations.append(violation)
+                    weights.append(weight)
+        if violations:
+            model.Minimize(cp_model.LinearExpr.WeightedSum(violations, weights))
+        
+        solver = cp_model.CpSolver()
+        SolverConfig(num_search_workers=num_workers, random_seed=self.config.random_seed).apply_to(
+            solver.parameters, self.config.cluster_time_limit)
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            return None
+        return {p: s for (p, s), var in place.items() if solver.Value(var)}
+    
+    def _polish(self, solution: SchedulingSolution) -> Optional[SchedulingSolution]:
+        """全体モデル（部屋を区別しない形式）を、調整後の解をヒントにして解く"""
+        optimizer = SchedulingOptimizer(self.problem, instrumentation=self.instrumentation)
+        optimizer.build_model(self.equality_weight, ModelMode.COMPACT)
+        return optimizer.resolve(solution, time_limit_seconds=self.config.polish_time_limit,
+                                 solver_config=SolverConfig(random_seed=self.config.random_seed))
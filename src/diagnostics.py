@@ -0,0 +1,81 @@
+"""
+実行不可能な問題の診断（求解前の容量チェックと診断結果）
+"""
+from dataclasses import dataclass, field
+from typing import List, Optional
+from .data_models import SchedulingProblem
+from .bounds import derive_bounds
+from .constants import ConstraintGroup, LoadBalanceScope
+
+
+@dataclass
+class InfeasibilityReport:
+    """実行不可能な問題の診断結果"""
+    conflicting_groups: List[str]  # 同時には満たせない制約グループ（ConstraintGroup）の組
+    messages: List[str] = field(default_factory=list)  # 原因の説明
+    # 求解前の容量チェックで判明したか（False=ソルバーの仮定による診断）
+    from_capacity_check: bool = False
+    # conflicting_groups が最小（どのグループを外しても実行可能）であることを確認したか
+    is_minimal: bool = False
+    
+    def describe(self) -> str:
+        """診断結果を文章にする"""
+        lines = ["同時に満たせない制約: " + "、".join(
+            ConstraintGroup.DESCRIPTIONS.get(group, group) for group in self.conflicting_groups
+        )]
+        lines.extend(f"- {message}" for message in self.messages)
+        return "\n".join(lines)
+
+
+def check_capacity(problem: SchedulingProblem) -> Optional[InfeasibilityReport]:
+    """ソルバーを使わずに、部屋・時間コマ・指導者の容量が足りるかを調べる（足りなければ診断結果を返す）
+    
+    ここで見つかる不足は必ず実行不可能だが、見つからなくても実行可能とは限らない。
+    """
+    bounds = derive_bounds(problem)
+    num_rooms, num_time_slots = len(problem.rooms), len(problem.time_slots)
+    
+    # 部屋×時間コマの枠がパート数より少ない
+    if bounds.num_parts > num_rooms * num_time_slots:
+        return InfeasibilityReport(
+            conflicting_groups=[ConstraintGroup.PART_COUNT, ConstraintGroup.ROOM_CONFLICT],
+            messages=[f"パート数({bounds.num_parts})が 部屋数×時間コマ数({num_rooms}×{num_time_slots}) を超えています"],
+            from_capacity_check=True, is_minimal=True
+        )
+    
+    # 指導者が担当できるセッション数の合計がパート数より少ない
+    total_capacity = sum(bounds.instructor_capacity.values())
+    if bounds.num_parts > total_capacity:
+        return InfeasibilityReport(
+            conflicting_groups=[ConstraintGroup.PART_COUNT, ConstraintGroup.INSTRUCTOR_CONFLICT],
+            messages=[f"パート数({bounds.num_parts})が 指導者が担当できるセッション数の合計({total_capacity}) を超えています"
+                      f"（各指導者は 時間コマ数・指導可能パート数 まで）"],
+            from_capacity_check=True, is_minimal=True
+        )
+    
+    if problem.load_balance_scope == LoadBalanceScope.DAY:
+        # 均等割り振りの下限に届かない指導者がいる
+        messages = [
+            f"{instructor.name}が担当できるセッション数({bounds.instructor_capacity[instructor.id]})が"
+            f"均等割り振りの下限({bounds.load_lower})未満です"
+            for instructor in problem.get_instructors()
+            if bounds.instructor_capacity[instructor.id] < bounds.load_lower
+        ]
+        if messages:
+            return InfeasibilityReport(
+                conflicting_groups=[ConstraintGroup.PART_COUNT, ConstraintGroup.INSTRUCTOR_CONFLICT,
+                                    ConstraintGroup.EQUALITY],
+                messages=messages, from_capacity_check=True
+            )
+        
+        # 均等割り振りの上限で頭打ちにした担当可能数の合計がパート数より少ない
+        capped_capacity = sum(min(capacity, bounds.load_upper) for capacity in bounds.instructor_capacity.values())
+        if bounds.num_parts > capped_capacity:
+            return InfeasibilityReport(
+                conflicting_groups=[ConstraintGroup.PART_COUNT, ConstraintGroup.INSTRUCTOR_CONFLICT,
+                                    ConstraintGroup.EQUALITY],
+                messages=[f"均等割り振りの上限({bounds.load_upper})では指導者が担当できるセッション数の合計"
+                          f"({capped_capacity})がパート数({bounds.num_parts})に届きません"],
+                from_capacity_check=True
+            )
+    return None
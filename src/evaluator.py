@@ -0,0 +1,226 @@
+"""
+CP-SATを使わない解の評価・検証（NumPyによるベクトル化）
+"""
+from dataclasses import dataclass
+from typing import Dict, Sequence, Tuple, Union
+import numpy as np
+from .data_models import SchedulingProblem, SchedulingSolution, PracticeSession, SessionTable
+from .bounds import derive_bounds
+from .constants import SchedulingConfig
+
+# 評価する制約違反の種類
+VIOLATION_KINDS = (
+    "unknown_id",           # 問題に存在しない部屋・時間コマ・指導者・パート
+    "part_count",           # 各パートは1回だけ練習する
+    "room_conflict",        # 各部屋・時間コマに最大1セッション
+    "instructor_conflict",  # 指導者は同じ時間コマに1セッションまで
+    "ineligible",           # 指導できないパートの指導
+    "equality",             # セッション数が均等割り振りの範囲外の指導者（差は最大1まで）
+)
+
+# 評価対象: 解・セッション表・PracticeSession のリスト
+Timetable = Union[SchedulingSolution, SessionTable, Sequence[PracticeSession]]
+
+
+@dataclass
+class BatchEvaluation:
+    """複数の時間割の評価結果（各配列の長さは時間割の数）"""
+    objective_value: np.ndarray  # モデルの目的関数値（均等割り振り項＋重複ペナルティ）
+    equality_term: np.ndarray
+    penalty_term: np.ndarray
+    violations: Dict[str, np.ndarray]  # 制約の種類 -> 違反数
+    
+    @property
+    def is_feasible(self) -> np.ndarray:
+        """すべての制約を満たすかどうか"""
+        return sum(self.violations.values()) == 0
+    
+    def __len__(self) -> int:
+        return len(self.objective_value)
+    
+    def __getitem__(self, index: int) -> "Evaluation":
+        return Evaluation(
+            objective_value=float(self.objective_value[index]),
+            equality_term=float(self.equality_term[index]),
+            penalty_term=float(self.penalty_term[index]),
+            violations={kind: int(counts[index]) for kind, counts in self.violations.items()}
+        )
+
+
+@dataclass
+class Evaluation:
+    """1つの時間割の評価結果"""
+    objective_value: float
+    equality_term: float
+    penalty_term: float
+    violations: Dict[str, int]
+    
+    @property
+    def is_feasible(self) -> bool:
+        """すべての制約を満たすかどうか"""
+        return not any(self.violations.values())
+
+
+class SolutionEvaluator:
+    """SchedulingConstraints の制約と SchedulingObjectives の目的関数で時間割を評価する
+    
+    目的関数は モデルと同じく equality_weight ×（指導者のセッション数（持ち越し分を含む）の最大−最小）と、
+    所属パートの組み合わせごとの重複ペナルティ（優先度の合計 × max(0, 同じ時間コマの所属パート数 − 1)）の和。
+    再求解時の変更数ペナルティなどの追加項は含まない。
+    """
+    
+    def __init__(self, problem: SchedulingProblem,
+                 equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT):
+        self.problem = problem
+        self.equality_weight = equality_weight
+        self.num_parts = len(problem.parts)
+        self.num_rooms = len(problem.rooms)
+        self.num_time_slots = len(problem.time_slots)
+        self.instructor_ids = [instructor.id for instructor in problem.get_instructors()]
+        self.num_instructors = len(self.instructor_ids)
+        self._instructor_positions = {instructor_id: i for i, instructor_id in enumerate(self.instructor_ids)}
+        self._part_positions = {part: i for i, part in enumerate(problem.parts)}
+        self._room_positions = {room.id: i for i, room in enumerate(problem.rooms)}
+        self._time_slot_positions = {time_slot.id: i for i, time_slot in enumerate(problem.time_slots)}
+        self.bounds = derive_bounds(problem)
+        # 指導者ごとの持ち越しのセッション数（均等性の項にのみ加算）
+        self.load_offsets = np.array([problem.get_load_offset(instructor_id) for instructor_id in self.instructor_ids],
+                                     dtype=np.int64)
+        
+        # パート×指導者の指導可否
+        self.eligible = np.zeros((self.num_parts, self.num_instructors), dtype=bool)
+        for part in problem.parts:
+            for instructor in problem.get_eligible_instructors(part):
+                self.eligible[problem.part_index(part), self._instructor_positions[instructor.id]] = True
+        
+        # ペナルティの生じるグループ（所属パートが2つ以上かつ優先度が0でない）の所属行列と重み
+        groups = [(parts, priority) for parts, priority in problem.get_part_groups().items()
+                  if len(parts) >= 2 and priority != 0]
+        self.group_matrix = np.zeros((len(groups), self.num_parts), dtype=np.int64)
+        self.group_weights = np.array([priority for _, priority in groups], dtype=np.int64)
+        for g, (parts, _) in enumerate(groups):
+            self.group_matrix[g, [problem.part_index(part) for part in parts]] = 1
+    
+    def evaluate(self, timetable: Timetable) -> Evaluation:
+        """1つの時間割を評価"""
+        return self.evaluate_batch([timetable])[0]
+    
+    def evaluate_batch(self, timetables: Sequence[Timetable]) -> BatchEvaluation:
+        """複数の時間割をまとめて評価"""
+        columns = [self._to_columns(timetable) for timetable in timetables]
+        lengths = [len(parts) for parts, _, _, _, _ in columns]
+        candidates = np.repeat(np.arange(len(columns)), lengths)
+        if columns:
+            parts, rooms, slots, instructors, unknown = (np.concatenate(column) for column in zip(*columns))
+        else:
+            parts = rooms = slots = instructors = np.zeros(0, dtype=np.int64)
+            unknown = np.zeros(0, dtype=bool)
+        return self._evaluate_flat(len(columns), candidates, parts, rooms, slots, instructors, unknown)
+    
+    def evaluate_assignments(self, time_slot_positions: np.ndarray, room_positions: np.ndarray,
+                             instructor_positions: np.ndarray) -> BatchEvaluation:
+        """位置で表した時間割をまとめて評価（各配列の形は (時間割数, パート数)、未割り当ては -1）
+        
+        ヒューリスティック探索などで大量の候補を評価する場合に、オブジェクトを作らずに使える。
+        """
+        time_slot_positions = np.asarray(time_slot_positions, dtype=np.int64)
+        room_positions = np.asarray(room_positions, dtype=np.int64)
+        instructor_positions = np.asarray(instructor_positions, dtype=np.int64)
+        assert time_slot_positions.ndim == 2 and time_slot_positions.shape[1] == self.num_parts, \
+            "配列の形は (時間割数, パート数) にしてください"
+        num_candidates = time_slot_positions.shape[0]
+        assigned = time_slot_positions >= 0
+        candidates, parts = np.nonzero(assigned)
+        slots = time_slot_positions[assigned]
+        rooms = room_positions[assigned]
+        instructors = instructor_positions[assigned]
+        unknown = (slots >= self.num_time_slots) | (rooms < 0) | (rooms >= self.num_rooms) | \
+            (instructors < 0) | (instructors >= self.num_instructors)
+        return self._evaluate_flat(num_candidates, candidates, parts, rooms, slots, instructors, unknown)
+    
+    def _to_columns(self, timetable: Timetable) -> Tuple[np.ndarray, ...]:
+        """時間割を位置の配列（パート・部屋・時間コマ・指導者）と不明IDのマスクに変換"""
+        if isinstance(timetable, SchedulingSolution):
+            timetable = timetable.sessions
+        if isinstance(timetable, SessionTable):
+            arrays = timetable.as_numpy()
+            # 表のパートの並びを問題のパートの位置に変換
+            part_map = np.array([self._part_positions.get(part, -1) for part in timetable.roster.parts],
+                                dtype=np.int64)
+            parts = part_map[arrays["part_index"]] if len(part_map) else arrays["part_index"].copy()
+            room_ids, slot_ids, instructor_ids = arrays["room_id"], arrays["time_slot_id"], arrays["instructor_id"]
+        else:
+            sessions = list(timetable)
+            parts = np.array([self._part_positions.get(session.part, -1) for session in sessions],
+                             dtype=np.int64)
+            room_ids = np.array([session.room_id for session in sessions], dtype=np.int64)
+            slot_ids = np.array([session.time_slot_id for session in sessions], dtype=np.int64)
+            instructor_ids = np.array([session.instructor_id for session in sessions], dtype=np.int64)
+        
+        rooms = self._map_ids(room_ids, self._room_positions)
+        slots = self._map_ids(slot_ids, self._time_slot_positions)
+        instructors = self._map_ids(instructor_ids, self._instructor_positions)
+        unknown = (parts < 0) | (rooms < 0) | (slots < 0) | (instructors < 0)
+        return parts, rooms, slots, instructors, unknown
+    
+    @staticmethod
+    def _map_ids(ids: np.ndarray, positions: Dict[int, int]) -> np.ndarray:
+        """IDの配列を位置の配列に変換（存在しないIDは -1）"""
+        unique_ids, inverse = np.unique(ids, return_inverse=True)
+        mapped = np.array([positions.get(int(value), -1) for value in unique_ids], dtype=np.int64)
+        return mapped[inverse] if len(mapped) else np.zeros(0, dtype=np.int64)
+    
+    def _evaluate_flat(self, num_candidates: int, candidates: np.ndarray, parts: np.ndarray, rooms: np.ndarray,
+                       slots: np.ndarray, instructors: np.ndarray, unknown: np.ndarray) -> BatchEvaluation:
+        """全時間割のセッションを1列に並べた配列で評価（candidates はセッションの属する時間割の番号）"""
+        B, P, R, S, I = num_candidates, self.num_parts, self.num_rooms, self.num_time_slots, self.num_instructors
+        violations = {kind: np.zeros(B, dtype=np.int64) for kind in VIOLATION_KINDS}
+        if B == 0:
+            # 時間割がない場合は空の結果（以降の reshape・max は0件の配列を扱えない）
+            empty = np.zeros(0, dtype=float)
+            return BatchEvaluation(objective_value=empty, equality_term=empty.copy(),
+                                   penalty_term=empty.copy(), violations=violations)
+        violations["unknown_id"] = np.bincount(candidates[unknown], minlength=B)
+        
+        # 不明なIDを含むセッションは以降の評価から除く
+        known = ~unknown
+        candidates, parts, rooms, slots, instructors = (
+            candidates[known], parts[known], rooms[known], slots[known], instructors[known]
+        )
+        
+        part_counts = np.bincount(candidates * P + parts, minlength=B * P).reshape(B, P)
+        violations["part_count"] = np.abs(part_counts - 1).sum(axis=1)
+        
+        room_occupancy = np.bincount((candidates * S + slots) * R + rooms, minlength=B * S * R)
+        violations["room_conflict"] = np.maximum(room_occupancy - 1, 0).reshape(B, -1).sum(axis=1)
+        
+        instructor_occupancy = np.bincount((candidates * I + instructors) * S + slots, minlength=B * I * S)
+        violations["instructor_conflict"] = np.maximum(instructor_occupancy - 1, 0).reshape(B, -1).sum(axis=1)
+        
+        violations["ineligible"] = np.bincount(candidates[~self.eligible[parts, instructors]], minlength=B)
+        
+        instructor_counts = np.bincount(candidates * I + instructors, minlength=B * I).reshape(B, I)
+        # 各指導者のセッション数は パート数÷指導者数 の切り捨て〜切り上げ（SchedulingConstraints と同じ）
+        violations["equality"] = ((instructor_counts < self.bounds.load_lower) |
+                                  (instructor_counts > self.bounds.load_upper)).sum(axis=1)
+        
+        if I > 1:
+            cumulative_counts = instructor_counts + self.load_offsets
+            equality_term = self.equality_weight * (cumulative_counts.max(axis=1) - cumulative_counts.min(axis=1))
+        else:
+            equality_term = -instructor_counts.sum(axis=1)
+        
+        if len(self.group_weights):
+            # パート×時間コマの練習数 → グループ×時間コマの所属パートの練習数
+            part_slot = np.bincount((candidates * P + parts) * S + slots, minlength=B * P * S).reshape(B, P, S)
+            group_slot = np.einsum("gp,bps->bgs", self.group_matrix, part_slot)
+            penalty_term = (np.maximum(group_slot - 1, 0).sum(axis=2) * self.group_weights).sum(axis=1)
+        else:
+            penalty_term = np.zeros(B, dtype=np.int64)
+        
+        return BatchEvaluation(
+            objective_value=(equality_term + penalty_term).astype(float),
+            equality_term=equality_term.astype(float),
+            penalty_term=penalty_term.astype(float),
+            violations=violations
+        )
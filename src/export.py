@@ -0,0 +1,196 @@
+"""
+時間割の書き出し（CSV・JSON Lines・列指向バイナリ・テキスト表）
+"""
+import csv
+import json
+import struct
+import sys
+from array import array
+from typing import Any, BinaryIO, Dict, Iterable, Iterator, List, Optional, TextIO, Tuple, Union
+from .data_models import SchedulingProblem, SchedulingSolution, SessionTable, part_label
+
+# 1行あたりの列（player_ids は include_players=True の場合のみ）
+ROW_COLUMNS = ("timetable", "session_id", "part", "time_slot_id", "time_slot", "room_id", "room",
+               "instructor_id", "instructor", "num_players")
+
+# 列指向バイナリ形式の識別子と整数列
+COLUMNAR_MAGIC = b"SCHTBL01"
+COLUMNAR_COLUMNS = ("timetable", "session_id", "part_index", "time_slot_id", "room_id", "instructor_id")
+
+# 1行分の位置情報: (時間割の番号, セッションID, パートの位置, 時間コマID, 部屋ID, 指導者ID)
+_RawRow = Tuple[int, int, int, int, int, int]
+
+
+class TimetableExporter:
+    """解をファイルなどに1行ずつ書き出す
+    
+    ID→名前の索引は問題ごとに一度だけ作成し、同じ問題の多数の解の書き出しで共有する。
+    solutions には1つの解、または解の列（ジェネレータ可）を渡せる。各行の timetable 列はその中の位置。
+    """
+    
+    def __init__(self, problem: SchedulingProblem, include_players: bool = False):
+        self.problem = problem
+        self.include_players = include_players
+        self.part_labels = [part_label(part) for part in problem.parts]
+        self.time_slot_names = {time_slot.id: time_slot.name for time_slot in problem.time_slots}
+        self.room_names = {room.id: room.name for room in problem.rooms}
+        self.instructor_names = {instructor.id: instructor.name for instructor in problem.get_instructors()}
+        self.roster = problem.get_part_roster()
+        self._part_positions = {part: i for i, part in enumerate(problem.parts)}
+    
+    @property
+    def columns(self) -> Tuple[str, ...]:
+        """CSV・JSON Lines の列名"""
+        return ROW_COLUMNS + ("player_ids",) if self.include_players else ROW_COLUMNS
+    
+    def iter_raw_rows(self, solutions: Union[SchedulingSolution, Iterable[SchedulingSolution]]) -> Iterator[_RawRow]:
+        """位置・IDだけの行を返す（列指向の解は PracticeSession を作らずに列から読む）"""
+        if isinstance(solutions, SchedulingSolution):
+            solutions = [solutions]
+        for timetable, solution in enumerate(solutions):
+            sessions = solution.sessions
+            if isinstance(sessions, SessionTable) and sessions.roster.parts == self.roster.parts:
+                for session_id, row in enumerate(zip(sessions.part_index, sessions.time_slot_id,
+                                                     sessions.room_id, sessions.instructor_id)):
+                    yield (timetable, session_id) + row
+            else:
+                for session in sessions:
+                    yield (timetable, session.id, self._part_positions[session.part], session.time_slot_id,
+                           session.room_id, session.instructor_id)
+    
+    def iter_rows(self, solutions: Union[SchedulingSolution, Iterable[SchedulingSolution]]) -> Iterator[Dict[str, Any]]:
+        """名前を付けた行（列名 -> 値）を返す"""
+        columns = self.columns
+        for raw in self.iter_raw_rows(solutions):
+            yield dict(zip(columns, self._named(raw)))
+    
+    def _named(self, raw: _RawRow) -> List[Any]:
+        """位置・IDの行に名前を付ける"""
+        timetable, session_id, part_index, time_slot_id, room_id, instructor_id = raw
+        offsets = self.roster.offsets
+        row = [
+            timetable, session_id, self.part_labels[part_index],
+            time_slot_id, self.time_slot_names.get(time_slot_id, ""),
+            room_id, self.room_names.get(room_id, ""),
+            instructor_id, self.instructor_names.get(instructor_id, ""),
+            offsets[part_index + 1] - offsets[part_index],
+        ]
+        if self.include_players:
+            row.append(self.roster.get_player_ids(part_index))
+        return row
+    
+    def write_csv(self, solutions: Union[SchedulingSolution, Iterable[SchedulingSolution]], fp: TextIO,
+                  header: bool = True) -> int:
+        """CSVで書き出し、書き出した行数を返す（player_ids は空白区切り）"""
+        writer = csv.writer(fp)
+        if header:
+            writer.writerow(self.columns)
+        count = 0
+        for raw in self.iter_raw_rows(solutions):
+            row = self._named(raw)
+            if self.include_players:
+                row[-1] = " ".join(map(str, row[-1]))
+            writer.writerow(row)
+            count += 1
+        return count
+    
+    def write_jsonl(self, solutions: Union[SchedulingSolution, Iterable[SchedulingSolution]], fp: TextIO) -> int:
+        """JSON Lines（1行1セッション）で書き出し、書き出した行数を返す"""
+        columns = self.columns
+        count = 0
+        for raw in self.iter_raw_rows(solutions):
+            fp.write(json.dumps(dict(zip(columns, self._named(raw))), ensure_ascii=False))
+            fp.write("\n")
+            count += 1
+        return count
+    
+    def write_columnar(self, solutions: Union[SchedulingSolution, Iterable[SchedulingSolution]], fp: BinaryIO) -> int:
+        """列指向のバイナリ形式で書き出し、書き出した行数を返す
+        
+        形式: 識別子（8バイト）、ヘッダー長（8バイト、リトルエンディアン）、ヘッダー（UTF-8のJSON）、
+        続いて COLUMNAR_COLUMNS の順に各列の int64 配列（リトルエンディアン）。
+        名前はヘッダーの辞書（パートのラベルの並び、ID→名前）で引く。include_players=True の場合は
+        パート→参加プレイヤーIDの表（offsets, player_ids）を最後に追加する。
+        """
+        columns = {name: array("q") for name in COLUMNAR_COLUMNS}
+        appenders = [columns[name].append for name in COLUMNAR_COLUMNS]
+        for raw in self.iter_raw_rows(solutions):
+            for append, value in zip(appenders, raw):
+                append(value)
+        
+        buffers = [(name, columns[name]) for name in COLUMNAR_COLUMNS]
+        if self.include_players:
+            buffers += [("roster_offsets", self.roster.offsets), ("roster_player_ids", self.roster.player_ids)]
+        header = {
+            "columns": [[name, len(values)] for name, values in buffers],
+            "parts": self.part_labels,
+            "time_slots": [[time_slot_id, name] for time_slot_id, name in self.time_slot_names.items()],
+            "rooms": [[room_id, name] for room_id, name in self.room_names.items()],
+            "instructors": [[instructor_id, name] for instructor_id, name in self.instructor_names.items()],
+        }
+        header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        fp.write(COLUMNAR_MAGIC)
+        fp.write(struct.pack("<Q", len(header_bytes)))
+        fp.write(header_bytes)
+        for _, values in buffers:
+            fp.write(_little_endian(values).tobytes())
+        return len(columns["session_id"])
+    
+    def write_text(self, solution: Optional[SchedulingSolution], fp: Optional[TextIO] = None):
+        """解の概要・指導者別セッション数・時間コマ×部屋の表をテキストで書き出す（既定は標準出力）"""
+        if fp is None:
+            fp = sys.stdout
+        if not solution:
+            fp.write("解がありません\n")
+            return
+        
+        fp.write("\n=== スケジュール結果 ===\n")
+        fp.write(f"総セッション数: {len(solution.sessions)}\n")
+        fp.write(f"目的関数値: {solution.objective_value:.2f}\n")
+        fp.write(f"最適解: {'はい' if solution.is_optimal else 'いいえ'}\n")
+        fp.write(f"求解時間: {solution.solve_time_seconds:.2f}秒\n")
+        
+        # 表のセルは時間コマ・部屋の位置で引く
+        time_slot_positions = {time_slot.id: i for i, time_slot in enumerate(self.problem.time_slots)}
+        room_positions = {room.id: i for i, room in enumerate(self.problem.rooms)}
+        cells: List[List[List[str]]] = [[[] for _ in self.problem.rooms] for _ in self.problem.time_slots]
+        instructor_counts: Dict[int, int] = {}
+        for _, _, part_index, time_slot_id, room_id, instructor_id in self.iter_raw_rows(solution):
+            instructor_counts[instructor_id] = instructor_counts.get(instructor_id, 0) + 1
+            cells[time_slot_positions[time_slot_id]][room_positions[room_id]].append(
+                f"{self.part_labels[part_index]}({self.instructor_names.get(instructor_id, '')})"
+            )
+        
+        fp.write("\n=== 指導者別セッション数 ===\n")
+        for instructor in self.problem.get_instructors():
+            count = instructor_counts.get(instructor.id, 0)
+            fp.write(f"{instructor.name} ({[part_label(part) for part in instructor.parts]}): {count}セッション\n")
+        
+        fp.write("\n=== スケジュール表 ===\n")
+        fp.write("時間\\部屋" + "".join(f"\t{room.name}" for room in self.problem.rooms) + "\n")
+        for time_slot, row in zip(self.problem.time_slots, cells):
+            # 複数セッションがある場合はカンマ区切りで表示
+            fp.write(time_slot.name + "".join(f"\t{','.join(cell) if cell else '-'}" for cell in row) + "\n")
+
+
+def read_columnar(fp: BinaryIO) -> Tuple[Dict[str, array], Dict[str, Any]]:
+    """write_columnar() の出力を読み込み、(列名 -> int64 配列, ヘッダー) を返す"""
+    if fp.read(len(COLUMNAR_MAGIC)) != COLUMNAR_MAGIC:
+        raise ValueError("列指向形式の時間割ではありません")
+    (header_length,) = struct.unpack("<Q", fp.read(8))
+    header = json.loads(fp.read(header_length).decode("utf-8"))
+    columns = {}
+    for name, length in header["columns"]:
+        values = array("q")
+        values.frombytes(fp.read(length * values.itemsize))
+        columns[name] = _little_endian(values)
+    return columns, header
+
+
+def _little_endian(values: array) -> array:
+    """リトルエンディアンの配列に変換（リトルエンディアンの環境ではそのまま返す）"""
+    if sys.byteorder == "little":
+        return values
+    swapped = array(values.typecode, values)
+    swapped.byteswap()
+    return swapped
@@ -0,0 +1,104 @@
+"""
+スケジューリング問題の正規化とフィンガープリント
+"""
+import dataclasses
+import hashlib
+import json
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .data_models import SchedulingProblem, PracticeSession, Player, Room, SessionTable, TimeSlot, part_label
+from .solver_config import SolverConfig
+from .constants import LoadBalanceScope
+
+# 正規化したセッション: (パートのラベル, 部屋の位置, 時間コマの位置, 指導者の位置)
+CanonicalSession = Tuple[str, int, int, int]
+
+
+class CanonicalProblem:
+    """並び順やIDの振り方に依存しない問題の表現
+    
+    部屋と時間コマはモデル上交換可能なので個数だけを、指導者は指導可能パートの組み合わせを、
+    一般プレイヤーは所属パートの組み合わせごとの優先度の合計を比較対象にする。
+    元の問題のID・オブジェクトとの対応も保持し、解の相互変換に使う。
+    """
+    
+    def __init__(self, problem: SchedulingProblem):
+        self.problem = problem
+        self.rooms: List[Room] = sorted(problem.rooms, key=lambda room: room.id)
+        self.time_slots: List[TimeSlot] = sorted(problem.time_slots, key=lambda time_slot: time_slot.id)
+        self.parts_by_label = {part_label(part): part for part in problem.parts}
+        
+        eligible_labels: Dict[int, List[str]] = {instructor.id: [] for instructor in problem.get_instructors()}
+        for part in problem.parts:
+            for instructor in problem.get_eligible_instructors(part):
+                eligible_labels[instructor.id].append(part_label(part))
+        self.instructor_signatures = {
+            instructor_id: tuple(sorted(labels)) for instructor_id, labels in eligible_labels.items()
+        }
+        # 同じ指導可能パート・持ち越しのセッション数を持つ指導者は交換可能なので、元の並び順で安定ソートする
+        self.instructors: List[Player] = sorted(
+            problem.get_instructors(),
+            key=lambda instructor: (self.instructor_signatures[instructor.id], problem.get_load_offset(instructor.id))
+        )
+        
+        player_groups: Dict[Tuple[str, ...], int] = {}
+        for player in problem.get_regular_players():
+            labels = tuple(sorted({part_label(part) for part in player.parts if part_label(part) in self.parts_by_label}))
+            player_groups[labels] = player_groups.get(labels, 0) + player.overlap_priority
+        self.player_groups = sorted((list(labels), priority) for labels, priority in player_groups.items() if priority)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """フィンガープリント計算用の辞書"""
+        data = {
+            "parts": sorted(self.parts_by_label),
+            "num_rooms": len(self.rooms),
+            "num_time_slots": len(self.time_slots),
+            "instructors": [list(self.instructor_signatures[instructor.id]) for instructor in self.instructors],
+            "player_groups": self.player_groups,
+        }
+        # 持ち越しのセッション数・均等割り振りの範囲が既定値の問題は従来と同じフィンガープリントにする
+        if any(self.problem.instructor_load_offsets.values()):
+            data["load_offsets"] = [self.problem.get_load_offset(instructor.id) for instructor in self.instructors]
+        if self.problem.load_balance_scope != LoadBalanceScope.DAY:
+            data["load_balance_scope"] = self.problem.load_balance_scope
+        return data
+    
+    def canonicalize_sessions(self, sessions: Sequence[PracticeSession]) -> List[CanonicalSession]:
+        """セッションを位置ベースの表現に変換"""
+        room_positions = {room.id: i for i, room in enumerate(self.rooms)}
+        slot_positions = {time_slot.id: i for i, time_slot in enumerate(self.time_slots)}
+        instructor_positions = {instructor.id: i for i, instructor in enumerate(self.instructors)}
+        return [
+            (part_label(session.part), room_positions[session.room_id],
+             slot_positions[session.time_slot_id], instructor_positions[session.instructor_id])
+            for session in sessions
+        ]
+    
+    def restore_sessions(self, canonical_sessions: List[CanonicalSession]) -> SessionTable:
+        """位置ベースの表現をこの問題のIDを使ったセッションに戻す"""
+        sessions = SessionTable(self.problem.get_part_roster())
+        for label, room_position, slot_position, instructor_position in canonical_sessions:
+            sessions.append(
+                self.problem.part_index(self.parts_by_label[label]),
+                self.rooms[room_position].id,
+                self.time_slots[slot_position].id,
+                self.instructors[instructor_position].id
+            )
+        return sessions
+
+
+def problem_fingerprint(problem: SchedulingProblem, equality_weight: int, model_mode: str,
+                        solver_config: Optional[SolverConfig] = None,
+                        time_limit_seconds: Optional[float] = None,
+                        canonical: Optional[CanonicalProblem] = None) -> str:
+    """問題と求解設定から、並び替え・ID振り直しに依存しないフィンガープリントを計算"""
+    if canonical is None:
+        canonical = CanonicalProblem(problem)
+    payload = {
+        "problem": canonical.to_dict(),
+        "equality_weight": equality_weight,
+        "model_mode": model_mode,
+        "solver_config": dataclasses.asdict(solver_config or SolverConfig()),
+        "time_limit_seconds": time_limit_seconds,
+    }
+    encoded = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
@@ -0,0 +1,315 @@
+"""
+貪欲法＋局所探索によるヒューリスティック解法（CP-SATを使わない）
+"""
+import random
+import time
+from typing import List, Optional, Sequence
+from .data_models import SchedulingProblem, SchedulingSolution, SessionTable
+from .evaluator import SolutionEvaluator
+from .constants import SchedulingConfig
+
+# 制約違反1件あたりのペナルティ（目的関数のどの値よりも大きくする）
+_HARD_PENALTY = 10 ** 9
+
+
+class HeuristicSolver:
+    """モデルと同じ制約・目的関数の下で、時間割を貪欲法で作り局所探索で改善する
+    
+    各パートの時間コマと指導者を決め、部屋は時間コマごとに空いている部屋を順に割り当てる。
+    近傍は「パートの時間コマ・指導者の変更」と「2つのパートの時間コマの入れ替え」で、
+    改善がなくなった後は時間の許す限りランダムな摂動から探索し直す（反復局所探索）。
+    """
+    
+    def __init__(self, problem: SchedulingProblem,
+                 equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+                 seed: int = SchedulingConfig.DEFAULT_RANDOM_SEED):
+        self.problem = problem
+        self.equality_weight = equality_weight
+        self.evaluator = SolutionEvaluator(problem, equality_weight)
+        self.load_lower, self.load_upper = self.evaluator.bounds.load_lower, self.evaluator.bounds.load_upper
+        self.load_offsets = [int(offset) for offset in self.evaluator.load_offsets]
+        self.rng = random.Random(seed)
+        
+        self.num_parts = len(problem.parts)
+        self.num_rooms = len(problem.rooms)
+        self.num_time_slots = len(problem.time_slots)
+        self.num_instructors = len(problem.get_instructors())
+        instructor_positions = {instructor.id: i for i, instructor in enumerate(problem.get_instructors())}
+        self.eligible: List[List[int]] = [
+            [instructor_positions[instructor.id] for instructor in problem.get_eligible_instructors(part)]
+            for part in problem.parts
+        ]
+        # パート -> 所属するペナルティ対象グループ（評価器と同じグループ・重み）
+        self.group_weights = [int(weight) for weight in self.evaluator.group_weights]
+        self.groups_of_part: List[List[int]] = [[] for _ in range(self.num_parts)]
+        for g, row in enumerate(self.evaluator.group_matrix):
+            for p in row.nonzero()[0]:
+                self.groups_of_part[p].append(g)
+    
+    def solve(self, time_limit_seconds: float = SchedulingConfig.DEFAULT_HEURISTIC_TIME_LIMIT,
+              initial_slots: Optional[Sequence[int]] = None,
+              initial_instructors: Optional[Sequence[int]] = None) -> Optional[SchedulingSolution]:
+        """時間割を作成（制約を満たす時間割が見つからなければ None）
+        
+        initial_slots / initial_instructors（パートの位置ごとの時間コマ・指導者の位置、未割り当ては -1）を
+        指定すると、貪欲法の代わりにその割り当てから探索を始める（制約違反があっても局所探索で修復する）。
+        """
+        start_time = time.perf_counter()
+        deadline = start_time + time_limit_seconds
+        
+        if initial_slots is None:
+            self._construct()
+        else:
+            self._load(initial_slots, initial_instructors)
+        self._climb(deadline)
+        best_score, best = self._score(), self._snapshot()
+        while time.perf_counter() < deadline:
+            self._perturb()
+            self._climb(deadline)
+            score = self._score()
+            if score < best_score:
+                best_score, best = score, self._snapshot()
+            else:
+                self._restore(best)
+        
+        self._restore(best)
+        sessions = self._to_sessions()
+        evaluation = self.evaluator.evaluate(sessions)
+        if not evaluation.is_feasible:
+            return None
+        return SchedulingSolution(
+            sessions=sessions,
+            objective_value=evaluation.objective_value,
+            is_optimal=False,
+            solve_time_seconds=time.perf_counter() - start_time,
+            time_slot_ids=[time_slot.id for time_slot in self.problem.time_slots],
+            room_ids=[room.id for room in self.problem.rooms]
+        )
+    
+    # --- 状態の管理 ---
+    
+    def _reset(self):
+        """割り当てと集計を空にする"""
+        S, I = self.num_time_slots, self.num_instructors
+        self.slot_of = [-1] * self.num_parts
+        self.instructor_of = [-1] * self.num_parts
+        self.slot_load = [0] * S
+        self.instructor_load = [0] * I
+        self.instructor_slot = [[0] * S for _ in range(I)]
+        self.group_slot = [[0] * S for _ in self.group_weights]
+        self.penalty = 0
+        self.conflicts = 0  # 部屋数超過＋指導者の重複
+    
+    def _place(self, p: int, s: int, i: int):
+        """パートを時間コマ・指導者に割り当てる（集計を差分更新）"""
+        self.slot_of[p], self.instructor_of[p] = s, i
+        self.conflicts += (self.slot_load[s] >= self.num_rooms) + (self.instructor_slot[i][s] >= 1)
+        self.slot_load[s] += 1
+        self.instructor_load[i] += 1
+        self.instructor_slot[i][s] += 1
+        for g in self.groups_of_part[p]:
+            if self.group_slot[g][s] >= 1:
+                self.penalty += self.group_weights[g]
+            self.group_slot[g][s] += 1
+    
+    def _remove(self, p: int):
+        """パートの割り当てを外す（集計を差分更新）"""
+        s, i = self.slot_of[p], self.instructor_of[p]
+        self.slot_load[s] -= 1
+        self.instructor_load[i] -= 1
+        self.instructor_slot[i][s] -= 1
+        self.conflicts -= (self.slot_load[s] >= self.num_rooms) + (self.instructor_slot[i][s] >= 1)
+        for g in self.groups_of_part[p]:
+            self.group_slot[g][s] -= 1
+            if self.group_slot[g][s] >= 1:
+                self.penalty -= self.group_weights[g]
+        self.slot_of[p] = self.instructor_of[p] = -1
+    
+    def _score(self) -> int:
+        """目的関数値＋制約違反のペナルティ"""
+        loads = self.instructor_load
+        if self.num_instructors > 1:
+            cumulative = [load + offset for load, offset in zip(loads, self.load_offsets)]
+            equality = self.equality_weight * (max(cumulative) - min(cumulative))
+        else:
+            equality = -loads[0]
+        # 均等割り振り制約の違反は、範囲から外れたセッション数の合計で数える（1つずつ修復できるように）
+        imbalance = sum(max(0, self.load_lower - load, load - self.load_upper) for load in loads)
+        return equality + self.penalty + _HARD_PENALTY * (self.conflicts + imbalance)
+    
+    def _snapshot(self):
+        return list(self.slot_of), list(self.instructor_of)
+    
+    def _restore(self, snapshot):
+        slots, instructors = snapshot
+        self._reset()
+        for p in range(self.num_parts):
+            self._place(p, slots[p], instructors[p])
+    
+    # --- 構築と改善 ---
+    
+    def _construct(self):
+        """貪欲法で初期解を作成"""
+        self._reset()
+        # 指導者: 指導可能な指導者の少ないパートから、担当数（持ち越し分を含む）の少ない指導者に割り当てる
+        planned_load = [0] * self.num_instructors
+        planned = [0] * self.num_parts
+        for p in sorted(range(self.num_parts), key=lambda p: len(self.eligible[p])):
+            planned[p] = min(self.eligible[p], key=lambda i: (planned_load[i] + self.load_offsets[i], i))
+            planned_load[planned[p]] += 1
+        self._balance(planned, planned_load)
+        
+        # 時間コマ: 重複ペナルティの大きいパートから、増分の最も小さい空き時間コマに割り当てる
+        self._place_greedily(range(self.num_parts), planned)
+    
+    def _balance(self, planned: List[int], planned_load: List[int]):
+        """担当パートを付け替えて、指導者のセッション数を均等割り振り制約の範囲に収める
+        
+        担当の多い指導者から少ない指導者へ、指導可能な指導者をたどる増加路に沿ってパートを1つずつ移す。
+        """
+        while True:
+            if any(load > self.load_upper for load in planned_load):
+                sources = [i for i, load in enumerate(planned_load) if load > self.load_upper]
+                is_target = [load < self.load_upper for load in planned_load]
+            elif any(load < self.load_lower for load in planned_load):
+                sources = [i for i, load in enumerate(planned_load) if load > self.load_lower]
+                is_target = [load < self.load_lower for load in planned_load]
+            else:
+                return
+            
+            # 幅優先探索: 指導者 i が担当するパート p を、p を指導できる別の指導者 j に移せる
+            parent = {i: None for i in sources}
+            queue = list(sources)
+            target = None
+            for i in queue:
+                for p in range(self.num_parts):
+                    if planned[p] != i:
+                        continue
+                    for j in self.eligible[p]:
+                        if j not in parent:
+                            parent[j] = (i, p)
+                            queue.append(j)
+                            if is_target[j]:
+                                target = j
+                                break
+                    if target is not None:
+                        break
+                if target is not None:
+                    break
+            if target is None:
+                return  # 範囲に収められない（局所探索で違反として扱う）
+            
+            j = target
+            while parent[j] is not None:
+                i, p = parent[j]
+                planned[p] = j
+                j = i
+            planned_load[target] += 1
+            planned_load[j] -= 1
+    
+    def _load(self, slots: Sequence[int], instructors: Sequence[int]):
+        """与えられた割り当てから初期解を作成（未割り当てのパートは貪欲法で追加）"""
+        self._reset()
+        unassigned = []
+        for p in range(self.num_parts):
+            if slots[p] >= 0 and instructors[p] >= 0:
+                self._place(p, slots[p], instructors[p])
+            else:
+                unassigned.append(p)
+        planned = [i if i >= 0 else self.eligible[p][0] for p, i in enumerate(instructors)]
+        self._place_greedily(unassigned, planned)
+    
+    def _place_greedily(self, parts: Sequence[int], planned: Sequence[int]):
+        """重複ペナルティの大きいパートから、目的関数の増分が最も小さい時間コマに割り当てる"""
+        weight_of_part = [sum(self.group_weights[g] for g in self.groups_of_part[p]) for p in range(self.num_parts)]
+        for p in sorted(parts, key=lambda p: -weight_of_part[p]):
+            candidates = [planned[p]] + self.eligible[p]
+            best = None
+            for i in candidates:
+                for s in range(self.num_time_slots):
+                    self._place(p, s, i)
+                    key = (self.conflicts, self._score(), self.slot_load[s])
+                    self._remove(p)
+                    if best is None or key < best[0]:
+                        best = (key, s, i)
+                if best[0][0] == self.conflicts:
+                    break  # 予定した指導者で違反なく置ける場合は他の指導者を試さない
+            self._place(p, best[1], best[2])
+    
+    def _climb(self, deadline: float):
+        """改善がなくなるまで最良の移動を適用する"""
+        improved = True
+        while improved and time.perf_counter() < deadline:
+            improved = False
+            for p in self.rng.sample(range(self.num_parts), self.num_parts):
+                if self._improve_part(p):
+                    improved = True
+                if time.perf_counter() >= deadline:
+                    break
+    
+    def _improve_part(self, p: int) -> bool:
+        """パート p に関する最良の移動（時間コマ・指導者の変更、時間コマの入れ替え）を適用"""
+        current = self._score()
+        s0, i0 = self.slot_of[p], self.instructor_of[p]
+        best_score, best_move = current, None
+        
+        self._remove(p)
+        for s in range(self.num_time_slots):
+            for i in self.eligible[p]:
+                if s == s0 and i == i0:
+                    continue
+                self._place(p, s, i)
+                score = self._score()
+                self._remove(p)
+                if score < best_score:
+                    best_score, best_move = score, ("move", s, i)
+        self._place(p, s0, i0)
+        
+        for q in range(self.num_parts):
+            s1, i1 = self.slot_of[q], self.instructor_of[q]
+            if s1 == s0:
+                continue
+            self._remove(p)
+            self._remove(q)
+            self._place(p, s1, i0)
+            self._place(q, s0, i1)
+            score = self._score()
+            self._remove(p)
+            self._remove(q)
+            self._place(p, s0, i0)
+            self._place(q, s1, i1)
+            if score < best_score:
+                best_score, best_move = score, ("swap", q)
+        
+        if best_move is None:
+            return False
+        if best_move[0] == "move":
+            self._remove(p)
+            self._place(p, best_move[1], best_move[2])
+        else:
+            q = best_move[1]
+            s1, i1 = self.slot_of[q], self.instructor_of[q]
+            self._remove(p)
+            self._remove(q)
+            self._place(p, s1, i0)
+            self._place(q, s0, i1)
+        return True
+    
+    def _perturb(self):
+        """ランダムに数パートの時間コマ・指導者を変更して局所解から抜け出す"""
+        for p in self.rng.sample(range(self.num_parts), min(3, self.num_parts)):
+            self._remove(p)
+            self._place(p, self.rng.randrange(self.num_time_slots), self.rng.choice(self.eligible[p]))
+    
+    def _to_sessions(self) -> SessionTable:
+        """現在の割り当てをセッション表に変換（部屋は時間コマごとに先頭から割り当てる）"""
+        sessions = SessionTable(self.problem.get_part_roster())
+        next_room = [0] * self.num_time_slots
+        for p in range(self.num_parts):
+            s = self.slot_of[p]
+            # 部屋数を超えた分は存在しない部屋にせず最後の部屋に重ねる（評価器で違反として検出される）
+            room = self.problem.rooms[min(next_room[s], self.num_rooms - 1)]
+            next_room[s] += 1
+            sessions.append(p, room.id, self.problem.time_slots[s].id,
+                            self.problem.get_instructors()[self.instructor_of[p]].id)
+        return sessions
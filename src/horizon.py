@@ -0,0 +1,237 @@
+"""
+複数日（週・期間）にわたる計画と、1日ずつ解き進めるローリングホライズン求解
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence
+from .data_models import SchedulingProblem, SchedulingSolution, PracticeSession, PartId, part_label
+from .scheduling_optimizer import SchedulingOptimizer
+from .evaluator import SolutionEvaluator
+from .solver_config import SolverConfig
+from .instrumentation import Instrumentation, LoggingInstrumentation, SolveStats
+from .constants import SchedulingConfig, LoadBalanceScope
+
+
+@dataclass
+class HorizonProblem:
+    """複数日にわたるスケジューリング問題
+    
+    各日の部屋・時間コマ・プレイヤーは base と同じで、日ごとに練習するパートだけが変わる。
+    part_frequencies はパートごとの「区切り（period_days 日）あたりの練習回数」で、
+    指定のないパートは毎日練習する。各パートは1日に1回まで練習する。
+    """
+    base: SchedulingProblem  # 1日分の設定（parts は期間中に練習するすべてのパート）
+    days: List[str]  # 日の名前（例: "月", "火", ...）
+    part_frequencies: Dict[PartId, int] = field(default_factory=dict)  # パート -> 区切りあたりの練習回数
+    period_days: Optional[int] = None  # 練習回数を数える区切りの日数（None=期間全体、例: 7=週ごと）
+    
+    def __post_init__(self):
+        """初期化後の検証"""
+        assert len(self.days) > 0, "日が設定されていません"
+        assert self.period_days is None or self.period_days >= 1, "区切りの日数は1以上を指定してください"
+        for part, frequency in self.part_frequencies.items():
+            assert part in self.base.parts, f"パート{part_label(part)}は問題に含まれていません"
+            assert 0 <= frequency <= self.get_period_length(), \
+                f"パート{part_label(part)}の練習回数は0〜区切りの日数で指定してください"
+    
+    def get_period_length(self) -> int:
+        """区切りの日数"""
+        return self.period_days if self.period_days is not None else len(self.days)
+    
+    def get_frequency(self, part: PartId) -> int:
+        """パートの区切りあたりの練習回数（未指定は毎日）"""
+        return self.part_frequencies.get(part, self.get_period_length())
+    
+    def get_periods(self) -> List[List[int]]:
+        """区切りごとの日の位置（最後の区切りは短い場合がある）"""
+        length = self.get_period_length()
+        return [list(range(start, min(start + length, len(self.days)))) for start in range(0, len(self.days), length)]
+    
+    def plan_days(self, fixed_parts: Sequence[Sequence[PartId]] = ()) -> List[List[PartId]]:
+        """日ごとに練習するパートを決める
+        
+        各パートの練習日は区切りの中でなるべく等間隔にし、日ごとのパート数が均等になるよう開始日をずらす。
+        fixed_parts には先頭から順に確定済みの日のパートを渡し、その回数を区切りの練習回数から差し引く。
+        区切りが期間の途中で終わる場合（短い最後の区切り）は、練習回数を日数に比例して減らす。
+        """
+        plan: List[List[PartId]] = [list(parts) for parts in fixed_parts] + \
+            [[] for _ in range(len(self.days) - len(fixed_parts))]
+        period_length = self.get_period_length()
+        
+        for period in self.get_periods():
+            free_days = [day for day in period if day >= len(fixed_parts)]
+            if not free_days:
+                continue
+            done = {part: 0 for part in self.base.parts}
+            for day in period:
+                if day < len(fixed_parts):
+                    for part in fixed_parts[day]:
+                        done[part] += 1
+            
+            remaining = {}
+            for part in self.base.parts:
+                target = self.get_frequency(part) * len(period) // period_length
+                remaining[part] = min(max(0, target - done[part]), len(free_days))
+            
+            daily_counts = [0] * len(free_days)
+            # 練習回数の多いパートから、既に割り当てたパート数の少ない日を選ぶ
+            for part in sorted(self.base.parts, key=lambda part: -remaining[part]):
+                frequency = remaining[part]
+                if frequency == 0:
+                    continue
+                best_days, best_key = None, None
+                for start in range(len(free_days)):
+                    days = sorted({(start + j * len(free_days) // frequency) % len(free_days) for j in range(frequency)})
+                    key = (max(daily_counts[d] for d in days), sum(daily_counts[d] for d in days))
+                    if best_days is None or key < best_key:
+                        best_days, best_key = days, key
+                for d in best_days:
+                    daily_counts[d] += 1
+                    plan[free_days[d]].append(part)
+        
+        # 日ごとのパートは元の問題の並び順にする
+        order = {part: i for i, part in enumerate(self.base.parts)}
+        return [sorted(parts, key=order.__getitem__) for parts in plan]
+    
+    def day_problem(self, parts: Sequence[PartId],
+                    instructor_load_offsets: Optional[Dict[int, int]] = None) -> SchedulingProblem:
+        """1日分の問題（指定したパートのみ、前日までの指導者のセッション数を持ち越す）
+        
+        日ごとのパートによっては担当できるパートのない指導者もいるため、均等割り振りは
+        その日の制約ではなく、持ち越し分を含む累積のセッション数の差として目的関数で扱う。
+        """
+        return SchedulingProblem(
+            players=self.base.players,
+            rooms=self.base.rooms,
+            time_slots=self.base.time_slots,
+            parts=list(parts),
+            cross_part_policy=self.base.cross_part_policy,
+            instructor_load_offsets=dict(instructor_load_offsets or {}),
+            load_balance_scope=LoadBalanceScope.CUMULATIVE
+        )
+
+
+@dataclass
+class HorizonSolution:
+    """複数日の計画の解"""
+    days: List[str]
+    day_solutions: List[Optional[SchedulingSolution]]  # 日ごとの解（練習するパートがない日は None）
+    objective_value: float  # 日ごとの重複ペナルティの合計＋期間全体の指導者のセッション数の均等性の項
+    is_optimal: bool  # すべての日の解が（その日の問題で）最適かどうか
+    solve_time_seconds: float
+    instructor_loads: Dict[int, int]  # 指導者ID -> 期間中のセッション数
+    stats: Optional[SolveStats] = None
+    
+    def get_day_solution(self, day: str) -> Optional[SchedulingSolution]:
+        """日の名前から解を取得"""
+        return self.day_solutions[self.days.index(day)]
+
+
+class RollingHorizonSolver:
+    """複数日の計画を1日ずつ解き進める
+    
+    期間全体を1つのモデルにすると変数が日数倍になるため、先に日ごとに練習するパートを決め、
+    各日を1日分のモデルで順に解く。解いた日は確定し、次の日には
+    - 指導者の累積セッション数を持ち越し（均等性の目的関数は累積の最大−最小を最小化）、
+    - 各パートが最後に練習した時間コマ・部屋・指導者をヒントにする（日をまたいで同じ枠になりやすい）。
+    """
+    
+    def __init__(self, horizon: HorizonProblem,
+                 equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+                 model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+                 instrumentation: Optional[Instrumentation] = None):
+        self.horizon = horizon
+        self.equality_weight = equality_weight
+        self.model_mode = model_mode
+        self.instrumentation = instrumentation if instrumentation is not None else LoggingInstrumentation()
+    
+    def solve(self, time_limit_per_day: float = SchedulingConfig.DEFAULT_DAY_TIME_LIMIT,
+              solver_config: Optional[SolverConfig] = None,
+              frozen: Sequence[Optional[SchedulingSolution]] = ()) -> Optional[HorizonSolution]:
+        """期間全体を解く（いずれかの日の解が見つからなければ None）
+        
+        frozen には先頭から順に確定済みの日の解を渡す（実施済みの日を固定して残りを計画し直す場合など）。
+        確定済みの日は解き直さず、練習回数・指導者のセッション数・ヒントにだけ反映する。
+        """
+        assert len(frozen) <= len(self.horizon.days), "確定済みの日が期間より多く指定されています"
+        start_time = time.time()
+        stats = SolveStats()
+        
+        with self.instrumentation.phase("plan_days", stats):
+            fixed_parts = [[session.part for session in solution.sessions] if solution is not None else []
+                           for solution in frozen]
+            plan = self.horizon.plan_days(fixed_parts)
+        
+        day_solutions: List[Optional[SchedulingSolution]] = list(frozen)
+        loads = {instructor.id: 0 for instructor in self.horizon.base.get_instructors()}
+        last_sessions: Dict[PartId, PracticeSession] = {}
+        for solution in frozen:
+            self._carry(solution, loads, last_sessions)
+        
+        with self.instrumentation.phase("solve_days", stats):
+            for day in range(len(frozen), len(self.horizon.days)):
+                parts = plan[day]
+                if not parts:
+                    day_solutions.append(None)
+                    continue
+                self.instrumentation.event(f"{self.horizon.days[day]}（{len(parts)}パート）を求解中...")
+                solution = self._solve_day(parts, loads, last_sessions, time_limit_per_day, solver_config)
+                if solution is None:
+                    self.instrumentation.event(f"{self.horizon.days[day]}の解が見つかりませんでした")
+                    self.instrumentation.finish(stats)
+                    return None
+                day_solutions.append(solution)
+                self._carry(solution, loads, last_sessions)
+        
+        result = HorizonSolution(
+            days=list(self.horizon.days),
+            day_solutions=day_solutions,
+            objective_value=self._objective_value(plan, day_solutions, loads),
+            is_optimal=all(solution.is_optimal for solution in day_solutions if solution is not None),
+            solve_time_seconds=time.time() - start_time,
+            instructor_loads=loads,
+            stats=stats
+        )
+        self.instrumentation.event(f"期間全体の目的関数値: {result.objective_value}")
+        self.instrumentation.finish(stats)
+        return result
+    
+    def _solve_day(self, parts: List[PartId], loads: Dict[int, int], last_sessions: Dict[PartId, PracticeSession],
+                   time_limit_seconds: float, solver_config: Optional[SolverConfig]) -> Optional[SchedulingSolution]:
+        """1日分を、累積のセッション数を持ち越して解く"""
+        problem = self.horizon.day_problem(parts, loads)
+        optimizer = SchedulingOptimizer(problem, instrumentation=self.instrumentation)
+        hint = [last_sessions[part] for part in parts if part in last_sessions]
+        if not hint:
+            return optimizer.solve(time_limit_seconds, self.equality_weight, self.model_mode, solver_config)
+        
+        # 各パートが最後に練習した枠をヒントにする（ヒントは前回の解として渡す）
+        optimizer.build_model(self.equality_weight, self.model_mode)
+        previous = SchedulingSolution(sessions=hint, objective_value=0, is_optimal=False, solve_time_seconds=0)
+        return optimizer.resolve(previous, time_limit_seconds=time_limit_seconds, solver_config=solver_config)
+    
+    @staticmethod
+    def _carry(solution: Optional[SchedulingSolution], loads: Dict[int, int],
+               last_sessions: Dict[PartId, PracticeSession]):
+        """確定した日の指導者のセッション数と各パートの最後の練習を記録"""
+        if solution is None:
+            return
+        for session in solution.sessions:
+            loads[session.instructor_id] = loads.get(session.instructor_id, 0) + 1
+            last_sessions[session.part] = session
+    
+    def _objective_value(self, plan: List[List[PartId]], day_solutions: List[Optional[SchedulingSolution]],
+                         loads: Dict[int, int]) -> float:
+        """日ごとの重複ペナルティの合計に、期間全体の指導者のセッション数の均等性の項を加える"""
+        penalty = 0.0
+        for parts, solution in zip(plan, day_solutions):
+            if solution is not None and parts:
+                penalty += SolutionEvaluator(self.horizon.day_problem(parts), self.equality_weight) \
+                    .evaluate(solution).penalty_term
+        
+        counts = list(loads.values())
+        if len(counts) > 1:
+            equality = self.equality_weight * (max(counts) - min(counts))
+        else:
+            equality = -sum(counts)
+        return equality + penalty
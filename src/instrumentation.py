@@ -0,0 +1,158 @@
+"""
+求解処理の計測フック
+"""
+import logging
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterator, Optional
+
+try:
+    import resource
+except ImportError:  # Windowsでは利用できない
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SolveStats:
+    """1回の求解の計測結果"""
+    phase_seconds: Dict[str, float] = field(default_factory=dict)  # フェーズ名 -> 所要時間（秒）
+    num_variables: int = 0  # モデルの変数数
+    num_bool_variables: int = 0  # うち0-1変数（リテラル）の数
+    num_constraints: int = 0  # モデルの制約数
+    status: Optional[str] = None  # CP-SATのステータス名
+    objective_value: Optional[float] = None  # CP-SATの目的関数値
+    best_bound: Optional[float] = None  # CP-SATの下界
+    gap: Optional[float] = None  # 相対ギャップ
+    num_branches: int = 0
+    num_conflicts: int = 0
+    wall_time: float = 0.0  # CP-SATの壁時計時間（秒）
+    user_time: float = 0.0  # CP-SATのユーザー時間（秒）
+    peak_memory_bytes: Optional[int] = None  # プロセスの最大常駐メモリ
+
+
+class Instrumentation:
+    """計測フックの基底クラス（何もしない）
+    
+    求解処理は phase() でフェーズごとの時間を計り、event() で進捗を通知し、
+    最後に finish() で SolveStats を渡す。必要なメソッドだけを上書きして使う。
+    """
+    
+    # Trueの場合、CP-SATのログを取得して前処理（presolve）と探索の時間を分ける
+    # （ログ行ごとにコールバックが呼ばれ求解が遅くなるため、既定では無効）
+    capture_solver_log = False
+    
+    @contextmanager
+    def phase(self, name: str, stats: Optional[SolveStats] = None) -> Iterator[None]:
+        """フェーズの所要時間を計測する"""
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start_time
+            if stats is not None:
+                stats.phase_seconds[name] = stats.phase_seconds.get(name, 0.0) + elapsed
+            self.on_phase(name, elapsed)
+    
+    def on_phase(self, name: str, seconds: float):
+        """フェーズが終了した"""
+    
+    def event(self, message: str):
+        """進捗メッセージ"""
+    
+    def finish(self, stats: SolveStats):
+        """求解が終了した"""
+
+
+class LoggingInstrumentation(Instrumentation):
+    """進捗・計測結果を logging に出力する（SchedulingOptimizer のデフォルト）"""
+    
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.INFO,
+                 capture_solver_log: bool = False):
+        self.log = log or logger
+        self.level = level
+        self.capture_solver_log = capture_solver_log
+    
+    def on_phase(self, name: str, seconds: float):
+        self.log.debug("フェーズ %s: %.4f秒", name, seconds)
+    
+    def event(self, message: str):
+        self.log.log(self.level, message)
+    
+    def finish(self, stats: SolveStats):
+        self.log.debug("求解統計: %s", stats)
+
+
+class MetricsInstrumentation(Instrumentation):
+    """計測値を sink(名前, 値) に送る（メトリクス基盤との接続用）"""
+    
+    def __init__(self, sink: Callable[[str, float], None], prefix: str = "scheduling",
+                 capture_solver_log: bool = False):
+        self.sink = sink
+        self.prefix = prefix
+        self.capture_solver_log = capture_solver_log
+    
+    def on_phase(self, name: str, seconds: float):
+        self.sink(f"{self.prefix}.phase.{name}.seconds", seconds)
+    
+    def finish(self, stats: SolveStats):
+        for name in ("num_variables", "num_bool_variables", "num_constraints", "num_branches",
+                     "num_conflicts", "wall_time", "user_time", "objective_value", "best_bound",
+                     "gap", "peak_memory_bytes"):
+            value = getattr(stats, name)
+            if value is not None:
+                self.sink(f"{self.prefix}.{name}", float(value))
+
+
+class SolverLogTimer:
+    """CP-SATのログ出力時刻から前処理（presolve）の終了時刻を記録する"""
+    
+    def __init__(self):
+        self.start_time = time.perf_counter()
+        self.presolve_end: Optional[float] = None
+    
+    def __call__(self, line: str):
+        if self.presolve_end is None and line.startswith(("Presolve summary", "Presolved optimization model")):
+            self.presolve_end = time.perf_counter()
+    
+    def split(self, total_seconds: float) -> Dict[str, float]:
+        """求解時間を presolve / search に分ける（ログから判定できない場合は空）"""
+        if self.presolve_end is None:
+            return {}
+        presolve = min(self.presolve_end - self.start_time, total_seconds)
+        return {"presolve": presolve, "search": total_seconds - presolve}
+
+
+def collect_model_stats(model, stats: SolveStats):
+    """モデルの規模を記録"""
+    model_proto = model.Proto()
+    stats.num_variables = len(model_proto.variables)
+    stats.num_constraints = len(model_proto.constraints)
+    stats.num_bool_variables = sum(
+        1 for variable in model_proto.variables
+        if len(variable.domain) == 2 and variable.domain[0] >= 0 and variable.domain[1] <= 1
+    )
+
+
+def collect_solver_stats(solver, status, stats: SolveStats):
+    """CP-SATの応答から統計を記録"""
+    stats.status = solver.StatusName(status)
+    stats.num_branches = solver.NumBranches()
+    stats.num_conflicts = solver.NumConflicts()
+    stats.wall_time = solver.WallTime()
+    stats.user_time = solver.UserTime()
+    if stats.status in ("OPTIMAL", "FEASIBLE"):
+        stats.objective_value = solver.ObjectiveValue()
+        stats.best_bound = solver.BestObjectiveBound()
+        stats.gap = abs(stats.objective_value - stats.best_bound) / max(1.0, abs(stats.objective_value))
+    stats.peak_memory_bytes = peak_memory_bytes()
+
+
+def peak_memory_bytes() -> Optional[int]:
+    """プロセスの最大常駐メモリ（取得できない環境では None）"""
+    if resource is None:
+        return None
+    # Linux では KB 単位で返る
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
@@ -0,0 +1,191 @@
+"""
+コンパイル済みモデルのテンプレート（重みを差し替えて再利用・ファイルへの保存と読み込み）
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from ortools.sat.python import cp_model
+from .data_models import SchedulingProblem, part_label
+from .constraints import SchedulingConstraints, SessionKey
+from .objectives import SchedulingObjectives
+from .constants import SchedulingConfig, LoadBalanceScope
+
+# 保存形式のバージョン（形式を変えた場合は上げる）
+TEMPLATE_FORMAT_VERSION = 1
+
+
+def model_structure(problem: SchedulingProblem, model_mode: str) -> Dict[str, Any]:
+    """モデルの変数・制約を決める問題の構造（重み・優先度は含まない）"""
+    structure = {
+        "model_mode": model_mode,
+        "parts": [part_label(part) for part in problem.parts],
+        "rooms": [room.id for room in problem.rooms],
+        "time_slots": [time_slot.id for time_slot in problem.time_slots],
+        "instructors": [instructor.id for instructor in problem.get_instructors()],
+        "eligible": [[instructor.id for instructor in problem.get_eligible_instructors(part)] for part in problem.parts],
+    }
+    # 持ち越しのセッション数・均等割り振りの範囲は制約に含まれる（既定値の場合は従来の構造と同じにする）
+    if any(problem.instructor_load_offsets.values()):
+        structure["load_offsets"] = [problem.get_load_offset(instructor.id) for instructor in problem.get_instructors()]
+    if problem.load_balance_scope != LoadBalanceScope.DAY:
+        structure["load_balance_scope"] = problem.load_balance_scope
+    return structure
+
+
+class ModelTemplate:
+    """問題の構造から一度だけ構築したモデル
+    
+    制約と補助変数（指導者のセッション数の最大・最小、所属パートの組み合わせごとの違反変数）を保持し、
+    目的関数の係数（均等性重み・プレイヤーの重複優先度）は instantiate() のたびに設定する。
+    優先度が0のグループの違反変数も作成しておくため、優先度を変えてもモデルを作り直さずに済む。
+    ただし、コンパイル時に存在しなかった所属パートの組み合わせは扱えない。
+    """
+    
+    def __init__(self, model: cp_model.CpModel, structure: Dict[str, Any],
+                 session_keys: List[Tuple[int, Optional[int], int, int]], session_indices: List[int],
+                 spread_indices: Optional[Tuple[int, int]],
+                 group_violations: Dict[Tuple[int, ...], List[int]]):
+        self.model = model  # 目的関数を設定していないモデル（instantiate() で複製して使う）
+        self.structure = structure
+        # セッション変数のキー（パートは位置）と、モデル内の変数の位置
+        self.session_keys = session_keys
+        self.session_indices = session_indices
+        # 指導者のセッション数の (最大値, 最小値) 変数の位置（指導者が1人の場合は None）
+        self.spread_indices = spread_indices
+        # 所属パートの組み合わせ（パートの位置）-> 時間コマごとの違反変数の位置
+        self.group_violations = group_violations
+    
+    @property
+    def model_mode(self) -> str:
+        return self.structure["model_mode"]
+    
+    @classmethod
+    def compile(cls, problem: SchedulingProblem,
+                model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE) -> "ModelTemplate":
+        """問題の構造からテンプレートを作成"""
+        constraints = SchedulingConstraints(problem, model_mode)
+        model = constraints.setup_all_constraints()
+        objectives = SchedulingObjectives(problem, constraints.session_vars, constraints.var_index)
+        
+        objectives.create_equality_objective(model)
+        spread_indices = None
+        if objectives.spread_vars is not None:
+            max_var, min_var = objectives.spread_vars
+            spread_indices = (max_var.Index(), min_var.Index())
+        
+        group_violations = {}
+        for parts in problem.get_part_groups():
+            if len(parts) < 2:
+                continue
+            violations = objectives.get_group_violations(model, parts)
+            group_violations[tuple(problem.part_index(part) for part in parts)] = [
+                violation.Index() for violation in violations.values()
+            ]
+        
+        session_keys, session_indices = [], []
+        for (part, room_id, time_slot_id, instructor_id), var in constraints.session_vars.items():
+            session_keys.append((problem.part_index(part), room_id, time_slot_id, instructor_id))
+            session_indices.append(var.Index())
+        
+        return cls(model, model_structure(problem, model_mode), session_keys, session_indices,
+                   spread_indices, group_violations)
+    
+    def matches(self, problem: SchedulingProblem, model_mode: Optional[str] = None) -> bool:
+        """問題（とモデル形式）の構造がテンプレートと一致するかどうか"""
+        if model_mode is None:
+            model_mode = self.model_mode
+        return model_structure(problem, model_mode) == self.structure
+    
+    def instantiate(self, problem: SchedulingProblem,
+                    equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT
+                    ) -> Tuple[cp_model.CpModel, Dict[SessionKey, cp_model.IntVar]]:
+        """モデルを複製して目的関数を設定し、(モデル, セッション変数) を返す
+        
+        problem はテンプレートと同じ構造の問題で、プレイヤーの重複優先度はこの問題の値を使う。
+        """
+        assert self.matches(problem), "問題の構造がテンプレートと一致しません"
+        model = self.model.Clone()
+        session_vars = {
+            (problem.parts[part_index], room_id, time_slot_id, instructor_id): model.GetBoolVarFromProtoIndex(index)
+            for (part_index, room_id, time_slot_id, instructor_id), index in zip(self.session_keys, self.session_indices)
+        }
+        self.bind_objective(model, problem, equality_weight)
+        return model, session_vars
+    
+    def bind_objective(self, model: cp_model.CpModel, problem: SchedulingProblem,
+                       equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT):
+        """モデルの目的関数を、均等性重みと問題のプレイヤーの重複優先度で設定し直す"""
+        indices: List[int] = []
+        coefficients: List[int] = []
+        if self.spread_indices is not None:
+            max_index, min_index = self.spread_indices
+            indices += [max_index, min_index]
+            coefficients += [equality_weight, -equality_weight]
+        else:
+            # 指導者が1人の場合はセッション数を最大化（SchedulingObjectives と同じ）
+            indices += self.session_indices
+            coefficients += [-1] * len(self.session_indices)
+        
+        for parts, priority in problem.get_part_groups().items():
+            if len(parts) < 2 or priority == 0:
+                continue
+            positions = tuple(problem.part_index(part) for part in parts)
+            if positions not in self.group_violations:
+                raise ValueError(
+                    f"テンプレートに含まれない所属パートの組み合わせです: {[part_label(part) for part in parts]}"
+                )
+            violation_indices = self.group_violations[positions]
+            indices += violation_indices
+            coefficients += [priority] * len(violation_indices)
+        
+        # 変数オブジェクトを経由せず、目的関数の proto を直接書き換える（Proto() の戻り値を保持して参照する）
+        model_proto = model.Proto()
+        _clear_objective(model_proto)
+        model_proto.objective.vars.extend(indices)
+        model_proto.objective.coeffs.extend(coefficients)
+    
+    def save(self, path: str):
+        """テンプレートをJSONファイルに保存（モデルはテキスト形式の CpModelProto）"""
+        data = {
+            "version": TEMPLATE_FORMAT_VERSION,
+            "structure": self.structure,
+            "session_keys": [list(key) + [index] for key, index in zip(self.session_keys, self.session_indices)],
+            "spread_indices": self.spread_indices,
+            "group_violations": [[list(parts), indices] for parts, indices in self.group_violations.items()],
+            "model": str(self.model.Proto()),
+        }
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+    
+    @classmethod
+    def load(cls, path: str) -> "ModelTemplate":
+        """save() で保存したテンプレートを読み込む"""
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != TEMPLATE_FORMAT_VERSION:
+            raise ValueError(f"未対応のテンプレート形式です: {data.get('version')}")
+        
+        model = cp_model.CpModel()
+        _parse_text_format(model.Proto(), data["model"])
+        session_keys = [tuple(key[:4]) for key in data["session_keys"]]
+        session_indices = [key[4] for key in data["session_keys"]]
+        spread_indices = tuple(data["spread_indices"]) if data["spread_indices"] is not None else None
+        group_violations = {tuple(parts): indices for parts, indices in data["group_violations"]}
+        return cls(model, data["structure"], session_keys, session_indices, spread_indices, group_violations)
+
+
+# CpModel.Proto() は OR-Tools 9.15 以降は pybind の CpModelProto、それ以前は protobuf のメッセージを返す
+def _clear_objective(model_proto):
+    """目的関数を消去"""
+    if hasattr(model_proto, "clear_objective"):
+        model_proto.clear_objective()
+    else:
+        model_proto.ClearField("objective")
+
+
+def _parse_text_format(model_proto, text: str):
+    """テキスト形式の CpModelProto を読み込む"""
+    if hasattr(model_proto, "parse_text_format"):
+        model_proto.parse_text_format(text)
+    else:
+        from google.protobuf import text_format
+        text_format.Parse(text, model_proto)
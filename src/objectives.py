@@ -1,99 +1,150 @@
 """
 スケジューリング最適化の目的関数
 """
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from ortools.sat.python import cp_model
-from .data_models import SchedulingProblem, PartType
-from .constants import ConstraintLimits
+from .data_models import SchedulingProblem, PartId, part_label
+from .constraints import SessionVarIndex
+from .bounds import derive_bounds
 
 
 class SchedulingObjectives:
     """スケジューリングの目的関数を管理するクラス"""
     
-    def __init__(self, problem: SchedulingProblem, session_vars: dict):
+    def __init__(self, problem: SchedulingProblem, session_vars: dict, var_index: Optional[SessionVarIndex] = None):
         self.problem = problem
         self.session_vars = session_vars
+        # 変数のグループ索引（制約側で作成済みのものを渡せば再構築しない）
+        self.var_index = var_index if var_index is not None else SessionVarIndex(session_vars)
+        # (part, time_slot_id) -> 「パートがその時間コマに練習する」指標変数（全プレイヤーで共有）
+        self.part_slot_vars: Dict[Tuple[PartId, int], cp_model.IntVar] = {}
+        # 所属パートの組み合わせ -> {time_slot_id: 違反変数}（目的関数を再設定しても再利用する）
+        self.group_violation_vars: Dict[Tuple[PartId, ...], Dict[int, cp_model.IntVar]] = {}
+        # 指導者のセッション数の (最大値, 最小値) 変数
+        self.spread_vars: Optional[Tuple[cp_model.IntVar, cp_model.IntVar]] = None
+        # 均等割り振り項（重みなし）の上限制約（段階的な求解で第1段階の値に固定する。未使用なら None）
+        self.equality_limit: Optional[cp_model.Constraint] = None
     
-    def setup_objective(self, model: cp_model.CpModel, equality_weight: int = 100):
-        """目的関数を設定"""
+    def setup_objective(self, model: cp_model.CpModel, equality_weight: int = 100, extra_objective=None):
+        """目的関数を設定
+        
+        同じモデルに対して再度呼び出すと、作成済みの補助変数を再利用して目的関数だけを置き換える。
+        extra_objective には追加の最小化項（線形式）を指定できる。
+        """
         # 均等割り振りの目的関数（重み付き）
-        equality_objective = self.create_equality_objective(model, equality_weight)
+        objective = self.create_equality_objective(model, equality_weight)
         
         # プレイヤー制約違反ペナルティ（個人別優先度）
         player_penalty = self.create_player_penalty(model)
+        if player_penalty is not None:
+            objective = objective + player_penalty
+        
+        if extra_objective is not None:
+            objective = objective + extra_objective
         
         # 目的関数を設定
-        if player_penalty is not None:
-            model.Minimize(equality_objective + player_penalty)
-        else:
-            model.Minimize(equality_objective)
+        model.Minimize(objective)
     
     def create_equality_objective(self, model: cp_model.CpModel, weight: int = 100):
-        """均等割り振りの目的関数を作成（重み付き）"""
-        instructor_session_counts = []
-        for instructor in self.problem.players:
-            if not instructor.is_instructor:
-                continue
-                
-            sessions = []
-            for part in self.problem.parts:
-                for room in self.problem.rooms:
-                    for time_slot in self.problem.time_slots:
-                        if (part, room.id, time_slot.id, instructor.id) in self.session_vars:
-                            sessions.append(
-                                self.session_vars[(part, room.id, time_slot.id, instructor.id)]
-                            )
-            instructor_session_counts.append(sum(sessions))
+        """均等割り振りの目的関数を作成（重み付き）
+        
+        問題に持ち越しのセッション数がある場合は、それを加えた累積のセッション数の差を最小化する。
+        """
+        instructors = self.problem.get_instructors()
+        instructor_session_counts = [
+            sum(self.var_index.by_instructor.get(instructor.id, []))
+            for instructor in instructors
+        ]
         
         # セッション数の分散を最小化
         if len(instructor_session_counts) > 1:
             # 分散を最小化（簡略化：最大値と最小値の差を最小化）
-            max_var = model.NewIntVar(0, ConstraintLimits.MAX_SESSIONS, "max_sessions")
-            min_var = model.NewIntVar(0, ConstraintLimits.MAX_SESSIONS, "min_sessions")
-            
-            for count in instructor_session_counts:
-                model.Add(count <= max_var)
-                model.Add(count >= min_var)
+            if self.spread_vars is None:
+                # 均等割り振り制約により、各指導者のセッション数は パート数÷指導者数 の切り捨て〜切り上げ
+                bounds = derive_bounds(self.problem)
+                offsets = [self.problem.get_load_offset(instructor.id) for instructor in instructors]
+                lower, upper = bounds.load_lower + min(offsets), bounds.load_upper + max(offsets)
+                max_var = model.NewIntVar(lower, upper, "max_sessions")
+                min_var = model.NewIntVar(lower, upper, "min_sessions")
+                
+                for count, offset in zip(instructor_session_counts, offsets):
+                    model.Add(count + offset <= max_var)
+                    model.Add(count + offset >= min_var)
+                self.spread_vars = (max_var, min_var)
             
-            # 重みを適用
-            weighted_difference = model.NewIntVar(0, ConstraintLimits.MAX_WEIGHTED_EQUALITY, "weighted_equality")
-            model.Add(weighted_difference == (max_var - min_var) * weight)
-            return weighted_difference
+            # 重みは目的関数の係数として適用（重みの変更で変数・制約を作り直さない）
+            max_var, min_var = self.spread_vars
+            return weight * (max_var - min_var)
         else:
             # 指導者が1人の場合は単純にセッション数を最大化
             return -sum(instructor_session_counts)  # 最大化のため負の値を返す
     
+    def set_equality_limit(self, model: cp_model.CpModel, limit: Optional[int]):
+        """均等割り振り項（重みなし）の上限を設定（None で解除）
+        
+        制約は最初の呼び出しで一度だけ作成し、以降は上限だけを書き換える（モデルに制約を積み増さない）。
+        """
+        if self.equality_limit is None:
+            if limit is None:
+                return
+            self.equality_limit = model.Add(self.create_equality_objective(model, 1) <= limit)
+            return
+        # Proto() の戻り値を保持したまま参照する（一時オブジェクト経由の書き換えは不可）
+        model_proto = model.Proto()
+        domain = model_proto.constraints[self.equality_limit.Index()].linear.domain
+        domain[len(domain) - 1] = cp_model.INT_MAX if limit is None else limit
+    
+    def get_part_slot_indicator(self, model: cp_model.CpModel, part: PartId, time_slot_id: int) -> Optional[cp_model.IntVar]:
+        """パートがその時間コマに練習するかどうかの指標変数を取得（未作成なら作成）"""
+        key = (part, time_slot_id)
+        if key not in self.part_slot_vars:
+            sessions = self.var_index.by_part_slot.get(key)
+            if not sessions:
+                return None
+            # 各パートは1日1回なので、セッション変数の和は0か1になる
+            indicator = model.NewBoolVar(f"part_slot_{part_label(part)}_{time_slot_id}")
+            model.Add(indicator == sum(sessions))
+            self.part_slot_vars[key] = indicator
+        return self.part_slot_vars[key]
+    
+    def group_players_by_parts(self) -> Dict[Tuple[PartId, ...], int]:
+        """所属パートの組み合わせが同じ一般プレイヤーをまとめ、優先度を合計する"""
+        return self.problem.get_part_groups()
+    
     def create_player_penalty(self, model: cp_model.CpModel):
-        """プレイヤー制約違反ペナルティを作成（個人別優先度）"""
-        player_violations = []
+        """プレイヤー制約違反ペナルティを作成（個人別優先度）
+        
+        所属パートの組み合わせが同じプレイヤーは同じ違反数になるため、
+        組み合わせごとに違反変数を1つだけ作り、優先度の合計を係数とする。
+        """
+        violations = []
+        weights = []
         
-        for player in self.problem.players:
-            if player.is_instructor:
+        for parts, group_priority in self.group_players_by_parts().items():
+            # 所属パートが1つ以下、または優先度0のグループは違反・ペナルティが生じない
+            if len(parts) < 2 or group_priority == 0:
                 continue
-                
-            # 個人の優先度を取得（デフォルト50）
-            player_priority = getattr(player, 'overlap_priority', 50)
             
+            for violation in self.get_group_violations(model, parts).values():
+                violations.append(violation)
+                weights.append(group_priority)
+        
+        return cp_model.LinearExpr.WeightedSum(violations, weights) if violations else None
+    
+    def get_group_violations(self, model: cp_model.CpModel, parts: Tuple[PartId, ...]) -> Dict[int, cp_model.IntVar]:
+        """所属パートの組み合わせに対する時間コマごとの違反変数を取得（未作成なら作成）"""
+        if parts not in self.group_violation_vars:
+            group_index = len(self.group_violation_vars)
+            violations = {}
             for time_slot in self.problem.time_slots:
-                # そのプレイヤーの所属パートの練習数
-                player_part_sessions = []
-                for player_part in player.parts:
-                    for room in self.problem.rooms:
-                        for instructor in self.problem.players:
-                            if instructor.is_instructor:
-                                if (player_part, room.id, time_slot.id, instructor.id) in self.session_vars:
-                                    player_part_sessions.append(
-                                        self.session_vars[(player_part, room.id, time_slot.id, instructor.id)]
-                                    )
+                # そのグループの所属パートの練習数
+                indicators = [self.get_part_slot_indicator(model, part, time_slot.id) for part in parts]
+                indicators = [indicator for indicator in indicators if indicator is not None]
                 
                 # 違反数 = max(0, 所属パート数 - 1)
-                if player_part_sessions:
-                    violation = model.NewIntVar(0, ConstraintLimits.MAX_VIOLATIONS, f"player_violation_{player.id}_{time_slot.id}")
-                    model.Add(violation >= sum(player_part_sessions) - 1)
-                    
-                    # 個人の優先度を適用
-                    weighted_violation = model.NewIntVar(0, ConstraintLimits.MAX_WEIGHTED_VIOLATIONS, f"weighted_violation_{player.id}_{time_slot.id}")
-                    model.Add(weighted_violation == violation * player_priority)
-                    player_violations.append(weighted_violation)
-        
-        return sum(player_violations) if player_violations else None
+                if len(indicators) > 1:
+                    violation = model.NewIntVar(0, len(indicators) - 1, f"group_violation_{group_index}_{time_slot.id}")
+                    model.Add(violation >= sum(indicators) - 1)
+                    violations[time_slot.id] = violation
+            self.group_violation_vars[parts] = violations
+        return self.group_violation_vars[parts]
@@ -0,0 +1,113 @@
+"""
+ベンチマーク用の合成スケジューリング問題の生成
+"""
+import random
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from .data_models import SchedulingProblem, Player, PartId, Room, TimeSlot
+from .constants import ProblemConfig, CrossPartPolicy, GeneratorDefaults
+
+
+@dataclass
+class ProblemGeneratorConfig:
+    """合成問題の規模と分布の設定（同じ設定・シードからは常に同じ問題が生成される）"""
+    num_parts: int = ProblemConfig.NUM_PARTS
+    num_rooms: int = ProblemConfig.NUM_ROOMS
+    num_instructors: int = ProblemConfig.NUM_INSTRUCTORS
+    num_players: int = ProblemConfig.NUM_GENERAL_PLAYERS  # 一般プレイヤー数
+    num_time_slots: Optional[int] = None  # None=部屋数と指導者数から実行可能な最小限のコマ数を決定
+    parts_per_player: Dict[int, float] = field(default_factory=lambda: dict(GeneratorDefaults.PARTS_PER_PLAYER))
+    priority_distribution: Dict[int, float] = field(
+        default_factory=lambda: dict(GeneratorDefaults.PRIORITY_DISTRIBUTION))
+    extra_instructor_parts: Dict[int, float] = field(
+        default_factory=lambda: dict(GeneratorDefaults.EXTRA_INSTRUCTOR_PARTS))
+    cross_part_policy: str = CrossPartPolicy.OWN_PARTS
+    seed: int = GeneratorDefaults.SEED
+    
+    def __post_init__(self):
+        """初期化後の検証"""
+        assert self.num_parts > 0, "パート数は1以上を指定してください"
+        assert self.num_rooms > 0, "部屋数は1以上を指定してください"
+        assert self.num_instructors > 0, "指導者数は1以上を指定してください"
+        assert self.num_players >= 0, "一般プレイヤー数は0以上を指定してください"
+        assert self.num_time_slots is None or self.num_time_slots >= self._min_time_slots(), \
+            f"時間コマ数が不足しています（最低{self._min_time_slots()}コマ）"
+        for name in ("parts_per_player", "priority_distribution", "extra_instructor_parts"):
+            distribution = getattr(self, name)
+            assert distribution and all(weight >= 0 for weight in distribution.values()) \
+                and sum(distribution.values()) > 0, f"{name} の重みが不正です"
+        assert all(count > 0 for count in self.parts_per_player), "所属パート数は1以上を指定してください"
+        assert all(0 <= priority <= 100 for priority in self.priority_distribution), \
+            "優先度は0-100を指定してください"
+    
+    def _min_time_slots(self) -> int:
+        """全パートを部屋に収め、担当パートの多い指導者も指導できるコマ数"""
+        by_rooms = -(-self.num_parts // self.num_rooms)
+        by_instructors = -(-self.num_parts // self.num_instructors)
+        return max(by_rooms, by_instructors)
+    
+    def get_num_time_slots(self) -> int:
+        """時間コマ数（未指定の場合は既存の計算式 パート数//部屋数+1 と実行可能性から決定）"""
+        if self.num_time_slots is not None:
+            return self.num_time_slots
+        return max(self.num_parts // self.num_rooms + 1, self._min_time_slots())
+
+
+def _sample(rng: random.Random, distribution: Dict[int, float]) -> int:
+    """重み付きの分布から1つ選ぶ"""
+    return rng.choices(list(distribution), weights=list(distribution.values()))[0]
+
+
+def generate_problem(config: Optional[ProblemGeneratorConfig] = None) -> SchedulingProblem:
+    """設定に従って合成問題を生成
+    
+    各パートには必ず1人以上の指導者が所属し（担当パートは指導者に均等に配られる）、
+    時間コマ数は全パートを割り当てられるだけ確保されるため、生成された問題は常に実行可能である。
+    """
+    if config is None:
+        config = ProblemGeneratorConfig()
+    rng = random.Random(config.seed)
+    
+    parts: List[PartId] = [f"P{i}" for i in range(1, config.num_parts + 1)]
+    rooms = [Room(id=i, name=f"練習室{i}") for i in range(1, config.num_rooms + 1)]
+    time_slots = [TimeSlot(id=i, name=f"{i}限目") for i in range(1, config.get_num_time_slots() + 1)]
+    
+    # 担当パートを指導者に均等に配る（順序はシードで決まる）
+    shuffled_parts = list(parts)
+    rng.shuffle(shuffled_parts)
+    instructor_parts: List[List[PartId]] = [[] for _ in range(config.num_instructors)]
+    for i, part in enumerate(shuffled_parts):
+        instructor_parts[i % config.num_instructors].append(part)
+    
+    players = []
+    for i, own_parts in enumerate(instructor_parts):
+        others = [part for part in parts if part not in own_parts]
+        num_extra = min(_sample(rng, config.extra_instructor_parts), len(others))
+        if not own_parts:
+            # 指導者がパートより多い場合も、少なくとも1つのパートに所属させる
+            num_extra = max(num_extra, 1)
+        players.append(Player(
+            id=i + 1,
+            name=f"指導者{i + 1}",
+            parts=own_parts + rng.sample(others, num_extra),
+            is_instructor=True,
+            overlap_priority=_sample(rng, config.priority_distribution)
+        ))
+    
+    for i in range(config.num_players):
+        player_id = config.num_instructors + i + 1
+        num_parts = min(_sample(rng, config.parts_per_player), len(parts))
+        players.append(Player(
+            id=player_id,
+            name=f"プレイヤー{player_id}",
+            parts=rng.sample(parts, num_parts),
+            overlap_priority=_sample(rng, config.priority_distribution)
+        ))
+    
+    return SchedulingProblem(
+        players=players,
+        rooms=rooms,
+        time_slots=time_slots,
+        parts=parts,
+        cross_part_policy=config.cross_part_policy
+    )
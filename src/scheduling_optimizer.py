@@ -1,156 +1,629 @@
 """
 メインのスケジューリング最適化クラス
 """
+import queue
+import threading
 import time
-from typing import List, Optional
+from typing import Iterator, List, Optional, Sequence, Tuple
 from ortools.sat.python import cp_model
 from .data_models import (
-    SchedulingProblem, SchedulingSolution, PracticeSession, 
+    SchedulingProblem, SchedulingSolution, PracticeSession, ProblemChange, SessionTable,
     Player, PartType, Room, TimeSlot
 )
 from .constraints import SchedulingConstraints
 from .objectives import SchedulingObjectives
-from .constants import SchedulingConfig, ProblemConfig
+from .solver_config import SolverConfig
+from .fingerprint import CanonicalProblem, problem_fingerprint
+from .solution_cache import SolutionCache
+from .evaluator import SolutionEvaluator
+from .heuristic import HeuristicSolver
+from .model_template import ModelTemplate
+from .export import TimetableExporter
+from .diagnostics import InfeasibilityReport, check_capacity
+from .instrumentation import (
+    Instrumentation, LoggingInstrumentation, SolveStats, SolverLogTimer,
+    collect_model_stats, collect_solver_stats
+)
+from .constants import SchedulingConfig, ProblemConfig, ModelMode, ConstraintGroup
 
 
 class SchedulingOptimizer:
     """スケジューリング最適化のメインクラス"""
     
-    def __init__(self, problem: SchedulingProblem):
+    def __init__(self, problem: SchedulingProblem, cache: Optional[SolutionCache] = None,
+                 instrumentation: Optional[Instrumentation] = None, template: Optional[ModelTemplate] = None):
         self.problem = problem
+        self.cache = cache  # 指定した場合、同一（並び替え・ID振り直しを含む）の問題は解を再利用
+        # 指定した場合、構造が一致する問題ではモデルを構築せずテンプレートを複製して使う
+        self.template = template
+        # 進捗・計測値の出力先（デフォルトは logging）
+        self.instrumentation = instrumentation if instrumentation is not None else LoggingInstrumentation()
         self.constraints = SchedulingConstraints(problem)
         self.objectives = None  # 制約設定後に初期化
+        self.model: Optional[cp_model.CpModel] = None  # 構築済みモデル（再求解で再利用）
+        self.equality_weight = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT
+        self._active_solver: Optional[cp_model.CpSolver] = None  # 実行中のソルバー（stop_search用）
+        self._stop_requested = False
+        self._evaluator: Optional[SolutionEvaluator] = None  # get_evaluator() で作成
+        # 直近の求解で問題が実行不可能だった場合の診断結果（解が見つかった場合・判定できなかった場合は None）
+        self.infeasibility_report: Optional[InfeasibilityReport] = None
+    
+    def build_model(self, equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+                    model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+                    stats: Optional[SolveStats] = None) -> cp_model.CpModel:
+        """制約条件と目的関数を設定したモデルを構築（stats を指定するとフェーズ別の時間を記録）"""
+        if self.template is not None and self.template.matches(self.problem, model_mode):
+            return self._instantiate_template(equality_weight, model_mode, stats)
+        return self._construct_model(equality_weight, model_mode, stats)
+    
+    def _construct_model(self, equality_weight: int, model_mode: str,
+                         stats: Optional[SolveStats] = None) -> cp_model.CpModel:
+        """制約条件と目的関数を設定したモデルを Python で構築"""
+        self.instrumentation.event("制約条件を設定中...")
+        self.constraints = SchedulingConstraints(self.problem, model_mode)
+        model = self.constraints.setup_all_constraints(self.instrumentation, stats)
+        
+        self.instrumentation.event("目的関数を設定中...")
+        with self.instrumentation.phase("objective", stats):
+            self.objectives = SchedulingObjectives(self.problem, self.constraints.session_vars, self.constraints.var_index)
+            self.objectives.setup_objective(model, equality_weight)
+        
+        self.model = model
+        self.equality_weight = equality_weight
+        return model
+    
+    def _instantiate_template(self, equality_weight: int, model_mode: str,
+                              stats: Optional[SolveStats] = None) -> cp_model.CpModel:
+        """テンプレートを複製し、重みを設定したモデルを作成"""
+        self.instrumentation.event("コンパイル済みモデルを使用します")
+        with self.instrumentation.phase("instantiate_template", stats):
+            model, session_vars = self.template.instantiate(self.problem, equality_weight)
+        self.constraints = SchedulingConstraints(self.problem, model_mode)
+        self.constraints.model = model
+        self.constraints.session_vars = session_vars
+        # 差分反映用の制約・補助変数は持たないため、再求解ではモデルを構築し直す
+        self.objectives = None
+        
+        self.model = model
+        self.equality_weight = equality_weight
+        return model
+    
+    def solve(self, time_limit_seconds: int = SchedulingConfig.DEFAULT_TIME_LIMIT, equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+              model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+              solver_config: Optional[SolverConfig] = None,
+              initial_solution: Optional[SchedulingSolution] = None) -> Optional[SchedulingSolution]:
+        """スケジューリング問題を解く
+        
+        model_mode に ModelMode.COMPACT を指定すると、部屋を区別しないモデル
+        （パート→時間コマ・指導者）で解き、部屋番号は解の抽出時に割り当てる。
+        solver_config で並列ワーカー数・プリセット・乱数シードなどを指定できる。
+        solver_config.heuristic_hint / heuristic_fallback を指定すると、先にヒューリスティック解法で
+        時間割を作り、CP-SATの初期解ヒントや解が見つからない場合の代わりの解として使う。
+        solver_config.objective_mode に ObjectiveMode.LEXICOGRAPHIC を指定すると、均等割り振り項と
+        重複ペナルティを重み付きの和にせず、段階的に解く（_solve_lexicographic() 参照）。
+        initial_solution を指定すると、その解（重みの近い別の求解の解など）をCP-SATの初期解ヒントにする
+        （ヒューリスティック解法のヒントより優先する）。
+        """
+        if self.cache is not None:
+            canonical = CanonicalProblem(self.problem)
+            cache_key = problem_fingerprint(self.problem, equality_weight, model_mode, solver_config,
+                                            time_limit_seconds, canonical)
+            cached = self.cache.get(cache_key, canonical)
+            if cached is not None:
+                self.instrumentation.event("キャッシュされた解を使用します")
+                return cached
+        
+        try:
+            if self._fails_capacity_check():
+                return None
+            
+            stats = SolveStats()
+            lexicographic = solver_config is not None and solver_config.is_lexicographic
+            if lexicographic:
+                # 段階ごとの目的関数の設定に補助変数が必要なため、テンプレートは使わずに構築する
+                model = self._construct_model(equality_weight, model_mode, stats)
+            else:
+                model = self.build_model(equality_weight, model_mode, stats)
+            heuristic_solution = self._run_heuristic(model, solver_config, stats)
+            if initial_solution is not None:
+                self._add_solution_hint(model, self._solution_keys(initial_solution))
+            fallback = heuristic_solution if solver_config is not None and solver_config.heuristic_fallback else None
+            if lexicographic:
+                solution = self._solve_lexicographic(model, time_limit_seconds, solver_config, stats, fallback)
+            else:
+                solution = self._solve_model(model, time_limit_seconds, solver_config, stats, fallback)
+        finally:
+            # 停止要求はこの求解で消費し、以降の求解には持ち越さない
+            self._stop_requested = False
+        
+        if self.cache is not None and solution is not None:
+            self.cache.put(cache_key, canonical, solution)
+        return solution
+    
+    def resolve(self, previous_solution: SchedulingSolution, changes: Optional[ProblemChange] = None,
+                time_limit_seconds: int = SchedulingConfig.DEFAULT_TIME_LIMIT, disruption_weight: int = 0,
+                solver_config: Optional[SolverConfig] = None) -> Optional[SchedulingSolution]:
+        """前回の解を初期解として、変更を反映した問題を再求解する
+        
+        構築済みのモデルとセッション変数を再利用し、変更の影響を受ける制約だけを更新する。
+        部屋の削除・一般プレイヤーの変更・指導可能パートの縮小は差分で反映し、
+        指導者の追加・削除や指導可能パートの追加など新しい変数が必要な変更はモデルを再構築する。
+        disruption_weight > 0 の場合、前回から変更されたセッション数に重みを掛けて最小化する。
+        solver_config.objective_mode に ObjectiveMode.LEXICOGRAPHIC を指定すると solve() と同様に段階的に解き、
+        変更されたセッション数の項は第2段階で重複ペナルティに加える。
+        """
+        new_problem = changes.apply_to(self.problem) if changes is not None else self.problem
+        model_mode = self.constraints.model_mode
+        stats = SolveStats()
+        
+        if self.model is None or self.objectives is None or self._requires_rebuild(new_problem):
+            self.problem = new_problem
+            # 差分反映用の制約・補助変数が必要なため、テンプレートは使わずに構築する
+            model = self._construct_model(self.equality_weight, model_mode, stats)
+        else:
+            self.instrumentation.event("変更を反映中...")
+            with self.instrumentation.phase("incremental_changes", stats):
+                self._apply_incremental_changes(new_problem)
+            model = self.model
+        
+        with self.instrumentation.phase("objective", stats):
+            previous_keys = self._solution_keys(previous_solution)
+            self._add_solution_hint(model, previous_keys)
+            
+            disruption = None
+            if disruption_weight > 0:
+                kept_sessions = [self.constraints.session_vars[key] for key in previous_keys if key in self.constraints.session_vars]
+                disruption = disruption_weight * (len(kept_sessions) - sum(kept_sessions))
+            self.objectives.setup_objective(model, self.equality_weight, disruption)
+        
+        try:
+            if solver_config is not None and solver_config.is_lexicographic:
+                return self._solve_lexicographic(model, time_limit_seconds, solver_config, stats,
+                                                 extra_objective=disruption)
+            return self._solve_model(model, time_limit_seconds, solver_config, stats)
+        finally:
+            self._stop_requested = False
+    
+    def _requires_rebuild(self, new_problem: SchedulingProblem) -> bool:
+        """変更の反映にモデルの再構築が必要かどうか"""
+        old_instructor_ids = [instructor.id for instructor in self.problem.get_instructors()]
+        new_instructor_ids = [instructor.id for instructor in new_problem.get_instructors()]
+        if old_instructor_ids != new_instructor_ids:
+            return True
+        
+        # 新たに指導可能になった組み合わせには変数が存在しない
+        for part in new_problem.parts:
+            old_ids = {instructor.id for instructor in self.problem.get_eligible_instructors(part)}
+            if any(instructor.id not in old_ids for instructor in new_problem.get_eligible_instructors(part)):
+                return True
         
-    def solve(self, time_limit_seconds: int = SchedulingConfig.DEFAULT_TIME_LIMIT, equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT) -> Optional[SchedulingSolution]:
-        """スケジューリング問題を解く"""
-        print("制約条件を設定中...")
-        model = self.constraints.setup_all_constraints()
+        # FULLモードでは追加された部屋の変数が存在しない
+        if self.constraints.model_mode == ModelMode.FULL:
+            old_room_ids = {room.id for room in self.problem.rooms}
+            if any(room.id not in old_room_ids for room in new_problem.rooms):
+                return True
+        return False
+    
+    def _apply_incremental_changes(self, new_problem: SchedulingProblem):
+        """構築済みモデルに差分の制約を反映"""
+        for part in self.problem.parts:
+            new_ids = {instructor.id for instructor in new_problem.get_eligible_instructors(part)}
+            for instructor in self.problem.get_eligible_instructors(part):
+                if instructor.id not in new_ids:
+                    self.constraints.disable_assignment(part, instructor.id)
         
-        print("目的関数を設定中...")
-        self.objectives = SchedulingObjectives(self.problem, self.constraints.session_vars)
-        self.objectives.setup_objective(model, equality_weight)
+        if self.constraints.model_mode == ModelMode.COMPACT:
+            self.constraints.set_slot_capacity(len(new_problem.rooms))
+        else:
+            new_room_ids = {room.id for room in new_problem.rooms}
+            for room in self.problem.rooms:
+                if room.id not in new_room_ids:
+                    self.constraints.disable_room(room.id)
         
-        print("ソルバーを実行中...")
+        self.problem = new_problem
+        self.constraints.problem = new_problem
+        self.objectives.problem = new_problem
+    
+    def _solution_keys(self, solution: SchedulingSolution) -> List[tuple]:
+        """解のセッションをセッション変数のキーに変換"""
+        compact = self.constraints.model_mode == ModelMode.COMPACT
+        return [
+            (session.part, None if compact else session.room_id, session.time_slot_id, session.instructor_id)
+            for session in solution.sessions
+        ]
+    
+    def _add_solution_hint(self, model: cp_model.CpModel, session_keys: List[tuple]):
+        """前回の解をヒントとして設定"""
+        model.ClearHints()
+        active = set(session_keys)
+        for key, var in self.constraints.session_vars.items():
+            model.AddHint(var, 1 if key in active else 0)
+    
+    def _run_heuristic(self, model: cp_model.CpModel, solver_config: Optional[SolverConfig],
+                       stats: SolveStats) -> Optional[SchedulingSolution]:
+        """設定に応じてヒューリスティック解法を実行し、必要ならその解をヒントに設定"""
+        if solver_config is None or not solver_config.uses_heuristic:
+            return None
+        
+        self.instrumentation.event("ヒューリスティック解法を実行中...")
+        with self.instrumentation.phase("heuristic", stats):
+            heuristic = HeuristicSolver(self.problem, self.equality_weight, solver_config.random_seed)
+            solution = heuristic.solve(solver_config.heuristic_time_limit)
+            if solution is not None and solver_config.heuristic_hint:
+                self._add_solution_hint(model, self._solution_keys(solution))
+        
+        if solution is None:
+            self.instrumentation.event("ヒューリスティック解法では解が見つかりませんでした")
+        else:
+            self.instrumentation.event(f"ヒューリスティック解法の目的関数値: {solution.objective_value}")
+        return solution
+    
+    def _create_solver(self, time_limit_seconds: int, solver_config: Optional[SolverConfig],
+                       model: cp_model.CpModel, stats: SolveStats) -> Tuple[cp_model.CpSolver, Optional[SolverLogTimer]]:
+        """パラメータを設定したソルバーを作成し、モデルの規模を記録"""
+        if solver_config is None:
+            solver_config = SolverConfig()
         solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = time_limit_seconds
+        solver_config.apply_to(solver.parameters, time_limit_seconds)
+        collect_model_stats(model, stats)
+        
+        log_timer = None
+        if self.instrumentation.capture_solver_log:
+            # ログを標準出力には出さず、前処理の終了時刻の判定にだけ使う
+            log_timer = SolverLogTimer()
+            solver.parameters.log_search_progress = True
+            solver.parameters.log_to_stdout = False
+            solver.log_callback = log_timer
+        return solver, log_timer
+    
+    def _finish_stats(self, solver: cp_model.CpSolver, status, stats: SolveStats,
+                      log_timer: Optional[SolverLogTimer], solve_time: float):
+        """ソルバーの統計を記録して計測フックに渡す"""
+        solver_phases = {"solve": solve_time}
+        if log_timer is not None:
+            solver_phases.update(log_timer.split(solve_time))
+        for name, seconds in solver_phases.items():
+            stats.phase_seconds[name] = seconds
+            self.instrumentation.on_phase(name, seconds)
+        collect_solver_stats(solver, status, stats)
+        self.instrumentation.finish(stats)
+    
+    def _solve_model(self, model: cp_model.CpModel, time_limit_seconds: int,
+                     solver_config: Optional[SolverConfig],
+                     stats: Optional[SolveStats] = None,
+                     fallback: Optional[SchedulingSolution] = None) -> Optional[SchedulingSolution]:
+        """構築済みのモデルを解く（解が見つからない場合・停止が要求された場合は fallback を返す）"""
+        if stats is None:
+            stats = SolveStats()
+        
+        self.instrumentation.event("ソルバーを実行中...")
+        self.infeasibility_report = None
+        solver, log_timer = self._create_solver(time_limit_seconds, solver_config, model, stats)
         
+        self._active_solver = solver
+        if self._stop_requested:
+            self.instrumentation.event("探索の停止が要求されたため求解を中止します")
+            self._active_solver = None
+            return fallback
         start_time = time.time()
-        status = solver.Solve(model)
+        if log_timer is not None:
+            log_timer.start_time = time.perf_counter()
+        try:
+            status = solver.Solve(model)
+        finally:
+            self._active_solver = None
         solve_time = time.time() - start_time
         
+        solution = None
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            print(f"解が見つかりました (ステータス: {status})")
-            print(f"求解時間: {solve_time:.2f}秒")
+            self.instrumentation.event(f"解が見つかりました (ステータス: {solver.StatusName(status)})")
+            self.instrumentation.event(f"求解時間: {solve_time:.2f}秒")
             
-            sessions = self._extract_solution(solver)
-            objective_value = self._calculate_objective_value(sessions)
-            
-            return SchedulingSolution(
-                sessions=sessions,
-                objective_value=objective_value,
-                is_optimal=(status == cp_model.OPTIMAL),
-                solve_time_seconds=solve_time
-            )
+            with self.instrumentation.phase("extract_solution", stats):
+                solution = self._build_solution(solver, status == cp_model.OPTIMAL, solve_time)
+            solution.stats = stats
         else:
-            print(f"解が見つかりませんでした (ステータス: {status})")
-            return None
+            self.instrumentation.event(f"解が見つかりませんでした (ステータス: {solver.StatusName(status)})")
+            if status == cp_model.INFEASIBLE:
+                with self.instrumentation.phase("diagnose", stats):
+                    self.infeasibility_report = self.diagnose_infeasibility(self.constraints.model_mode)
+            if fallback is not None:
+                self.instrumentation.event("ヒューリスティック解法の解を返します")
+                solution = fallback
+                solution.stats = stats
+        
+        self._finish_stats(solver, status, stats, log_timer, solve_time)
+        return solution
     
+    def _fails_capacity_check(self) -> bool:
+        """求解前に容量を調べ、明らかに実行不可能なら診断結果を記録して True を返す"""
+        self.infeasibility_report = check_capacity(self.problem)
+        if self.infeasibility_report is None:
+            return False
+        self.instrumentation.event("容量が不足しているため求解を行いません")
+        self.instrumentation.event(self.infeasibility_report.describe())
+        return True
     
-    def _extract_solution(self, solver: cp_model.CpSolver) -> List[PracticeSession]:
-        """ソルバーの解から練習セッションを抽出"""
-        sessions = []
-        session_id = 0
+    def diagnose_infeasibility(self, model_mode: Optional[str] = None,
+                               time_limit_seconds: float = SchedulingConfig.DEFAULT_DIAGNOSIS_TIME_LIMIT
+                               ) -> Optional[InfeasibilityReport]:
+        """同時には満たせない制約グループの最小の組を求める（実行可能・判定できない場合は None）
         
-        for part in self.problem.parts:
-            for room in self.problem.rooms:
-                for time_slot in self.problem.time_slots:
-                    for instructor in self.problem.players:
-                        if instructor.is_instructor:
-                            var = self.constraints.session_vars.get((part, room.id, time_slot.id, instructor.id))
-                            if var is not None and solver.Value(var) == 1:
-                                # 参加プレイヤーを取得
-                                player_ids = [p.id for p in self.problem.get_players_by_part(part)]
-                                
-                                session = PracticeSession(
-                                    id=session_id,
-                                    part=part,
-                                    room_id=room.id,
-                                    time_slot_id=time_slot.id,
-                                    instructor_id=instructor.id,
-                                    player_ids=player_ids
-                                )
-                                sessions.append(session)
-                                session_id += 1
+        制約グループ（ConstraintGroup）ごとの有効化リテラルを仮定として与えたモデルを解き、
+        ソルバーが示した実行不可能の十分条件となる仮定の組から、外しても実行不可能なままのグループを
+        1つずつ取り除いて最小の組にする。時間内に判定できなかったグループは残す（is_minimal=False）。
+        """
+        report = check_capacity(self.problem)
+        if report is not None:
+            return report
         
-        return sessions
+        start_time = time.time()
+        constraints = SchedulingConstraints(self.problem, model_mode or self.constraints.model_mode, use_assumptions=True)
+        model = constraints.setup_all_constraints()
+        literals = constraints.enforcement_literals
+        
+        def solve_with(groups: List[str]):
+            """指定したグループだけを課して解き、(ステータス, ソルバー) を返す"""
+            model.ClearAssumptions()
+            model.AddAssumptions([literals[group] for group in groups])
+            solver = cp_model.CpSolver()
+            solver.parameters.max_time_in_seconds = max(0.0, time_limit_seconds - (time.time() - start_time))
+            return solver.Solve(model), solver
+        
+        status, solver = solve_with(list(ConstraintGroup.ALL))
+        if status != cp_model.INFEASIBLE:
+            return None
+        group_of = {literal.Index(): group for group, literal in literals.items()}
+        core = [group_of[index] for index in solver.SufficientAssumptionsForInfeasibility() if index in group_of]
+        if not core:
+            core = list(ConstraintGroup.ALL)
+        
+        is_minimal = True
+        for group in list(core):
+            if len(core) == 1:
+                break
+            reduced = [other for other in core if other != group]
+            reduced_status, _ = solve_with(reduced)
+            if reduced_status == cp_model.INFEASIBLE:
+                core = reduced
+            elif reduced_status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                is_minimal = False
+        
+        report = InfeasibilityReport(conflicting_groups=core, is_minimal=is_minimal)
+        self.instrumentation.event(report.describe())
+        return report
     
-    def _calculate_objective_value(self, sessions: List[PracticeSession]) -> float:
-        """目的関数の値を計算"""
-        # 指導者ごとのセッション数を計算
-        instructor_counts = {}
-        for session in sessions:
-            instructor_id = session.instructor_id
-            instructor_counts[instructor_id] = instructor_counts.get(instructor_id, 0) + 1
+    def _solve_lexicographic(self, model: cp_model.CpModel, time_limit_seconds: int,
+                             solver_config: SolverConfig, stats: SolveStats,
+                             fallback: Optional[SchedulingSolution] = None,
+                             extra_objective=None) -> Optional[SchedulingSolution]:
+        """均等割り振り項 → 重複ペナルティの順に段階的に解く
+        
+        第1段階で均等割り振り項（重みなし）だけを最小化し、その値を上限に固定したうえで、
+        第1段階の解をヒントにして第2段階で重複ペナルティを最小化する。
+        extra_objective（再求解の変更セッション数の項など）は第2段階の目的関数に加える。
+        第1段階は solver_config.balance_time_limit（未指定は全体の一定割合）まで、第2段階は残りの時間を使う。
+        両段階とも最適の場合に is_optimal=True とし、best_bound は第2段階の下界に均等割り振り項を加えた値とする
+        （均等割り振り項を固定した範囲での下界）。
+        第1段階で解が見つからなければ、残りの時間で通常の（重み付きの和の）目的関数で解く。
+        終了後はモデルを通常の目的関数に戻す（再求解で再利用できるように）。
+        """
+        balance_time_limit = solver_config.balance_time_limit
+        if balance_time_limit is None:
+            balance_time_limit = time_limit_seconds * SchedulingConfig.DEFAULT_BALANCE_STAGE_FRACTION
+        balance_time_limit = min(balance_time_limit, time_limit_seconds)
+        start_time = time.time()
+        
+        self.instrumentation.event("第1段階: 均等割り振りを最適化中...")
+        with self.instrumentation.phase("balance_stage", stats):
+            model.Minimize(self.objectives.create_equality_objective(model, 1))
+            solver = cp_model.CpSolver()
+            solver_config.apply_to(solver.parameters, balance_time_limit)
+            self._active_solver = solver
+            try:
+                status = solver.Solve(model) if not self._stop_requested else cp_model.UNKNOWN
+            finally:
+                self._active_solver = None
+        remaining = max(0.0, time_limit_seconds - (time.time() - start_time))
         
-        if not instructor_counts:
-            return 0.0
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            self.instrumentation.event(f"第1段階で解が見つかりませんでした (ステータス: {solver.StatusName(status)})")
+            self.objectives.setup_objective(model, self.equality_weight, extra_objective)
+            if self._stop_requested or remaining <= 0:
+                return fallback
+            return self._solve_model(model, remaining, solver_config, stats, fallback)
         
-        # 分散を計算
-        counts = list(instructor_counts.values())
-        mean_count = sum(counts) / len(counts)
-        variance = sum((count - mean_count) ** 2 for count in counts) / len(counts)
+        balance = round(solver.ObjectiveValue())
+        balance_optimal = status == cp_model.OPTIMAL
+        self.instrumentation.event(f"均等割り振り項: {balance}（{'最適' if balance_optimal else '暫定'}）")
+        balance_solution = self._build_solution(solver, False, time.time() - start_time)
+        balance_solution.best_bound = balance_solution.gap = None
+        balance_solution.stats = stats
         
-        return -variance  # 分散を最小化したいので負の値を返す
+        penalty = self.objectives.create_player_penalty(model)
+        if extra_objective is not None:
+            penalty = extra_objective if penalty is None else penalty + extra_objective
+        if penalty is None or remaining <= 0:
+            # 重複ペナルティが生じない（または時間がない）場合は第1段階の解をそのまま返す
+            balance_solution.is_optimal = balance_optimal and penalty is None
+            self.objectives.setup_objective(model, self.equality_weight)
+            self._finish_stats(solver, status, stats, None, time.time() - start_time)
+            return balance_solution
+        
+        self.instrumentation.event("第2段階: 均等割り振り項を固定して重複ペナルティを最適化中...")
+        model.ClearHints()
+        for var in self.constraints.session_vars.values():
+            model.AddHint(var, solver.Value(var))
+        self.objectives.set_equality_limit(model, balance)
+        model.Minimize(penalty)
+        try:
+            solution = self._solve_model(model, remaining, solver_config, stats, balance_solution)
+        finally:
+            self.objectives.set_equality_limit(model, None)
+            self.objectives.setup_objective(model, self.equality_weight)
+        
+        if solution is not None and solution is not balance_solution:
+            solution.is_optimal = solution.is_optimal and balance_optimal
+            if solution.best_bound is not None:
+                # 第2段階の下界（重複ペナルティ）に固定した均等割り振り項を加え、目的関数値と同じ尺度にする
+                equality_term = self.get_evaluator().evaluate(solution).equality_term
+                solution.best_bound = equality_term + solution.best_bound
+                solution.gap = 0.0 if solution.is_optimal else \
+                    abs(solution.objective_value - solution.best_bound) / max(1.0, abs(solution.objective_value))
+        return solution
     
-    def print_solution(self, solution: SchedulingSolution):
-        """解を分かりやすく表示"""
-        if not solution:
-            print("解がありません")
+    def stop_search(self):
+        """実行中（またはこれから開始する）探索を打ち切る（別スレッドから呼び出せる）
+        
+        停止要求は打ち切った（または次に開始する）1回の solve() / resolve() / solve_iter() で消費され、
+        その後の求解には影響しない。
+        """
+        self._stop_requested = True
+        solver = self._active_solver
+        if solver is not None:
+            solver.StopSearch()
+    
+    def solve_iter(self, time_limit_seconds: int = SchedulingConfig.DEFAULT_TIME_LIMIT,
+                   equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT,
+                   model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+                   solver_config: Optional[SolverConfig] = None,
+                   gap_limit: Optional[float] = None) -> Iterator[SchedulingSolution]:
+        """改善解が見つかるたびに解を返すジェネレータ
+        
+        ソルバーは別スレッドで実行される。呼び出し側がループを抜ける（ジェネレータを閉じる）か、
+        相対ギャップが gap_limit 以下になった時点で探索を打ち切る。
+        最適性が証明された場合は、最後に is_optimal=True の解をもう一度返す。
+        solver_config.heuristic_hint / heuristic_fallback を指定すると、ヒューリスティック解法の解を最初に返す
+        （heuristic_hint の場合はCP-SATの初期解ヒントにも使う）。
+        段階的な求解（ObjectiveMode.LEXICOGRAPHIC）には対応していない。
+        """
+        assert solver_config is None or not solver_config.is_lexicographic, \
+            "solve_iter() は段階的な求解（ObjectiveMode.LEXICOGRAPHIC）に対応していません"
+        if self._fails_capacity_check():
+            self._stop_requested = False
             return
         
-        print(f"\n=== スケジュール結果 ===")
-        print(f"総セッション数: {len(solution.sessions)}")
-        print(f"目的関数値: {solution.objective_value:.2f}")
-        print(f"最適解: {'はい' if solution.is_optimal else 'いいえ'}")
-        print(f"求解時間: {solution.solve_time_seconds:.2f}秒")
-        
-        # 指導者ごとのセッション数
-        instructor_counts = {}
-        for session in solution.sessions:
-            instructor_id = session.instructor_id
-            instructor_counts[instructor_id] = instructor_counts.get(instructor_id, 0) + 1
-        
-        print(f"\n=== 指導者別セッション数 ===")
-        for instructor in self.problem.players:
-            if instructor.is_instructor:
-                count = instructor_counts.get(instructor.id, 0)
-                print(f"{instructor.name} ({instructor.parts}): {count}セッション")
-        
-        # スケジュール表を表示
-        print(f"\n=== スケジュール表 ===")
-        schedule_matrix = solution.get_schedule_matrix()
-        
-        # ヘッダー
-        print("時間\\部屋", end="")
-        for room in self.problem.rooms:
-            print(f"\t{room.name}", end="")
-        print()
-        
-        # 各行
-        for time_slot in self.problem.time_slots:
-            print(f"{time_slot.name}", end="")
-            for room in self.problem.rooms:
-                sessions = schedule_matrix.get(time_slot.id, {}).get(room.id, [])
-                if sessions:
-                    # 複数セッションがある場合はカンマ区切りで表示
-                    session_strs = []
-                    for session in sessions:
-                        instructor = next(i for i in self.problem.players if i.id == session.instructor_id)
-                        session_strs.append(f"{session.part.value}({instructor.name})")
-                    print(f"\t{','.join(session_strs)}", end="")
-                else:
-                    print(f"\t-", end="")
-            print()
+        stats = SolveStats()
+        model = self.build_model(equality_weight, model_mode, stats)
+        heuristic_solution = self._run_heuristic(model, solver_config, stats)
+        
+        self.instrumentation.event("ソルバーを実行中...")
+        solver, log_timer = self._create_solver(time_limit_seconds, solver_config, model, stats)
+        
+        solutions: "queue.Queue" = queue.Queue()
+        callback = _SolutionStreamCallback(self, solutions)
+        result = {}
+        
+        def run():
+            try:
+                if not self._stop_requested:
+                    result["status"] = solver.Solve(model, callback)
+            finally:
+                self._active_solver = None
+                solutions.put(None)
+        
+        self._active_solver = solver
+        start_time = time.time()
+        if log_timer is not None:
+            log_timer.start_time = time.perf_counter()
+        thread = threading.Thread(target=run, name="scheduling-solve-iter", daemon=True)
+        thread.start()
+        try:
+            if heuristic_solution is not None:
+                yield heuristic_solution
+            while True:
+                solution = solutions.get()
+                if solution is None:
+                    break
+                yield solution
+                if gap_limit is not None and solution.gap is not None and solution.gap <= gap_limit:
+                    self.instrumentation.event(f"相対ギャップが{gap_limit}以下になったため探索を終了します")
+                    solver.StopSearch()
+                    break
+            
+            thread.join()
+            if "status" in result:
+                self._finish_stats(solver, result["status"], stats, log_timer, time.time() - start_time)
+            if result.get("status") == cp_model.OPTIMAL:
+                solution = self._build_solution(solver, True, time.time() - start_time)
+                solution.stats = stats
+                yield solution
+        finally:
+            if thread.is_alive():
+                solver.StopSearch()
+                thread.join()
+                if "status" in result:
+                    self._finish_stats(solver, result["status"], stats, log_timer, time.time() - start_time)
+            self._stop_requested = False
+    
+    def _build_solution(self, solver, is_optimal: bool, solve_time: float) -> SchedulingSolution:
+        """ソルバー（または解コールバック）の現在の解から SchedulingSolution を作成"""
+        sessions = self._extract_solution(solver)
+        objective_value = self._calculate_objective_value(sessions)
+        
+        solver_objective = solver.ObjectiveValue()
+        best_bound = solver.BestObjectiveBound()
+        gap = abs(solver_objective - best_bound) / max(1.0, abs(solver_objective))
+        
+        return SchedulingSolution(
+            sessions=sessions,
+            objective_value=objective_value,
+            is_optimal=is_optimal,
+            solve_time_seconds=solve_time,
+            best_bound=best_bound,
+            gap=0.0 if is_optimal else gap,
+            time_slot_ids=[time_slot.id for time_slot in self.problem.time_slots],
+            room_ids=[room.id for room in self.problem.rooms]
+        )
+    
+    def _extract_solution(self, solver: cp_model.CpSolver) -> SessionTable:
+        """ソルバーの解から練習セッションを抽出"""
+        # 参加プレイヤーは問題の共有表から引く（セッションごとに名簿を複製しない）
+        sessions = SessionTable(self.problem.get_part_roster())
+        # COMPACTモードで時間コマごとに次に割り当てる部屋の位置
+        next_room_index = {time_slot.id: 0 for time_slot in self.problem.time_slots}
+        
+        for (part, room_id, time_slot_id, instructor_id), var in self.constraints.session_vars.items():
+            if solver.Value(var) != 1:
+                continue
+            
+            if room_id is None:
+                # 部屋は交換可能なので空いている部屋を順に割り当てる
+                room_id = self.problem.rooms[next_room_index[time_slot_id]].id
+                next_room_index[time_slot_id] += 1
+            
+            sessions.append(self.problem.part_index(part), room_id, time_slot_id, instructor_id)
+        
+        return sessions
+    
+    def _calculate_objective_value(self, sessions: Sequence[PracticeSession]) -> float:
+        """目的関数の値を計算（モデルと同じ均等割り振り項＋重複ペナルティ。再求解時の追加項は含まない）"""
+        return self.get_evaluator().evaluate(sessions).objective_value
+    
+    def get_evaluator(self) -> SolutionEvaluator:
+        """現在の問題・均等性重みに対する評価器（問題や重みが変わった場合は作り直す）"""
+        evaluator = self._evaluator
+        if evaluator is None or evaluator.problem is not self.problem or \
+                evaluator.equality_weight != self.equality_weight:
+            evaluator = SolutionEvaluator(self.problem, self.equality_weight)
+            self._evaluator = evaluator
+        return evaluator
+    
+    def print_solution(self, solution: SchedulingSolution):
+        """解を分かりやすく表示（ファイルなどへの書き出しは TimetableExporter を使う）"""
+        TimetableExporter(self.problem).write_text(solution)
+
+
+class _SolutionStreamCallback(cp_model.CpSolverSolutionCallback):
+    """改善解を SchedulingSolution に変換してキューに積むコールバック"""
+    
+    def __init__(self, optimizer: SchedulingOptimizer, solutions: "queue.Queue"):
+        super().__init__()
+        self.optimizer = optimizer
+        self.solutions = solutions
+    
+    def OnSolutionCallback(self):
+        self.solutions.put(self.optimizer._build_solution(self, False, self.WallTime()))
 
 
 def create_sample_problem() -> SchedulingProblem:
@@ -0,0 +1,243 @@
+"""
+重みの感度分析（均等性重み・重複優先度のシナリオをまとめて解く）
+"""
+import dataclasses
+import functools
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from .data_models import SchedulingProblem, SchedulingSolution
+from .scheduling_optimizer import SchedulingOptimizer
+from .model_template import ModelTemplate
+from .evaluator import SolutionEvaluator
+from .solver_config import SolverConfig
+from .batch import split_workers
+from .instrumentation import Instrumentation, LoggingInstrumentation
+from .constants import SchedulingConfig, LoadBalanceScope
+
+
+@dataclass
+class WeightScenario:
+    """重みのシナリオ（均等性重みと、プレイヤーの重複優先度の変更）"""
+    equality_weight: int = SchedulingConfig.DEFAULT_EQUALITY_WEIGHT
+    priority_scale: float = 1.0  # 全プレイヤーの重複優先度に掛ける倍率（整数に丸める）
+    priority_overrides: Dict[int, int] = field(default_factory=dict)  # プレイヤーID -> 重複優先度（倍率より優先）
+    name: str = ""  # 表示名（省略時は重みから作成）
+    
+    def __post_init__(self):
+        """初期化後の検証"""
+        assert self.equality_weight >= 0, "均等性重みは0以上を指定してください"
+        assert self.priority_scale >= 0, "重複優先度の倍率は0以上を指定してください"
+        assert all(priority >= 0 for priority in self.priority_overrides.values()), "重複優先度は0以上を指定してください"
+        if not self.name:
+            self.name = f"weight={self.equality_weight},scale={self.priority_scale:g}"
+            if self.priority_overrides:
+                self.name += f",overrides={len(self.priority_overrides)}"
+    
+    def apply_to(self, problem: SchedulingProblem) -> SchedulingProblem:
+        """シナリオの重複優先度を反映した問題を作成（変更がなければ元の問題を返す）"""
+        if self.priority_scale == 1.0 and not self.priority_overrides:
+            return problem
+        players = [
+            dataclasses.replace(player, overlap_priority=self.priority_overrides.get(
+                player.id, round(player.overlap_priority * self.priority_scale)
+            ))
+            for player in problem.players
+        ]
+        return SchedulingProblem(
+            players=players,
+            rooms=problem.rooms,
+            time_slots=problem.time_slots,
+            parts=problem.parts,
+            cross_part_policy=problem.cross_part_policy,
+            instructor_load_offsets=dict(problem.instructor_load_offsets),
+            load_balance_scope=problem.load_balance_scope
+        )
+
+
+def scenario_grid(equality_weights: Sequence[int],
+                  priority_scales: Sequence[float] = (1.0,)) -> List[WeightScenario]:
+    """均等性重み×重複優先度の倍率の全組み合わせ
+    
+    倍率ごとに均等性重みを往復する順に並べ、隣り合うシナリオの重みが近くなるようにする
+    （SensitivityAnalyzer は隣のシナリオの解を初期解ヒントにする）。
+    """
+    scenarios = []
+    for i, scale in enumerate(priority_scales):
+        weights = equality_weights if i % 2 == 0 else list(reversed(equality_weights))
+        scenarios.extend(WeightScenario(equality_weight=weight, priority_scale=scale) for weight in weights)
+    return scenarios
+
+
+@dataclass
+class ScenarioResult:
+    """1シナリオの結果"""
+    scenario: WeightScenario
+    solution: Optional[SchedulingSolution]  # 解が見つからなかった場合・失敗した場合は None
+    objective_value: Optional[float] = None  # シナリオの重みでの目的関数値（= equality_term + penalty_term）
+    equality_term: Optional[float] = None  # 均等性重み ×（指導者のセッション数の最大−最小）
+    penalty_term: Optional[float] = None  # プレイヤーの重複ペナルティ
+    load_spread: Optional[int] = None  # 指導者のセッション数の最大−最小
+    is_optimal: bool = False
+    solve_time_seconds: float = 0.0
+    error: Optional[str] = None  # 例外・解が見つからなかった場合の内容
+    reused_from: Optional[str] = None  # 係数が比例する別のシナリオの解を使った場合、そのシナリオ名
+    
+    def as_row(self) -> Dict[str, Any]:
+        """表の1行（列名 -> 値）"""
+        return {
+            "scenario": self.scenario.name,
+            "equality_weight": self.scenario.equality_weight,
+            "priority_scale": self.scenario.priority_scale,
+            "objective_value": self.objective_value,
+            "equality_term": self.equality_term,
+            "penalty_term": self.penalty_term,
+            "load_spread": self.load_spread,
+            "is_optimal": self.is_optimal,
+            "solve_time_seconds": self.solve_time_seconds,
+            "error": self.error,
+            "reused_from": self.reused_from,
+        }
+
+
+class SensitivityAnalyzer:
+    """1つの問題について、重みのシナリオをまとめて解く
+    
+    モデルの構造（変数・制約）は ModelTemplate として一度だけ構築し、シナリオごとには
+    目的関数の係数（均等性重み・重複優先度）だけを設定する。
+    シナリオは並び順のまま max_workers 個の連続した区間に分けて並列に解き、各区間の中では
+    直前のシナリオ（重みの近い隣のシナリオ）の解を初期解ヒントにする。
+    """
+    
+    def __init__(self, problem: SchedulingProblem, model_mode: str = SchedulingConfig.DEFAULT_MODEL_MODE,
+                 max_workers: Optional[int] = None, instrumentation: Optional[Instrumentation] = None):
+        self.problem = problem
+        self.model_mode = model_mode
+        self.max_workers = max_workers  # 同時に解くシナリオの数（None=CPUコア数）
+        self.instrumentation = instrumentation if instrumentation is not None else LoggingInstrumentation()
+        self.template: Optional[ModelTemplate] = None  # analyze() の初回に作成
+    
+    def analyze(self, scenarios: Sequence[WeightScenario],
+                time_limit_per_scenario: float = SchedulingConfig.DEFAULT_SCENARIO_TIME_LIMIT,
+                solver_config: Optional[SolverConfig] = None) -> List[ScenarioResult]:
+        """シナリオを解き、シナリオと同じ順に結果を返す
+        
+        目的関数の係数（均等性重みと重複優先度）が比例するシナリオは最適解が同じため、最初の1つだけを解き、
+        残りはその解を自分の重みで評価する（ScenarioResult.reused_from に解いたシナリオ名を記録）。
+        solver_config の num_search_workers が0（自動）で複数のシナリオを同時に解く場合は、
+        CPUコア数を同時実行数で割ったワーカー数を各シナリオに割り当てる。
+        1シナリオの失敗は他のシナリオに影響せず、ScenarioResult.error に記録される。
+        """
+        if not scenarios:
+            return []
+        if self.template is None:
+            self.instrumentation.event("モデルの構造を構築中...")
+            self.template = ModelTemplate.compile(self.problem, self.model_mode)
+        
+        problems = [scenario.apply_to(self.problem) for scenario in scenarios]
+        representatives: Dict[Tuple[int, ...], int] = {}
+        for index, (scenario, problem) in enumerate(zip(scenarios, problems)):
+            representatives.setdefault(objective_key(problem, scenario.equality_weight), index)
+        solve_indices = sorted(representatives.values())
+        
+        if solver_config is None:
+            solver_config = SolverConfig()
+        num_lanes, workers_per_scenario = split_workers(len(solve_indices), self.max_workers)
+        if solver_config.num_search_workers == 0 and num_lanes > 1:
+            solver_config = dataclasses.replace(solver_config, num_search_workers=workers_per_scenario)
+        
+        # 並び順で連続した区間に分ける（区間の中では隣のシナリオの解を引き継ぐ）
+        lanes = [solve_indices[start:start + size] for start, size in _chunks(len(solve_indices), num_lanes)]
+        results: List[Optional[ScenarioResult]] = [None] * len(scenarios)
+        
+        def run_lane(indices: List[int]):
+            previous = None
+            for index in indices:
+                result = self._solve_scenario(scenarios[index], problems[index], time_limit_per_scenario,
+                                              solver_config, previous)
+                results[index] = result
+                if result.solution is not None:
+                    previous = result.solution
+        
+        self.instrumentation.event(f"{len(scenarios)}シナリオ（うち{len(solve_indices)}件を求解）を{num_lanes}並列で求解中...")
+        with ThreadPoolExecutor(max_workers=num_lanes) as executor:
+            list(executor.map(run_lane, lanes))
+        
+        for index, (scenario, problem) in enumerate(zip(scenarios, problems)):
+            if results[index] is None:
+                solved = results[representatives[objective_key(problem, scenario.equality_weight)]]
+                results[index] = self._reuse_result(scenario, problem, solved)
+        return results
+    
+    def _solve_scenario(self, scenario: WeightScenario, problem: SchedulingProblem, time_limit_seconds: float,
+                        solver_config: SolverConfig, previous: Optional[SchedulingSolution]) -> ScenarioResult:
+        """テンプレートから1シナリオのモデルを作成し、隣のシナリオの解をヒントにして解く"""
+        start_time = time.time()
+        try:
+            optimizer = SchedulingOptimizer(problem, instrumentation=self.instrumentation, template=self.template)
+            solution = optimizer.solve(time_limit_seconds, scenario.equality_weight, self.model_mode, solver_config,
+                                       initial_solution=previous)
+        except Exception as e:
+            return ScenarioResult(scenario, None, error=f"{type(e).__name__}: {e}",
+                                  solve_time_seconds=time.time() - start_time)
+        if solution is None:
+            return ScenarioResult(scenario, None, error="解が見つかりませんでした",
+                                  solve_time_seconds=time.time() - start_time)
+        return self._evaluate(scenario, problem, solution, solution.is_optimal, time.time() - start_time)
+    
+    def _reuse_result(self, scenario: WeightScenario, problem: SchedulingProblem,
+                      solved: ScenarioResult) -> ScenarioResult:
+        """係数が比例するシナリオの結果を、このシナリオの重みで評価し直す"""
+        if solved.solution is None:
+            return ScenarioResult(scenario, None, error=solved.error, reused_from=solved.scenario.name)
+        result = self._evaluate(scenario, problem, solved.solution, solved.is_optimal, 0.0)
+        result.reused_from = solved.scenario.name
+        return result
+    
+    @staticmethod
+    def _evaluate(scenario: WeightScenario, problem: SchedulingProblem, solution: SchedulingSolution,
+                  is_optimal: bool, solve_time_seconds: float) -> ScenarioResult:
+        """解をシナリオの重みで評価して結果を作成"""
+        evaluation = SolutionEvaluator(problem, scenario.equality_weight).evaluate(solution)
+        loads = {instructor.id: problem.get_load_offset(instructor.id) for instructor in problem.get_instructors()}
+        for session in solution.sessions:
+            loads[session.instructor_id] += 1
+        return ScenarioResult(
+            scenario=scenario,
+            solution=solution,
+            objective_value=evaluation.objective_value,
+            equality_term=evaluation.equality_term,
+            penalty_term=evaluation.penalty_term,
+            load_spread=max(loads.values()) - min(loads.values()) if loads else 0,
+            is_optimal=is_optimal,
+            solve_time_seconds=solve_time_seconds
+        )
+
+
+def objective_key(problem: SchedulingProblem, equality_weight: int) -> Tuple[int, ...]:
+    """目的関数の係数（均等性重みとプレイヤーの重複優先度）を最大公約数で割った組
+    
+    キーが等しい2つのシナリオの目的関数は正の定数倍と定数項の違いしかなく、最適解が一致する。
+    日単位の均等割り振り（持ち越しなし）では、制約により指導者のセッション数の最大−最小が定数になるため、
+    均等性重みは最適解に影響せずキーに含めない。
+    """
+    if problem.load_balance_scope == LoadBalanceScope.DAY and not any(problem.instructor_load_offsets.values()):
+        equality_weight = 0
+    coefficients = [equality_weight] + [player.overlap_priority for player in problem.players]
+    divisor = functools.reduce(math.gcd, coefficients, 0)
+    if divisor == 0:
+        return tuple(coefficients)
+    return tuple(coefficient // divisor for coefficient in coefficients)
+
+
+def _chunks(total: int, count: int) -> List[tuple]:
+    """total 個を count 個の連続した区間にほぼ均等に分け、(開始位置, 個数) のリストを返す"""
+    size, extra = divmod(total, count)
+    chunks, start = [], 0
+    for i in range(count):
+        length = size + (1 if i < extra else 0)
+        chunks.append((start, length))
+        start += length
+    return chunks
@@ -0,0 +1,157 @@
+"""
+フィンガープリントをキーにした解のキャッシュ（メモリ上のLRU＋ディスク）
+"""
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from .data_models import SchedulingSolution
+from .fingerprint import CanonicalProblem, CanonicalSession
+from .constants import SchedulingConfig
+
+
+@dataclass
+class CachedSolution:
+    """キャッシュに保存する正規化済みの解"""
+    sessions: List[CanonicalSession]
+    objective_value: float
+    is_optimal: bool
+    solve_time_seconds: float
+    created_at: float  # 保存時刻（time.time()）
+    best_bound: Optional[float] = None
+    gap: Optional[float] = None
+
+
+class SolutionCache:
+    """正規化した問題のフィンガープリントをキーに解を保存するキャッシュ
+    
+    max_entries を超えると最も使われていない解から削除し、ttl_seconds を過ぎた解は無効とする。
+    cache_dir を指定するとディスクにも保存し、プロセスをまたいで再利用できる。
+    """
+    
+    def __init__(self, max_entries: int = SchedulingConfig.DEFAULT_CACHE_MAX_ENTRIES,
+                 ttl_seconds: Optional[float] = SchedulingConfig.DEFAULT_CACHE_TTL,
+                 cache_dir: Optional[str] = None):
+        assert max_entries > 0, "キャッシュの最大件数は1以上を指定してください"
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.cache_dir = cache_dir
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        
+        self._entries: "OrderedDict[str, CachedSolution]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key: str, canonical: CanonicalProblem) -> Optional[SchedulingSolution]:
+        """キャッシュされた解を呼び出し元の問題のIDに戻して返す（なければ None）"""
+        start_time = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self._store(key, entry)
+        
+        if entry is None or self._expired(entry):
+            if entry is not None:
+                self.invalidate(key)
+            with self._lock:
+                self.misses += 1
+            return None
+        
+        with self._lock:
+            self.hits += 1
+        return SchedulingSolution(
+            sessions=canonical.restore_sessions(entry.sessions),
+            objective_value=entry.objective_value,
+            is_optimal=entry.is_optimal,
+            solve_time_seconds=time.time() - start_time,
+            best_bound=entry.best_bound,
+            gap=entry.gap,
+            time_slot_ids=[time_slot.id for time_slot in canonical.problem.time_slots],
+            room_ids=[room.id for room in canonical.problem.rooms]
+        )
+    
+    def put(self, key: str, canonical: CanonicalProblem, solution: SchedulingSolution):
+        """解を正規化して保存"""
+        entry = CachedSolution(
+            sessions=canonical.canonicalize_sessions(solution.sessions),
+            objective_value=solution.objective_value,
+            is_optimal=solution.is_optimal,
+            solve_time_seconds=solution.solve_time_seconds,
+            created_at=time.time(),
+            best_bound=solution.best_bound,
+            gap=solution.gap
+        )
+        self._store(key, entry)
+        if self.cache_dir is not None:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entry, f)
+            os.replace(tmp_path, path)
+    
+    def invalidate(self, key: str):
+        """指定したキーの解を削除"""
+        with self._lock:
+            self._entries.pop(key, None)
+        if self.cache_dir is not None and os.path.exists(self._path(key)):
+            os.remove(self._path(key))
+    
+    def clear(self):
+        """すべての解を削除（ディスク上の解も含む）"""
+        with self._lock:
+            keys = list(self._entries)
+            self._entries.clear()
+        if self.cache_dir is not None:
+            keys = [name[:-len(".pkl")] for name in os.listdir(self.cache_dir) if name.endswith(".pkl")]
+        for key in keys:
+            self.invalidate(key)
+    
+    def stats(self) -> Dict[str, int]:
+        """ヒット数・ミス数などの統計"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+            }
+    
+    def _store(self, key: str, entry: CachedSolution):
+        """メモリ上に保存し、上限を超えた分を古い順に削除"""
+        evicted = []
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                evicted.append(self._entries.popitem(last=False)[0])
+                self.evictions += 1
+        # ディスク上の件数もメモリと同じ上限に揃える
+        for evicted_key in evicted:
+            if self.cache_dir is not None and os.path.exists(self._path(evicted_key)):
+                os.remove(self._path(evicted_key))
+    
+    def _expired(self, entry: CachedSolution) -> bool:
+        return self.ttl_seconds is not None and time.time() - entry.created_at > self.ttl_seconds
+    
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.pkl")
+    
+    def _load(self, key: str) -> Optional[CachedSolution]:
+        """ディスクから読み込む（ディスク保存を使わない場合・存在しない場合は None）"""
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self._path(key), "rb") as f:
+                return pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
@@ -0,0 +1,69 @@
+"""
+CP-SATソルバーの設定
+"""
+from dataclasses import dataclass
+from typing import Optional
+from .constants import SchedulingConfig, SolverPreset, ObjectiveMode
+
+
+@dataclass
+class SolverConfig:
+    """CP-SATソルバーのパラメータ設定（heuristic_*・objective_mode などは SchedulingOptimizer が使い、CP-SATには渡さない）"""
+    num_search_workers: int = SchedulingConfig.DEFAULT_NUM_SEARCH_WORKERS  # 並列探索ワーカー数（0=自動）
+    preset: str = SchedulingConfig.DEFAULT_SOLVER_PRESET  # ポートフォリオのプリセット
+    random_seed: int = SchedulingConfig.DEFAULT_RANDOM_SEED  # 乱数シード
+    deterministic: bool = False  # Trueの場合、時間制限を決定的時間として扱い再現性のある探索を行う
+    linearization_level: Optional[int] = None  # 線形化レベル（0-2、None=プリセットに従う）
+    relative_gap_limit: float = SchedulingConfig.DEFAULT_RELATIVE_GAP_LIMIT  # 相対ギャップの許容値
+    heuristic_hint: bool = False  # Trueの場合、ヒューリスティック解法の解をCP-SATの初期解ヒントにする
+    heuristic_fallback: bool = False  # Trueの場合、CP-SATが解を見つけられなければヒューリスティック解法の解を返す
+    heuristic_time_limit: float = SchedulingConfig.DEFAULT_HEURISTIC_TIME_LIMIT  # ヒューリスティック解法の時間制限（秒）
+    objective_mode: str = SchedulingConfig.DEFAULT_OBJECTIVE_MODE  # 目的関数の扱い（ObjectiveMode参照）
+    # 段階的な求解の第1段階（均等割り振り）の時間制限（秒、None=全体の DEFAULT_BALANCE_STAGE_FRACTION）
+    balance_time_limit: Optional[float] = None
+    
+    def __post_init__(self):
+        """初期化後の検証"""
+        assert self.preset in SolverPreset.SUBSOLVERS, f"未対応のプリセットです: {self.preset}"
+        assert self.num_search_workers >= 0, "探索ワーカー数は0以上を指定してください"
+        assert self.linearization_level is None or 0 <= self.linearization_level <= 2, \
+            "線形化レベルは0-2を指定してください"
+        assert self.relative_gap_limit >= 0, "相対ギャップの許容値は0以上を指定してください"
+        assert self.heuristic_time_limit > 0, "ヒューリスティック解法の時間制限は正の値を指定してください"
+        assert self.objective_mode in (ObjectiveMode.BLENDED, ObjectiveMode.LEXICOGRAPHIC), \
+            f"未対応の目的関数の扱いです: {self.objective_mode}"
+        assert self.balance_time_limit is None or self.balance_time_limit > 0, \
+            "第1段階の時間制限は正の値を指定してください"
+    
+    @property
+    def uses_heuristic(self) -> bool:
+        """ヒューリスティック解法を実行するかどうか"""
+        return self.heuristic_hint or self.heuristic_fallback
+    
+    @property
+    def is_lexicographic(self) -> bool:
+        """均等割り振り → 重複ペナルティの順に段階的に解くかどうか"""
+        return self.objective_mode == ObjectiveMode.LEXICOGRAPHIC
+    
+    def apply_to(self, parameters, time_limit_seconds: float):
+        """CpSolver.parameters に設定を反映"""
+        if self.deterministic:
+            # 壁時計ではなく決定的時間で打ち切り、ワーカー間の探索順序も固定する
+            parameters.max_deterministic_time = time_limit_seconds
+            parameters.interleave_search = True
+        else:
+            parameters.max_time_in_seconds = time_limit_seconds
+        
+        parameters.num_workers = self.num_search_workers
+        parameters.random_seed = self.random_seed
+        parameters.relative_gap_limit = self.relative_gap_limit
+        
+        subsolvers = SolverPreset.SUBSOLVERS[self.preset]
+        if subsolvers:
+            parameters.subsolvers.extend(subsolvers)
+        
+        linearization_level = self.linearization_level
+        if linearization_level is None:
+            linearization_level = SolverPreset.LINEARIZATION_LEVELS[self.preset]
+        if linearization_level is not None:
+            parameters.linearization_level = linearization_level